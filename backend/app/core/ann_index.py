@@ -0,0 +1,287 @@
+"""
+Faiss index selection and tuning for txtai.
+
+txtai's Faiss backend chooses between IDMap,Flat and an IVF index from the
+number of vectors in the first build only. This index grows through upserts,
+so that first build sees a single ingestion batch and the index stays an
+exact flat scan forever. TunedFaiss (app.core.tuned_faiss) chooses the index
+type at every build and rebuild from the options in config["faiss"]:
+
+    type          auto, flat, ivf or hnsw
+    compression   auto, none, sq8 (8-bit scalar, 4x smaller) or pq (product
+                  quantization, pq_m bytes per vector; IVF indexes only)
+    nlist         IVF lists, 0 derives 4 * sqrt(vectors)
+    nprobe        IVF lists searched, 0 for nlist / 16
+    hnsw_m        HNSW graph degree
+    ef_construction, ef_search
+                  HNSW candidate list sizes when building and searching
+    pq_m          PQ sub-quantizers, 0 for dimensions / 8
+    sample        Share of vectors used to train IVF and PQ, 0 for all
+
+"auto" uses an exact flat index below ivf_min_vectors, IVF above it, and SQ8
+compression above compress_min_vectors. rebuild_reason() tells when a grown
+or shrunk corpus no longer fits the index it was built with.
+
+Faiss HNSW graphs can't remove vectors. Deleted HNSW vectors are kept as
+tombstones that searches skip, and are dropped by the next rebuild.
+
+With the "mmap" option, Faiss maps the inverted lists of IVF indexes from the
+file instead of reading them into memory, so processes serving the same file
+share them in the page cache. write_mappable() stores flat indexes as an
+equivalent single-list IVF index to make them mappable too.
+"""
+import math
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+
+# Backend setting that makes txtai create TunedFaiss; saved with every index,
+# so it keeps this path and resolves through __getattr__
+BACKEND = "app.core.ann_index.TunedFaiss"
+
+INDEX_TYPES = ("auto", "flat", "ivf", "hnsw")
+COMPRESSIONS = ("auto", "none", "sq8", "pq")
+
+# Fewer IVF lists than this aren't worth the clustering; a flat index is used
+MIN_NLIST = 16
+# Faiss wants this many training vectors per IVF list
+TRAIN_PER_LIST = 39
+
+
+class IndexPlan(NamedTuple):
+    kind: str
+    compression: str
+    components: str
+    nlist: int
+
+
+def index_options() -> Dict[str, Any]:
+    """TunedFaiss options from settings."""
+    return {
+        "type": settings.INDEX_TYPE,
+        "compression": settings.INDEX_COMPRESSION,
+        "nlist": settings.INDEX_IVF_NLIST,
+        "nprobe": settings.INDEX_IVF_NPROBE,
+        "hnsw_m": settings.INDEX_HNSW_M,
+        "ef_construction": settings.INDEX_HNSW_EF_CONSTRUCTION,
+        "ef_search": settings.INDEX_HNSW_EF_SEARCH,
+        "pq_m": settings.INDEX_PQ_M,
+        "sample": settings.INDEX_TRAIN_SAMPLE,
+        "ivf_min_vectors": settings.INDEX_AUTO_IVF_MIN_VECTORS,
+        "compress_min_vectors": settings.INDEX_AUTO_COMPRESS_MIN_VECTORS,
+        "max_deleted": settings.INDEX_MAX_DELETED_FRACTION
+    }
+
+
+def plan(count: int, dimensions: int, options: Dict[str, Any]) -> IndexPlan:
+    """
+    Choose a Faiss index for a number of vectors.
+
+    Args:
+        count: Vectors the index is built with
+        dimensions: Vector size
+        options: See index_options()
+
+    Raises:
+        ValueError: For unknown types or compressions, or PQ without IVF
+    """
+    kind, compression = options.get("type") or "auto", options.get("compression") or "auto"
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind}, expected one of {', '.join(INDEX_TYPES)}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown index compression {compression}, expected one of {', '.join(COMPRESSIONS)}")
+
+    if kind == "auto":
+        kind = "ivf" if count >= options.get("ivf_min_vectors", 0) else "flat"
+    if compression == "auto":
+        compression = "sq8" if count >= options.get("compress_min_vectors", 0) else "none"
+    if compression == "pq" and kind == "hnsw":
+        raise ValueError("PQ compression needs an IVF index; use sq8 with HNSW")
+
+    nlist = 0
+    if kind == "ivf":
+        nlist = options.get("nlist") or min(round(4 * math.sqrt(count)), count // TRAIN_PER_LIST)
+        if nlist < MIN_NLIST:
+            # Too few vectors to train lists; flat PQ can't be searched with a filter
+            kind, nlist = "flat", 0
+            if compression == "pq":
+                compression = "sq8"
+
+    storage = {"none": "Flat", "sq8": "SQ8", "pq": f"PQ{_pq_m(dimensions, options.get('pq_m'))}"}[compression]
+    if kind == "ivf":
+        components = f"IVF{nlist},{storage}"
+    elif kind == "hnsw":
+        components = f"IDMap,HNSW{options.get('hnsw_m') or 32}" + ("_SQ8" if compression == "sq8" else "")
+    else:
+        components = f"IDMap,{storage}"
+
+    return IndexPlan(kind, compression, components, nlist)
+
+
+def _pq_m(dimensions: int, pq_m: Optional[int]) -> int:
+    """Sub-quantizers for PQ; Faiss needs a divisor of the dimensions."""
+    target = pq_m or max(dimensions // 8, 1)
+    return max(m for m in range(1, min(target, dimensions) + 1) if dimensions % m == 0)
+
+
+def _hnsw(index: faiss.Index) -> Optional[faiss.IndexHNSW]:
+    """The HNSW index inside an IDMap, if there is one."""
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    return index if isinstance(index, faiss.IndexHNSW) else None
+
+
+def memory_bytes(index: faiss.Index) -> int:
+    """Approximate resident size of a Faiss index: codes, ids, lists and graph links."""
+    size = 0
+    if isinstance(index, faiss.IndexIDMap):
+        size += 8 * index.ntotal
+        index = faiss.downcast_index(index.index)
+
+    if isinstance(index, faiss.IndexHNSW):
+        return size + 4 * index.hnsw.neighbors.size() + 8 * index.hnsw.offsets.size() + memory_bytes(
+            faiss.downcast_index(index.storage)
+        )
+    if isinstance(index, faiss.IndexIVF):
+        # Codes and ids in the inverted lists, plus the coarse centroids
+        size += 4 * index.nlist * index.d
+        if _mapped(index):
+            # Mapped lists are in the page cache, shared with other processes
+            return size
+        return size + index.ntotal * (index.code_size + 8)
+    return size + index.ntotal * index.sa_code_size()
+
+
+def _mapped(index: faiss.Index) -> bool:
+    """Whether an IVF index's lists are memory-mapped from its file."""
+    return isinstance(index, faiss.IndexIVF) and isinstance(
+        faiss.downcast_InvertedLists(index.invlists), faiss.OnDiskInvertedLists
+    )
+
+
+def write_mappable(source: str, target: str) -> bool:
+    """
+    Copy a saved index into a form Faiss can memory-map.
+
+    Faiss only maps IVF lists. Flat and SQ8 indexes are written as an IVF
+    index with one list and no residuals: every search scans that list, so
+    results are the same as the flat index's. IVF indexes are copied as they
+    are; HNSW graphs can't be mapped and are copied too.
+
+    Args:
+        source: Index file, as saved by txtai
+        target: File to write
+
+    Returns:
+        True if the target can be memory-mapped
+    """
+    index = faiss.read_index(source)
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else None
+    if not isinstance(inner, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+        faiss.write_index(index, target)
+        return isinstance(index, faiss.IndexIVF)
+
+    quantizer = faiss.IndexFlat(index.d, index.metric_type)
+    quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+    if isinstance(inner, faiss.IndexFlat):
+        ivf = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+    else:
+        ivf = faiss.IndexIVFScalarQuantizer(quantizer, index.d, 1, inner.sq.qtype, index.metric_type, False)
+        ivf.sq = inner.sq
+    ivf.by_residual = False
+    ivf.is_trained = True
+
+    # Codes are stored the same way in both indexes; the IDMap's ids go with them
+    codes, ids = faiss.vector_to_array(inner.codes), faiss.vector_to_array(index.id_map)
+    ivf.invlists.add_entries(0, index.ntotal, faiss.swig_ptr(ids), faiss.swig_ptr(codes))
+    ivf.ntotal = index.ntotal
+    faiss.write_index(ivf, target)
+    return True
+
+
+def rebuild_reason(ann, options: Dict[str, Any]) -> Optional[str]:
+    """
+    Why an index no longer fits its corpus, or None if it still does.
+
+    Args:
+        ann: txtai ANN of the embeddings index
+        options: See index_options()
+    """
+    if ann is None or not ann.count():
+        return None
+    count, dimensions = ann.count(), ann.backend.d
+
+    from app.core.tuned_faiss import TunedFaiss
+
+    if not isinstance(ann, TunedFaiss):
+        return f"built by txtai's default Faiss backend ({count} vectors)"
+
+    build = ann.config.get("build", {}).get("settings", {})
+    if not build.get("tuned", True):
+        return None
+
+    deleted = len(ann.config.get("deleted", []))
+    if deleted > options.get("max_deleted", 0.1) * ann.backend.ntotal:
+        return f"{deleted} deleted HNSW vectors of {ann.backend.ntotal}"
+
+    # Growing past a threshold rebuilds at once; shrinking below one only
+    # once twice the corpus would fit too, so deletes near it don't flip back and forth
+    current = build.get("components")
+    wanted = plan(count, dimensions, options)
+    if _shape(wanted) != _shape(current) and _shape(plan(count * 2, dimensions, options)) != _shape(current):
+        return f"{count} vectors call for {wanted.components}, index is {current}"
+
+    # IVF lists are trained once; a corpus four times larger needs twice the lists
+    if wanted.kind == "ivf" and not options.get("nlist") and wanted.nlist >= 2 * _nlist(current):
+        return f"{count} vectors call for {wanted.nlist} IVF lists, index has {_nlist(current)}"
+
+    return None
+
+
+def _shape(index) -> Tuple[str, str]:
+    """Kind and compression of a plan or components string."""
+    if isinstance(index, IndexPlan):
+        return index.kind, index.compression
+    kind = "ivf" if index.startswith("IVF") else "hnsw" if "HNSW" in index else "flat"
+    storage = index.split(",")[-1]
+    compression = "sq8" if storage.endswith("SQ8") else "pq" if storage.startswith("PQ") else "none"
+    return kind, compression
+
+
+def _nlist(components: str) -> int:
+    return int(components.split(",")[0][3:]) if components.startswith("IVF") else 0
+
+
+def describe(ann) -> Optional[Dict[str, Any]]:
+    """Index type, size and search parameters for stats."""
+    if ann is None or ann.backend is None:
+        return None
+    build = ann.config.get("build", {}).get("settings", {})
+    stats = {
+        "components": build.get("components"),
+        "vectors": ann.count(),
+        "deleted": len(ann.config.get("deleted", [])),
+        "bytes": memory_bytes(ann.backend),
+        "mapped": _mapped(ann.backend)
+    }
+    if isinstance(ann.backend, faiss.IndexIVF):
+        stats.update({"nlist": ann.backend.nlist, "nprobe": ann.nprobe()})
+    elif _hnsw(ann.backend) is not None:
+        stats["ef_search"] = ann.setting("ef_search", 16)
+    return stats
+
+
+def search_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Options that apply at search time, so they can change without a rebuild."""
+    return {name: options[name] for name in ("nprobe", "ef_search", "max_deleted") if name in options}
+
+
+def __getattr__(name: str):
+    # Imported on first use, see app.core.tuned_faiss
+    if name == "TunedFaiss":
+        from app.core.tuned_faiss import TunedFaiss
+        return TunedFaiss
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
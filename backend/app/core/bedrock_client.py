@@ -5,8 +5,9 @@ Decoupled from retrieval layer.
 import boto3
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional, Tuple
 from app.core.config import settings
+from app.core.lazy import Lazy
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +15,21 @@ logger = logging.getLogger(__name__)
 class BedrockClient:
     """AWS Bedrock client for LLM inference."""
     
-    def __init__(self):
-        self.bedrock_runtime = boto3.client(
-            'bedrock-runtime',
-            region_name=settings.AWS_REGION
-        )
+    def __init__(self, bedrock_runtime=None):
+        """
+        Args:
+            bedrock_runtime: Runtime client to use instead of boto3, e.g. a local stub
+        """
+        if bedrock_runtime is None:
+            if settings.BEDROCK_USE_STUB:
+                from app.core.bedrock_stub import StubBedrockRuntime
+                bedrock_runtime = StubBedrockRuntime()
+            else:
+                bedrock_runtime = boto3.client(
+                    'bedrock-runtime',
+                    region_name=settings.AWS_REGION
+                )
+        self.bedrock_runtime = bedrock_runtime
         self.model_id = settings.BEDROCK_MODEL_ID
     
     def generate(
@@ -26,6 +37,7 @@ class BedrockClient:
         prompt: str,
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
+        model_id: Optional[str] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -35,6 +47,7 @@ class BedrockClient:
             prompt: Input prompt text
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
+            model_id: Model to use instead of the configured default
             **kwargs: Additional model-specific parameters
         
         Returns:
@@ -43,16 +56,17 @@ class BedrockClient:
         try:
             max_tokens = max_tokens or settings.BEDROCK_MAX_TOKENS
             temperature = temperature or settings.BEDROCK_TEMPERATURE
+            model_id = model_id or self.model_id
             
             # Model-specific request formatting
-            if "claude" in self.model_id.lower():
-                return self._generate_claude(prompt, max_tokens, temperature, **kwargs)
-            elif "titan" in self.model_id.lower():
-                return self._generate_titan(prompt, max_tokens, temperature, **kwargs)
-            elif "llama" in self.model_id.lower():
-                return self._generate_llama(prompt, max_tokens, temperature, **kwargs)
+            if "claude" in model_id.lower():
+                return self._generate_claude(model_id, prompt, max_tokens, temperature, **kwargs)
+            elif "titan" in model_id.lower():
+                return self._generate_titan(model_id, prompt, max_tokens, temperature, **kwargs)
+            elif "llama" in model_id.lower():
+                return self._generate_llama(model_id, prompt, max_tokens, temperature, **kwargs)
             else:
-                raise ValueError(f"Unsupported model: {self.model_id}")
+                raise ValueError(f"Unsupported model: {model_id}")
                 
         except Exception as e:
             logger.error(f"Error generating with Bedrock: {e}")
@@ -60,21 +74,17 @@ class BedrockClient:
     
     def _generate_claude(
         self,
+        model_id: str,
         prompt: str,
         max_tokens: int,
         temperature: float,
         **kwargs
     ) -> Dict[str, Any]:
         """Generate using Claude model."""
-        body = {
-            "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
-            "max_tokens_to_sample": max_tokens,
-            "temperature": temperature,
-            **kwargs
-        }
+        body = self._claude_body(prompt, max_tokens, temperature, **kwargs)
         
         response = self.bedrock_runtime.invoke_model(
-            modelId=self.model_id,
+            modelId=model_id,
             body=json.dumps(body)
         )
         
@@ -82,29 +92,23 @@ class BedrockClient:
         
         return {
             "text": response_body.get("completion", ""),
-            "model": self.model_id,
+            "model": model_id,
             "stop_reason": response_body.get("stop_reason", "unknown")
         }
     
     def _generate_titan(
         self,
+        model_id: str,
         prompt: str,
         max_tokens: int,
         temperature: float,
         **kwargs
     ) -> Dict[str, Any]:
         """Generate using Amazon Titan model."""
-        body = {
-            "inputText": prompt,
-            "textGenerationConfig": {
-                "maxTokenCount": max_tokens,
-                "temperature": temperature,
-                **kwargs
-            }
-        }
+        body = self._titan_body(prompt, max_tokens, temperature, **kwargs)
         
         response = self.bedrock_runtime.invoke_model(
-            modelId=self.model_id,
+            modelId=model_id,
             body=json.dumps(body)
         )
         
@@ -112,26 +116,22 @@ class BedrockClient:
         
         return {
             "text": response_body.get("results", [{}])[0].get("outputText", ""),
-            "model": self.model_id
+            "model": model_id
         }
     
     def _generate_llama(
         self,
+        model_id: str,
         prompt: str,
         max_tokens: int,
         temperature: float,
         **kwargs
     ) -> Dict[str, Any]:
         """Generate using Llama model."""
-        body = {
-            "prompt": prompt,
-            "max_gen_len": max_tokens,
-            "temperature": temperature,
-            **kwargs
-        }
+        body = self._llama_body(prompt, max_tokens, temperature, **kwargs)
         
         response = self.bedrock_runtime.invoke_model(
-            modelId=self.model_id,
+            modelId=model_id,
             body=json.dumps(body)
         )
         
@@ -139,9 +139,116 @@ class BedrockClient:
         
         return {
             "text": response_body.get("generation", ""),
-            "model": self.model_id
+            "model": model_id
+        }
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        model_id: Optional[str] = None,
+        **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream generated text from AWS Bedrock as it is produced.
+        
+        Args:
+            prompt: Input prompt text
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            model_id: Model to use instead of the configured default
+            **kwargs: Additional model-specific parameters
+        
+        Yields:
+            {"type": "token", "text": ...} for every text chunk, then
+            {"type": "done", "model": ..., "stop_reason": ...}
+        """
+        max_tokens = max_tokens or settings.BEDROCK_MAX_TOKENS
+        temperature = temperature or settings.BEDROCK_TEMPERATURE
+        model_id = model_id or self.model_id
+        
+        family = model_id.lower()
+        if "claude" in family:
+            body, decode = self._claude_body(prompt, max_tokens, temperature, **kwargs), self._decode_claude
+        elif "titan" in family:
+            body, decode = self._titan_body(prompt, max_tokens, temperature, **kwargs), self._decode_titan
+        elif "llama" in family:
+            body, decode = self._llama_body(prompt, max_tokens, temperature, **kwargs), self._decode_llama
+        else:
+            raise ValueError(f"Unsupported model: {model_id}")
+        
+        try:
+            response = self.bedrock_runtime.invoke_model_with_response_stream(
+                modelId=model_id,
+                body=json.dumps(body)
+            )
+            
+            stop_reason = None
+            for event in response['body']:
+                if "chunk" not in event:
+                    # Errors are delivered in-band as exception events
+                    name, detail = next(iter(event.items()))
+                    raise RuntimeError(f"Bedrock stream error ({name}): {detail.get('message', detail)}")
+                
+                text, reason = decode(json.loads(event["chunk"]["bytes"]))
+                stop_reason = reason or stop_reason
+                if text:
+                    yield {"type": "token", "text": text}
+            
+            yield {"type": "done", "model": model_id, "stop_reason": stop_reason or "unknown"}
+            
+        except Exception as e:
+            logger.error(f"Error streaming from Bedrock: {e}")
+            raise
+    
+    @staticmethod
+    def _claude_body(prompt: str, max_tokens: int, temperature: float, **kwargs) -> Dict[str, Any]:
+        """Request body for Claude models."""
+        return {
+            "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
+            "max_tokens_to_sample": max_tokens,
+            "temperature": temperature,
+            **kwargs
+        }
+    
+    @staticmethod
+    def _titan_body(prompt: str, max_tokens: int, temperature: float, **kwargs) -> Dict[str, Any]:
+        """Request body for Amazon Titan models."""
+        return {
+            "inputText": prompt,
+            "textGenerationConfig": {
+                "maxTokenCount": max_tokens,
+                "temperature": temperature,
+                **kwargs
+            }
+        }
+    
+    @staticmethod
+    def _llama_body(prompt: str, max_tokens: int, temperature: float, **kwargs) -> Dict[str, Any]:
+        """Request body for Llama models."""
+        return {
+            "prompt": prompt,
+            "max_gen_len": max_tokens,
+            "temperature": temperature,
+            **kwargs
         }
     
+    @staticmethod
+    def _decode_claude(chunk: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """Text and stop reason from a Claude stream chunk."""
+        return chunk.get("completion", ""), chunk.get("stop_reason")
+    
+    @staticmethod
+    def _decode_titan(chunk: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """Text and stop reason from a Titan stream chunk."""
+        return chunk.get("outputText", ""), chunk.get("completionReason")
+    
+    @staticmethod
+    def _decode_llama(chunk: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """Text and stop reason from a Llama stream chunk."""
+        return chunk.get("generation", ""), chunk.get("stop_reason")
+    
     def list_available_models(self) -> list:
         """List available Bedrock models."""
         try:
@@ -160,6 +267,6 @@ class BedrockClient:
             return []
 
 
-# Global instance
-bedrock_client = BedrockClient()
+# Global instance, created on first use or by the startup warm-up
+bedrock_client = Lazy(BedrockClient, "bedrock_client")
 
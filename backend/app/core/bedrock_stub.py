@@ -0,0 +1,98 @@
+"""
+Local stand-in for the Bedrock runtime client.
+
+Enabled with BEDROCK_USE_STUB=true, or passed to BedrockClient directly, to
+exercise generation and streaming without AWS access. Responses are built in
+each model family's wire format, and streamed responses are delivered as an
+event stream of `{"chunk": {"bytes": ...}}` events like boto3 returns.
+"""
+import io
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class StubBedrockRuntime:
+    """Fake `bedrock-runtime` client with invoke_model and streaming support."""
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        chunk_words: int = 3,
+        delay: float = 0.0,
+        error_after: Optional[int] = None
+    ):
+        """
+        Args:
+            reply: Completion text; defaults to an echo of the prompt
+            chunk_words: Words per streamed chunk
+            delay: Seconds to sleep before each streamed chunk
+            error_after: Emit a modelStreamErrorException after this many chunks
+        """
+        self.reply = reply
+        self.chunk_words = max(chunk_words, 1)
+        self.delay = delay
+        self.error_after = error_after
+        self.requests: List[Dict[str, Any]] = []
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        """Return the whole completion in the model's response format."""
+        request = self._record(modelId, body)
+        text = self._completion(request)
+        payload = self._payload(modelId, text, "stop")
+
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        """Return the completion as an event stream of chunks."""
+        request = self._record(modelId, body)
+        return {"body": self._events(modelId, self._completion(request))}
+
+    def _events(self, model_id: str, text: str) -> Iterator[Dict[str, Any]]:
+        """Yield chunk events, ending with one that carries the stop reason."""
+        words = text.split(" ")
+        pieces = [
+            " ".join(words[i:i + self.chunk_words]) + " "
+            for i in range(0, len(words), self.chunk_words)
+        ]
+
+        for index, piece in enumerate(pieces):
+            if self.error_after is not None and index >= self.error_after:
+                yield {"modelStreamErrorException": {"message": "Stub stream error"}}
+                return
+
+            if self.delay:
+                time.sleep(self.delay)
+
+            last = index == len(pieces) - 1
+            payload = self._payload(model_id, piece, "stop" if last else None)
+            yield {"chunk": {"bytes": json.dumps(payload).encode("utf-8")}}
+
+    def _record(self, model_id: str, body: str) -> Dict[str, Any]:
+        """Keep the decoded request for inspection."""
+        request = json.loads(body)
+        self.requests.append({"modelId": model_id, "body": request})
+        return request
+
+    def _completion(self, request: Dict[str, Any]) -> str:
+        """Completion text for a request."""
+        if self.reply is not None:
+            return self.reply
+
+        prompt = request.get("prompt") or request.get("inputText") or ""
+        return f"Stub response to: {' '.join(prompt.split())[-200:]}"
+
+    @staticmethod
+    def _payload(model_id: str, text: str, stop_reason: Optional[str]) -> Dict[str, Any]:
+        """Response payload in the model family's format."""
+        family = model_id.lower()
+        if "titan" in family:
+            # Streamed Titan chunks are flat, full responses wrap them in "results"
+            result = {
+                "outputText": text,
+                "completionReason": stop_reason.upper() if stop_reason else None
+            }
+            return {**result, "results": [result]}
+        if "llama" in family:
+            return {"generation": text, "stop_reason": stop_reason}
+        return {"completion": text, "stop_reason": stop_reason}
@@ -0,0 +1,368 @@
+"""
+Token-aware chunking along sentence and heading boundaries.
+
+Text is split into blocks at blank lines, blocks into sentences, and
+sentences are packed into chunks of at most CHUNK_TOKENS tokens as counted
+by the tokenizer of TXTAI_MODEL. A heading always starts a new chunk so it
+stays with the text it introduces. Consecutive chunks share up to
+CHUNK_OVERLAP_TOKENS tokens of whole trailing sentences. Sentences longer
+than a chunk are split at word boundaries.
+
+Chunks are yielded lazily with the same `start`/`end`/`chunk_index` metadata
+as the character chunker; `text[start:end]` is always the chunk text. Paged
+documents can be streamed in page by page; offsets then refer to the pages
+joined by blank lines, and chunks also record the pages they span.
+"""
+import logging
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Blank lines separate blocks (paragraphs, headings, list runs)
+_BLOCK_BREAK = re.compile(r"\n[ \t]*\n\s*")
+# Sentence-final punctuation with trailing quotes/brackets, then whitespace
+_SENTENCE_END = re.compile(r"[.!?]+[\"'”’)\]]*\s+")
+_MARKDOWN_HEADING = re.compile(r"#{1,6}\s")
+# Approximate tokens when no tokenizer is available
+_FALLBACK_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Joins streamed pages, as in the extracted text of a whole document
+PAGE_SEPARATOR = "\n\n"
+
+# Sentences tokenized per tokenizer call
+_ENCODE_BATCH = 256
+_MAX_HEADING_CHARS = 120
+
+
+class Segment(NamedTuple):
+    start: int
+    end: int
+    heading: bool
+    page: Optional[int]
+    offsets: List[Tuple[int, int]]  # Token character offsets relative to start
+
+    @property
+    def tokens(self) -> int:
+        return len(self.offsets)
+
+
+class TextBuffer:
+    """Parts of a streamed text that chunks can still reference, addressed by global offsets."""
+
+    def __init__(self):
+        self._parts: Deque[Tuple[int, str]] = deque()
+
+    def append(self, offset: int, text: str):
+        self._parts.append((offset, text))
+
+    def slice(self, start: int, end: int) -> str:
+        """Text between two global offsets."""
+        return "".join(
+            text[max(start - offset, 0):end - offset]
+            for offset, text in self._parts
+            if offset < end and offset + len(text) > start
+        )
+
+    def release(self, before: int):
+        """Drop parts that end before an offset."""
+        while self._parts and self._parts[0][0] + len(self._parts[0][1]) <= before:
+            self._parts.popleft()
+
+
+class Chunker:
+    """Packs sentences into token-bounded chunks."""
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        chunk_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
+    ):
+        """
+        Args:
+            model: Model whose tokenizer counts tokens (defaults to TXTAI_MODEL)
+            chunk_tokens: Maximum tokens per chunk (defaults to CHUNK_TOKENS)
+            overlap_tokens: Maximum tokens shared by consecutive chunks (defaults to CHUNK_OVERLAP_TOKENS)
+        """
+        self.model = model or settings.TXTAI_MODEL
+        self.chunk_tokens = chunk_tokens or settings.CHUNK_TOKENS
+        self.overlap_tokens = min(
+            overlap_tokens if overlap_tokens is not None else settings.CHUNK_OVERLAP_TOKENS,
+            self.chunk_tokens // 2
+        )
+
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+        self._tokenizer_lock = threading.Lock()
+
+    def iter_chunks(self, text: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield chunk dicts for a text.
+
+        Args:
+            text: Input text
+
+        Yields:
+            Chunk dicts with id, text and metadata (start, end, chunk_index, tokens)
+        """
+        return self._pack([(None, text)])
+
+    def iter_pages(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield chunk dicts for a document streamed page by page.
+
+        Only the pages the current chunk still refers to are kept in memory.
+        Chunks can span pages; `page` and `page_end` record the first and
+        last page of each chunk.
+
+        Args:
+            pages: (page_number, text) pairs in page order
+
+        Yields:
+            Chunk dicts with id, text and metadata (start, end, chunk_index, tokens, page, page_end)
+        """
+        return self._pack(pages)
+
+    def _pack(self, parts: Iterable[Tuple[Optional[int], str]]) -> Iterator[Dict[str, Any]]:
+        """Pack the segments of a streamed text into chunks."""
+        buffer = TextBuffer()
+        window: List[Segment] = []
+        fresh = 0  # Segments in the window not carried over from the previous chunk
+        size = 0
+        index = 0
+
+        for segment in self._segments(parts, buffer):
+            buffer.release(window[0].start if window else segment.start)
+            oversized = segment.tokens > self.chunk_tokens
+
+            # A heading right before a long sentence leads its first piece
+            lead: List[Segment] = []
+            if oversized and fresh and size <= self.chunk_tokens // 2 and all(item.heading for item in window):
+                lead, window, fresh, size = window, [], 0, 0
+
+            if window and fresh and (segment.heading or oversized or size + segment.tokens > self.chunk_tokens):
+                yield self._chunk(buffer, window[0], window[-1], size, index)
+                index += 1
+
+                # Carry whole trailing sentences, but never across a heading
+                window = [] if segment.heading or oversized else self._overlap(window)
+                fresh = 0
+                size = sum(item.tokens for item in window)
+            elif window and not fresh and (segment.heading or oversized):
+                window, size = [], 0
+
+            if oversized:
+                reserved = sum(item.tokens for item in lead)
+                for start, end, tokens in self._split(segment, reserved):
+                    first = segment._replace(start=start)
+                    if lead:
+                        first, tokens, lead = lead[0], tokens + reserved, []
+                    yield self._chunk(buffer, first, segment._replace(end=end), tokens, index)
+                    index += 1
+                continue
+
+            # Drop carried sentences until the new one fits
+            while window and size + segment.tokens > self.chunk_tokens:
+                size -= window.pop(0).tokens
+
+            window.append(segment)
+            fresh += 1
+            size += segment.tokens
+
+        if window and fresh:
+            yield self._chunk(buffer, window[0], window[-1], size, index)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in a text, without special tokens."""
+        return len(self._encode([text])[0])
+
+    def _overlap(self, window: List[Segment]) -> List[Segment]:
+        """Trailing segments of a chunk that fit in the overlap budget."""
+        carried: List[Segment] = []
+        size = 0
+        for segment in reversed(window):
+            if segment.heading or size + segment.tokens > self.overlap_tokens:
+                break
+            carried.insert(0, segment)
+            size += segment.tokens
+        # A chunk that is one long sentence carries nothing
+        return carried if len(carried) < len(window) else []
+
+    def _split(self, segment: Segment, reserved: int = 0) -> Iterator[Tuple[int, int, int]]:
+        """
+        Split an oversized segment into word-aligned (start, end, tokens) pieces.
+
+        The first piece leaves room for `reserved` tokens placed before it.
+        """
+        offsets = segment.offsets
+        first = 0
+        budget = self.chunk_tokens - reserved
+
+        while first < len(offsets):
+            last = min(first + budget, len(offsets))
+
+            # End before a token that starts a word, keeping at least half the budget
+            if last < len(offsets):
+                for candidate in range(last, first + budget // 2, -1):
+                    if self._starts_word(offsets, candidate):
+                        last = candidate
+                        break
+
+            yield (
+                segment.start + offsets[first][0],
+                segment.start + offsets[last - 1][1],
+                last - first
+            )
+            if last == len(offsets):
+                return
+
+            # Overlap the next piece, starting it at a word boundary
+            following = max(last - self.overlap_tokens, first + 1)
+            while following < last and not self._starts_word(offsets, following):
+                following += 1
+            first = following
+            budget = self.chunk_tokens
+
+    @staticmethod
+    def _starts_word(offsets: List[Tuple[int, int]], index: int) -> bool:
+        """Whether whitespace separates a token from the one before it."""
+        return index == 0 or offsets[index][0] > offsets[index - 1][1]
+
+    def _segments(self, parts: Iterable[Tuple[Optional[int], str]], buffer: TextBuffer) -> Iterator[Segment]:
+        """Sentences and headings with their token offsets, in document order."""
+        pending: List[Tuple[int, int, bool, Optional[int], str]] = []
+        offset = 0
+
+        for number, (page, text) in enumerate(parts):
+            if number:
+                buffer.append(offset, PAGE_SEPARATOR)
+                offset += len(PAGE_SEPARATOR)
+            buffer.append(offset, text)
+
+            for start, end, heading in self._spans(text):
+                pending.append((offset + start, offset + end, heading, page, text[start:end]))
+                if len(pending) >= _ENCODE_BATCH:
+                    yield from self._encode_spans(pending)
+                    pending = []
+            offset += len(text)
+
+        if pending:
+            yield from self._encode_spans(pending)
+
+    def _encode_spans(self, spans: List[Tuple[int, int, bool, Optional[int], str]]) -> Iterator[Segment]:
+        encoded = self._encode([span[-1] for span in spans])
+        for (start, end, heading, page, _), offsets in zip(spans, encoded):
+            if offsets:
+                yield Segment(start, end, heading, page, offsets)
+
+    def _spans(self, text: str) -> Iterator[Tuple[int, int, bool]]:
+        """(start, end, is_heading) character spans of headings and sentences."""
+        block_start = 0
+        for match in _BLOCK_BREAK.finditer(text):
+            yield from self._block_spans(text, block_start, match.start())
+            block_start = match.end()
+        yield from self._block_spans(text, block_start, len(text))
+
+    def _block_spans(self, text: str, start: int, end: int) -> Iterator[Tuple[int, int, bool]]:
+        # Trim surrounding whitespace so offsets point at text
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            return
+
+        block = text[start:end]
+        if self._is_heading(block):
+            yield start, end, True
+            return
+
+        sentence_start = 0
+        for match in _SENTENCE_END.finditer(block):
+            yield start + sentence_start, start + match.start() + len(match.group().rstrip()), False
+            sentence_start = match.end()
+        if sentence_start < len(block):
+            yield start + sentence_start, end, False
+
+    @staticmethod
+    def _is_heading(block: str) -> bool:
+        """Markdown headings, or short single lines without sentence punctuation."""
+        if "\n" in block:
+            return False
+        if _MARKDOWN_HEADING.match(block):
+            return True
+        return (
+            len(block) <= _MAX_HEADING_CHARS
+            and block[-1] not in ".!?:;,"
+            and not _SENTENCE_END.search(block)
+        )
+
+    def _encode(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        """Token character offsets for each text."""
+        tokenizer = self._load_tokenizer()
+        if tokenizer is None:
+            return [
+                [match.span() for match in _FALLBACK_TOKEN.finditer(text)]
+                for text in texts
+            ]
+
+        return [
+            [(start, end) for start, end in encoding.offsets if end > start]
+            for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)
+        ]
+
+    def _load_tokenizer(self):
+        """Fast tokenizer of the embedding model, or None to approximate by words."""
+        if self._tokenizer_loaded:
+            return self._tokenizer
+
+        with self._tokenizer_lock:
+            if not self._tokenizer_loaded:
+                try:
+                    from transformers import AutoTokenizer
+
+                    tokenizer = AutoTokenizer.from_pretrained(self.model)
+                    if not tokenizer.is_fast:
+                        raise ValueError("tokenizer has no fast implementation with offsets")
+
+                    # The Rust tokenizer is safe to share across threads once
+                    # truncation and padding are off
+                    backend = tokenizer.backend_tokenizer
+                    backend.no_truncation()
+                    backend.no_padding()
+                    self._tokenizer = backend
+                except Exception as e:
+                    logger.warning(
+                        f"Could not load tokenizer for {self.model}, approximating tokens by words: {e}"
+                    )
+                self._tokenizer_loaded = True
+
+        return self._tokenizer
+
+    @staticmethod
+    def _chunk(buffer: TextBuffer, first: Segment, last: Segment, tokens: int, index: int) -> Dict[str, Any]:
+        """Chunk dict covering first.start to last.end."""
+        metadata = {
+            "start": first.start,
+            "end": last.end,
+            "chunk_index": index,
+            "tokens": tokens
+        }
+        if first.page is not None:
+            metadata.update({"page": first.page, "page_end": last.page})
+
+        return {
+            "id": f"chunk_{index}",
+            "text": buffer.slice(first.start, last.end),
+            "metadata": metadata
+        }
+
+
+# Global instance
+chunker = Chunker()
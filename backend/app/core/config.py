@@ -15,24 +15,132 @@ class Settings(BaseSettings):
         default_factory=lambda: ["http://localhost:5173", "http://localhost:3000"]
     )
     
+    # Startup Settings
+    WARMUP_ENABLED: bool = True  # Load the index, model and AWS clients in the background at startup; /ready is 503 until done
+    
     # txtai Settings
     TXTAI_INDEX_PATH: str = "./data/txtai_index"  # Use local path by default, override with env var for AWS EFS
     TXTAI_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
-    CHUNK_SIZE: int = 500
-    CHUNK_OVERLAP: int = 100
+    CHUNKER: str = "token"  # "token" (sentence-aware, tokenizer-counted) or "character"
+    CHUNK_TOKENS: int = 200  # Keep below the model's max sequence length (256 for MiniLM)
+    CHUNK_OVERLAP_TOKENS: int = 32
+    CHUNK_SIZE: int = 500  # Character chunker only
+    CHUNK_OVERLAP: int = 100  # Character chunker only
+    INDEX_BATCH_SIZE: int = 256  # Chunks embedded and upserted per batch during ingestion
+    EMBEDDING_CACHE_MAX_VECTORS: int = 100000  # Chunk vectors kept in memory for reuse (~1.5 KB each for MiniLM)
+    EMBEDDING_STORE_ENABLED: bool = True  # Persist every chunk vector for reuse across restarts and rebuilds
+    EMBEDDING_STORE_PATH: str = ""  # Defaults to <TXTAI_INDEX_PATH>/vector-cache
+    EMBEDDING_STORE_DTYPE: str = "float32"  # "float16" halves disk use at a small precision cost
+    EMBEDDING_STORE_MAX_VECTORS: int = 0  # 0 for no limit
+    
+    # Vector Index Settings
+    INDEX_TYPE: str = "auto"  # auto, flat, ivf or hnsw
+    INDEX_COMPRESSION: str = "auto"  # auto, none, sq8 or pq (pq needs ivf)
+    INDEX_AUTO_IVF_MIN_VECTORS: int = 100000  # auto: exact flat search below this many vectors
+    INDEX_AUTO_COMPRESS_MIN_VECTORS: int = 1000000  # auto: SQ8 (4x smaller vectors) from this many
+    INDEX_IVF_NLIST: int = 0  # 0 derives 4 * sqrt(vectors)
+    INDEX_IVF_NPROBE: int = 0  # Lists searched per query, 0 for nlist / 16
+    INDEX_HNSW_M: int = 32
+    INDEX_HNSW_EF_CONSTRUCTION: int = 80
+    INDEX_HNSW_EF_SEARCH: int = 64
+    INDEX_PQ_M: int = 0  # PQ bytes per vector, 0 for dimensions / 8
+    INDEX_TRAIN_SAMPLE: float = 0.0  # Share of vectors IVF/PQ train on, 0 for all
+    INDEX_AUTO_TUNE: bool = True  # Rebuild once the corpus outgrows the index type
+    INDEX_MAX_DELETED_FRACTION: float = 0.1  # HNSW tombstones that trigger a rebuild
+    
+    # Index Sharding Settings
+    INDEX_SHARDS: int = 1  # Shard 0 at TXTAI_INDEX_PATH, the others in <TXTAI_INDEX_PATH>/shard-NN
+    INDEX_SHARD_PATHS: str = ""  # Comma-separated shard directories, e.g. one per volume; overrides INDEX_SHARDS
+    INDEX_SHARD_KEY: str = "document_id"  # Chunk metadata field hashed to pick a shard, e.g. a tenant id
+    
+    # Collection Settings
+    COLLECTION_MEMORY_BUDGET_MB: int = 0  # Unload least recently used collections above this vector index size; 0 = no limit
+    
+    # Read-only Serving Settings
+    INDEX_READ_ONLY: bool = False  # Serve the latest snapshot memory-mapped; uploads and deletes are rejected
+    INDEX_LOCAL_CACHE_PATH: str = ""  # Local copies of snapshots for read-only serving; defaults to a temp directory
+    INDEX_REFRESH_INTERVAL_SECONDS: float = 5.0  # How often read-only servers check for a newer snapshot; 0 disables
+    
+    # Ingestion Job Settings
+    INGESTION_WORKERS: int = 4
+    INGESTION_QUEUE_SIZE: int = 100  # Queued jobs before uploads are rejected with 429
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF_SECONDS: float = 5.0  # Doubled for every further retry
+    INGESTION_STORE_CONCURRENCY: int = 4  # Concurrent S3 uploads
+    INGESTION_PARSE_CONCURRENCY: int = 2  # Concurrent extraction and chunking
+    INGESTION_EMBED_CONCURRENCY: int = 1  # Concurrent embedding and index writes
+    INGESTION_SPOOL_DIR: str = ""  # Uploads waiting for their job; defaults to a temp directory
+    INGESTION_JOB_HISTORY: int = 1000  # Finished jobs kept for status polling
+    INGESTION_BULK_MAX_FILES: int = 10000  # Documents per bulk upload, archive members included
+    INGESTION_BULK_MAX_BYTES: int = 2147483648  # Total bulk upload size after unpacking archives
+    INGESTION_DEDUPLICATE: bool = True  # Skip uploads whose file content is already indexed
+    
+    # PDF Extraction Settings
+    PDF_WORKERS: int = 0  # Extraction processes, 0 uses the number of CPUs
+    PDF_PAGE_WINDOW: int = 32  # Pages extracted ahead of the chunker
+    PDF_PARALLEL_MIN_PAGES: int = 8  # Smaller PDFs are extracted in-process
+    
+    # Index Persistence Settings
+    INDEX_FLUSH_INTERVAL_SECONDS: float = 30.0  # 0 saves synchronously on every change
+    INDEX_FLUSH_MAX_PENDING: int = 5000  # Pending chunk changes that force an early flush
+    INDEX_SNAPSHOTS_TO_KEEP: int = 2
     
     # AWS Settings
     AWS_REGION: str = "us-east-1"
     AWS_S3_BUCKET: str = ""
     AWS_DYNAMODB_TABLE: str = "rag-metadata"
     
+    # Metadata Store Settings
+    METADATA_BACKEND: str = "sqlite"  # "dynamodb" stores records in AWS_DYNAMODB_TABLE
+    METADATA_SQLITE_PATH: str = ""  # Defaults to <TXTAI_INDEX_PATH>/metadata.sqlite
+    
     # Bedrock Settings
     BEDROCK_MODEL_ID: str = "anthropic.claude-v2"  # Options: anthropic.claude-v2, amazon.titan-text-lite-v1, meta.llama2-13b-chat-v1
     BEDROCK_MAX_TOKENS: int = 2048
     BEDROCK_TEMPERATURE: float = 0.7
+    BEDROCK_USE_STUB: bool = False  # Serve generation from a local stub instead of AWS
+    
+    # Generation Cache Settings
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_MAX_ENTRIES: int = 1000
+    GENERATION_CACHE_MAX_BYTES: int = 50_000_000
+    GENERATION_CACHE_TTL_SECONDS: float = 3600.0
+    GENERATION_CACHE_SEMANTIC: bool = False  # Match near-duplicate questions over the same chunks
+    GENERATION_CACHE_SEMANTIC_THRESHOLD: float = 0.95
     
     # Retrieval Settings
     TOP_K_RESULTS: int = 5
+    KEYWORD_INDEX_ENABLED: bool = True  # BM25 index kept next to the vector index
+    SEARCH_MODE: str = "hybrid"  # dense, keyword or hybrid; requests can override
+    HYBRID_FUSION: str = "rrf"  # rrf (reciprocal rank fusion) or weighted
+    HYBRID_RRF_K: int = 60
+    HYBRID_DENSE_WEIGHT: float = 0.5  # Dense share of weighted fusion scores
+    HYBRID_CANDIDATES: int = 50  # Results taken from each retriever before fusion
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_MAX_RESULTS: int = 2048  # Cached result lists, dropped on every index change
+    SEARCH_CACHE_MAX_VECTORS: int = 10000  # Cached query embeddings
+    SEARCH_FILTER_CACHE_SIZE: int = 256  # Resolved metadata filters, dropped on every index change
+    BATCH_QUERY_CHUNK_SIZE: int = 64  # Questions encoded per forward pass in /query/batch
+    BATCH_QUERY_MAX_QUESTIONS: int = 10000
+    QUERY_BATCH_ENABLED: bool = True  # Micro-batch concurrent /query calls
+    QUERY_BATCH_MAX_SIZE: int = 32
+    QUERY_BATCH_MAX_WAIT_MS: float = 5.0
+    RERANK_ENABLED: bool = False  # Rerank /query results with a cross-encoder; requests can override
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20  # First-stage results rescored per query
+    RERANK_BATCH_SIZE: int = 16  # (query, chunk) pairs per forward pass
+    RERANK_MAX_LENGTH: int = 256  # Tokens per pair
+    RERANK_BUDGET_MS: float = 150.0  # Keep first-stage order if reranking would take longer
+    CONTEXT_MAX_TOKENS: int = 3000  # Cap on retrieved context per prompt, 0 for the model's window only
+    CONTEXT_DEFAULT_WINDOW_TOKENS: int = 4096  # Context window of models not listed in context_builder
+    CONTEXT_CHARS_PER_TOKEN: float = 4.0  # Token estimate for budgeting
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.8  # Share of a chunk's text already in the context that drops it
+    
+    # Concurrency Settings
+    CPU_POOL_WORKERS: int = 0  # 0 uses the number of CPUs
+    CPU_POOL_QUEUE_SIZE: int = 32
+    IO_POOL_WORKERS: int = 16
+    IO_POOL_QUEUE_SIZE: int = 64
 
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
@@ -0,0 +1,222 @@
+"""
+Prompt context assembly from retrieved chunks.
+
+Consecutive chunks of a document share up to CHUNK_OVERLAP characters or
+CHUNK_OVERLAP_TOKENS tokens, so joining search results as they are repeats
+text. Chunks of the same document that overlap or touch, according to their
+start/end metadata, are merged into one passage. Passages that mostly repeat
+text already in the context, such as boilerplate copied across documents,
+are dropped. What's left is packed into a token budget derived from the
+target model's context window, best-ranked passages first.
+
+Bedrock doesn't expose its tokenizers, so tokens are estimated from the
+character count (CONTEXT_CHARS_PER_TOKEN).
+"""
+import math
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.txtai_client import chunk_document_id
+
+# Context windows in tokens by model id substring, most specific first
+MODEL_CONTEXT_WINDOWS = (
+    ("claude-3", 200000),
+    ("claude-v2:1", 200000),
+    ("claude", 100000),
+    ("titan-text-lite", 4096),
+    ("titan-text-express", 8192),
+    ("titan-text-premier", 32000),
+    ("llama3", 8192),
+    ("llama2", 4096),
+)
+
+# Tokens of the prompt template around the context and question
+_PROMPT_OVERHEAD_TOKENS = 32
+# Chunks this far apart still merge; the gap is whitespace between sentences
+_MAX_MERGE_GAP = 4
+# Stands in for a skipped gap of one, or more, whitespace characters
+_GAP = {1: " ", 2: "\n\n"}
+_WORD = re.compile(r"\w+")
+_SHINGLE_WORDS = 3
+
+
+class Passage(NamedTuple):
+    text: str
+    chunk_ids: List[str]
+    # Best search rank among the merged chunks, 0 for the top result
+    rank: int
+
+
+class AssembledContext(NamedTuple):
+    passages: List[Passage]
+    tokens: int
+    budget: int
+    # Chunks merged into a neighbour, dropped as near-duplicates, or left out for the budget
+    merged: int
+    duplicates: int
+    dropped: int
+    truncated: bool
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        return [uid for passage in self.passages for uid in passage.chunk_ids]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "passages": len(self.passages),
+            "merged": self.merged,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "truncated": self.truncated
+        }
+
+
+def context_window(model_id: str) -> int:
+    """Context window of a Bedrock model in tokens."""
+    model_id = model_id.lower()
+    for name, tokens in MODEL_CONTEXT_WINDOWS:
+        if name in model_id:
+            return tokens
+    return settings.CONTEXT_DEFAULT_WINDOW_TOKENS
+
+
+class ContextBuilder:
+    """Merges, deduplicates and budgets retrieved chunks into prompt context."""
+
+    def __init__(self, chars_per_token: float, max_tokens: int, duplicate_threshold: float):
+        """
+        Args:
+            chars_per_token: Characters per token for estimating token counts
+            max_tokens: Cap on context tokens regardless of the model, 0 for none
+            duplicate_threshold: Share of a passage's word shingles already in the
+                context at which it counts as a near-duplicate; above 1 disables
+        """
+        self.chars_per_token = chars_per_token
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+
+    def estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def budget(self, model_id: Optional[str] = None, max_tokens: Optional[int] = None, question: str = "") -> int:
+        """
+        Context tokens that fit next to the question and the generated answer.
+
+        Args:
+            model_id: Bedrock model (defaults to BEDROCK_MODEL_ID)
+            max_tokens: Tokens reserved for the answer (defaults to BEDROCK_MAX_TOKENS)
+            question: Question sent with the context
+        """
+        window = context_window(model_id or settings.BEDROCK_MODEL_ID)
+        budget = (
+            window
+            - (max_tokens or settings.BEDROCK_MAX_TOKENS)
+            - self.estimate_tokens(question)
+            - _PROMPT_OVERHEAD_TOKENS
+        )
+        if self.max_tokens > 0:
+            budget = min(budget, self.max_tokens)
+        return max(budget, 0)
+
+    def build(self, results: List[Dict[str, Any]], budget: int) -> AssembledContext:
+        """
+        Assemble context from search results.
+
+        Args:
+            results: Search results with id, text and metadata, best first
+            budget: Maximum context tokens, see budget()
+
+        Returns:
+            Passages in rank order with the chunks each one covers
+        """
+        passages = self._merge(results)
+        merged = len(results) - len(passages)
+
+        kept: List[Passage] = []
+        shingles: Set[Tuple[str, ...]] = set()
+        tokens = duplicates = dropped = 0
+        truncated = False
+        for passage in passages:
+            passage_shingles = self._shingles(passage.text)
+            if passage_shingles and self._covered(passage_shingles, shingles):
+                duplicates += len(passage.chunk_ids)
+                continue
+
+            # Passages are separated by a blank line
+            cost = self.estimate_tokens(passage.text) + (1 if kept else 0)
+            if tokens + cost > budget:
+                if kept or budget <= 0:
+                    # Smaller, lower-ranked passages may still fit
+                    dropped += len(passage.chunk_ids)
+                    continue
+                # Never return an empty context when the best passage alone is too long
+                passage = passage._replace(text=self._truncate(passage.text, budget))
+                cost = self.estimate_tokens(passage.text)
+                truncated = True
+
+            kept.append(passage)
+            shingles |= passage_shingles
+            tokens += cost
+
+        return AssembledContext(kept, tokens, budget, merged, duplicates, dropped, truncated)
+
+    def _merge(self, results: List[Dict[str, Any]]) -> List[Passage]:
+        """Join overlapping or touching chunks of the same document, ordered by best rank."""
+        spans: Dict[str, List[Tuple[int, int, str, str]]] = {}
+        passages: List[Passage] = []
+        for rank, result in enumerate(results):
+            start = (result.get("metadata") or {}).get("start")
+            if start is None:
+                passages.append(Passage(result["text"], [result["id"]], rank))
+                continue
+            spans.setdefault(chunk_document_id(result["id"]), []).append((start, rank, result["id"], result["text"]))
+
+        for chunks in spans.values():
+            chunks.sort()
+            text, ids, best, end = None, [], 0, 0
+            for start, rank, uid, chunk in chunks:
+                if text is not None and start <= end + _MAX_MERGE_GAP:
+                    if start + len(chunk) > end:
+                        # Offsets are into the document, so overlap is trimmed exactly;
+                        # the token chunker leaves out whitespace between blocks
+                        text += (_GAP[min(start - end, 2)] + chunk) if start > end else chunk[end - start:]
+                        end = start + len(chunk)
+                    ids.append(uid)
+                    best = min(best, rank)
+                    continue
+
+                if text is not None:
+                    passages.append(Passage(text, ids, best))
+                # The character chunker's end can run past the text, so the length is used
+                text, ids, best, end = chunk, [uid], rank, start + len(chunk)
+            passages.append(Passage(text, ids, best))
+
+        passages.sort(key=lambda passage: passage.rank)
+        return passages
+
+    def _covered(self, passage: Set[Tuple[str, ...]], context: Set[Tuple[str, ...]]) -> bool:
+        return len(passage & context) >= self.duplicate_threshold * len(passage)
+
+    @staticmethod
+    def _shingles(text: str) -> Set[Tuple[str, ...]]:
+        words = _WORD.findall(text.lower())
+        return {tuple(words[i:i + _SHINGLE_WORDS]) for i in range(max(len(words) - _SHINGLE_WORDS + 1, 0))}
+
+    def _truncate(self, text: str, budget: int) -> str:
+        """Cut text to a token budget at a word boundary."""
+        limit = int(budget * self.chars_per_token)
+        if len(text) <= limit:
+            return text
+        cut = text.rfind(" ", 0, limit + 1)
+        return text[:cut if cut > 0 else limit].rstrip()
+
+
+# Global instance
+context_builder = ContextBuilder(
+    chars_per_token=settings.CONTEXT_CHARS_PER_TOKEN,
+    max_tokens=settings.CONTEXT_MAX_TOKENS,
+    duplicate_threshold=settings.CONTEXT_DUPLICATE_THRESHOLD
+)
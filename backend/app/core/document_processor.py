@@ -5,8 +5,10 @@ from io import BytesIO
 from pypdf import PdfReader
 import markdown2
 import logging
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Tuple
 from app.core.config import settings
+from app.core.chunker import PAGE_SEPARATOR, chunker
+from app.core.pdf_extractor import pdf_extractor
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +46,19 @@ class DocumentProcessor:
             logger.error(f"Error processing PDF {filename}: {e}")
             raise
     
+    @staticmethod
+    def iter_pdf_pages(path: str) -> Iterator[Tuple[int, str]]:
+        """
+        Extract PDF pages in parallel, yielding them in order.
+        
+        Args:
+            path: Path of the PDF file
+        
+        Yields:
+            (page_number, text) pairs, numbered from 1
+        """
+        return pdf_extractor.iter_pages(path)
+    
     @staticmethod
     def process_markdown(file_content: bytes, filename: str) -> str:
         """
@@ -72,6 +87,45 @@ class DocumentProcessor:
             logger.error(f"Error processing Markdown {filename}: {e}")
             raise
     
+    @staticmethod
+    def iter_chunks(text: str) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily split text into chunks with the configured chunker.
+        
+        CHUNKER=token packs whole sentences up to CHUNK_TOKENS model tokens;
+        CHUNKER=character slices CHUNK_SIZE characters.
+        
+        Args:
+            text: Input text
+        
+        Yields:
+            Chunk dictionaries with id, text, and metadata
+        """
+        if settings.CHUNKER == "character":
+            yield from DocumentProcessor.chunk_text(text)
+        else:
+            yield from chunker.iter_chunks(text)
+    
+    @staticmethod
+    def iter_page_chunks(pages: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily chunk a document streamed page by page.
+        
+        The token chunker holds only the pages the current chunk refers to and
+        adds page/page_end to chunk metadata. The character chunker needs the
+        whole text and joins the pages first.
+        
+        Args:
+            pages: (page_number, text) pairs in page order
+        
+        Yields:
+            Chunk dictionaries with id, text, and metadata
+        """
+        if settings.CHUNKER == "character":
+            yield from DocumentProcessor.chunk_text(PAGE_SEPARATOR.join(text for _, text in pages))
+        else:
+            yield from chunker.iter_pages(pages)
+    
     @staticmethod
     def chunk_text(
         text: str,
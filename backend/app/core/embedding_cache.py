@@ -0,0 +1,151 @@
+"""
+Reuse of chunk embeddings across ingests.
+
+Chunk vectors are keyed by a hash of the chunk text. txtai encodes documents
+batch by batch in its vector model's batch(); EmbeddingCache.install replaces
+that step so chunks whose text was embedded before get the cached vector and
+only new text goes through the model. A new version of a document then only
+encodes the chunks that changed.
+
+Recently used vectors are kept in memory. With a VectorStore behind the
+cache, every encoded vector is also persisted, so reuse survives restarts and
+index rebuilds only encode text the store hasn't seen.
+"""
+import hashlib
+import logging
+import pickle
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.lru_cache import LRUCache
+from app.core.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    """Hex SHA-256 of file or chunk content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache of chunk vectors keyed by chunk text hash, in memory and optionally on disk."""
+
+    def __init__(self, max_vectors: int, store: Optional[VectorStore] = None):
+        """
+        Args:
+            max_vectors: Maximum number of vectors cached in memory
+            store: Persistent store consulted on memory misses
+        """
+        self.store = store
+        self._vectors = LRUCache(max_vectors)
+        self._lock = threading.Lock()
+        self._encoded = 0
+        self._reused = 0
+
+    def install(self, embeddings):
+        """
+        Route an Embeddings instance's document encoding through the cache.
+
+        Covers the current vector model and any model loaded later, e.g. by
+        Embeddings.load.
+        """
+        loadvectors = embeddings.loadvectors
+
+        def load():
+            model = loadvectors()
+            if model is not None:
+                self._wrap(model)
+            return model
+
+        embeddings.loadvectors = load
+        if embeddings.model is not None:
+            self._wrap(embeddings.model)
+
+    def encode(self, model, texts: List[Any]) -> np.ndarray:
+        """
+        Vectors for prepared document texts, encoding only uncached ones.
+
+        Args:
+            model: txtai vector model
+            texts: Texts as prepared by the model for indexing
+
+        Returns:
+            Array with one vector per text, in order
+        """
+        keys = [self._key(text) for text in texts]
+
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, Any] = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self._vectors.get(key)
+            if vector is not None:
+                vectors[key] = vector
+            else:
+                missing[key] = text
+
+        if missing and self.store is not None:
+            for key, vector in self.store.get_many(list(missing)).items():
+                vectors[key] = vector
+                self._vectors.put(key, vector)
+                del missing[key]
+
+        if missing:
+            encoded = np.asarray(model.encode(list(missing.values())), dtype=np.float32)
+            for key, vector in zip(missing, encoded):
+                vectors[key] = vector
+                self._vectors.put(key, vector)
+            if self.store is not None:
+                self.store.put_many(list(missing), encoded)
+
+        with self._lock:
+            self._encoded += len(missing)
+            self._reused += len(texts) - len(missing)
+
+        return np.array([vectors[key] for key in keys], dtype=np.float32)
+
+    def prefetch(self, embeddings, texts: List[str]):
+        """
+        Encode document texts ahead of indexing them into an Embeddings instance.
+
+        The index update then finds every vector cached, so callers can run
+        the model before taking the index lock and hold it only for the update.
+        """
+        model = embeddings.model
+        if model is not None and texts:
+            self.encode(model, [model.prepare(text, "data") for text in texts])
+
+    def clear(self):
+        """Drop vectors cached in memory; the store is kept."""
+        self._vectors.clear()
+
+    def close(self):
+        """Close the persistent store."""
+        if self.store is not None:
+            self.store.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache sizes, hit rates and how many chunk encodings were avoided."""
+        stats = self._vectors.get_stats()
+        with self._lock:
+            stats.update({"encoded": self._encoded, "reused": self._reused})
+        stats["store"] = self.store.get_stats() if self.store is not None else None
+        return stats
+
+    def _wrap(self, model):
+        """Replace the model's batch step, which txtai calls for every indexing batch."""
+        def batch(documents: List[Tuple[Any, Any, Any]], output) -> Tuple[List[Any], Optional[int]]:
+            ids = [uid for uid, _, _ in documents]
+            embeddings = self.encode(model, [model.prepare(data, "data") for _, data, _ in documents])
+            pickle.dump(embeddings, output, protocol=pickle.DEFAULT_PROTOCOL)
+            return ids, embeddings.shape[1]
+
+        model.batch = batch
+
+    @staticmethod
+    def _key(text: Any) -> str:
+        return content_hash(text.encode("utf-8") if isinstance(text, str) else pickle.dumps(text))
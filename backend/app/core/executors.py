@@ -0,0 +1,188 @@
+"""
+Bounded thread pools for running blocking work off the event loop.
+
+CPU-bound work (document parsing, embedding) and I/O-bound work (S3, Bedrock)
+run on separate pools so a slow Bedrock call can't starve query encoding and
+vice versa. Each pool caps the number of queued calls; once the cap is reached
+new work is rejected with PoolSaturatedError, which routers map to HTTP 429.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Marks the end of an iterator consumed with BoundedExecutor.iterate
+_END = object()
+
+
+class PoolSaturatedError(Exception):
+    """Raised when an executor's queue is full."""
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded queue and queue-depth metrics."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-pool"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._peak_queue_depth = 0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the pool and await its result.
+
+        Raises:
+            PoolSaturatedError: If the pool's queue is full
+        """
+        future = self._submit(functools.partial(fn, *args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    def iterate(self, fn: Callable[..., Iterator], *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Consume a blocking iterator on the pool, yielding its items on the event loop.
+
+        The call is admitted immediately, so saturation is reported before a
+        streaming response starts. The iterator holds one pool slot until it is
+        exhausted or the consumer stops reading.
+
+        Raises:
+            PoolSaturatedError: If the pool's queue is full
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def produce():
+            iterator = None
+            try:
+                iterator = iter(fn(*args, **kwargs))
+                for item in iterator:
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (_END, e))
+            else:
+                loop.call_soon_threadsafe(queue.put_nowait, (_END, None))
+            finally:
+                # Release the underlying stream when the consumer went away early
+                if hasattr(iterator, "close"):
+                    iterator.close()
+
+        self._submit(produce)
+
+        async def consume():
+            try:
+                while True:
+                    item, error = await queue.get()
+                    if error is not None:
+                        raise error
+                    if item is _END:
+                        return
+                    yield item
+            finally:
+                stopped.set()
+
+        return consume()
+
+    def _submit(self, call: Callable) -> Future:
+        """Admit a call to the pool, rejecting it when the queue is full."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PoolSaturatedError(
+                    f"{self.name} pool is saturated, retry later"
+                )
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(self._call, call)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        with self._lock:
+            self._peak_queue_depth = max(self._peak_queue_depth, self._pending - self._active)
+
+        return future
+
+    def _call(self, call: Callable) -> Any:
+        """Execute a call, tracking active and pending counts."""
+        with self._lock:
+            self._active += 1
+        try:
+            result = call()
+        except BaseException:
+            with self._lock:
+                self._failed += 1
+            raise
+        else:
+            with self._lock:
+                self._completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._pending -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queue_depth": self._pending - self._active,
+                "peak_queue_depth": self._peak_queue_depth,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self):
+        """Stop accepting work and wait for running calls to finish."""
+        self._executor.shutdown(wait=True)
+
+
+def get_executor_stats() -> Dict[str, Any]:
+    """Stats for every pool."""
+    return {
+        executor.name: executor.get_stats()
+        for executor in (cpu_executor, io_executor)
+    }
+
+
+# Parsing, chunking, encoding and search
+cpu_executor = BoundedExecutor(
+    "cpu",
+    max_workers=settings.CPU_POOL_WORKERS or os.cpu_count() or 2,
+    max_queue=settings.CPU_POOL_QUEUE_SIZE
+)
+
+# S3 and Bedrock calls
+io_executor = BoundedExecutor(
+    "io",
+    max_workers=settings.IO_POOL_WORKERS,
+    max_queue=settings.IO_POOL_QUEUE_SIZE
+)
@@ -0,0 +1,42 @@
+"""
+Fixed-bucket histogram for latency and size metrics.
+"""
+import bisect
+import threading
+from typing import Any, Dict, Sequence
+
+
+class Histogram:
+    """Per-bucket counts plus count, sum and max of observations."""
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+        Args:
+            buckets: Ascending upper bounds; larger values land in an overflow bucket
+        """
+        self.buckets = sorted(buckets)
+
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value: float):
+        """Record one observation."""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Count, mean, max and per-bucket counts keyed by upper bound."""
+        with self._lock:
+            labels = [f"<={bound:g}" for bound in self.buckets] + [f">{self.buckets[-1]:g}"]
+            return {
+                "count": self._count,
+                "mean": round(self._sum / self._count, 4) if self._count else 0.0,
+                "max": round(self._max, 4),
+                "buckets": dict(zip(labels, self._counts))
+            }
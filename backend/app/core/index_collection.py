@@ -0,0 +1,458 @@
+"""
+Named search indexes, loaded on demand.
+
+A collection is a complete index in its own directories: its shards, their
+keyword indexes and snapshots. Documents of different collections never
+share a search space, so each team or tenant can search only its own.
+TxtaiClient keeps a registry of collections; one is loaded the first time
+it is used and unloaded again when the loaded collections outgrow
+COLLECTION_MEMORY_BUDGET_MB, least recently used first.
+"""
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embedding_cache import EmbeddingCache
+from app.core.index_shard import CHUNK_ID_SEPARATOR, IndexShard, ShardResults
+from app.core.lru_cache import LRUCache
+from app.core.metadata_store import DEFAULT_COLLECTION, ChunkRecord, DocumentFilter, metadata_store
+
+logger = logging.getLogger(__name__)
+
+# Directory of the named collections, below TXTAI_INDEX_PATH or each INDEX_SHARD_PATHS entry
+COLLECTIONS_DIRECTORY = "collections"
+
+# Collection names are directory names
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+class CollectionError(ValueError):
+    """Raised for invalid collection names."""
+
+
+class CollectionNotFoundError(CollectionError):
+    """Raised when searching a collection nothing was ever indexed into."""
+
+
+def chunk_document_id(chunk_id: str) -> str:
+    """Document id a chunk id belongs to."""
+    return chunk_id.rsplit(CHUNK_ID_SEPARATOR, 1)[0]
+
+
+def collection_name(name: Optional[str]) -> str:
+    """
+    Validate a requested collection name.
+
+    Args:
+        name: Collection name; None or empty selects the default collection
+
+    Raises:
+        CollectionError: If the name is not 1-64 letters, digits, '_' or '-'
+    """
+    if not name:
+        return DEFAULT_COLLECTION
+    if not COLLECTION_NAME.match(name):
+        raise CollectionError(
+            f"Invalid collection name: {name}. Use 1-64 letters, digits, '_' or '-', starting with a letter or digit"
+        )
+    return name
+
+
+def shard_paths(collection: str = DEFAULT_COLLECTION) -> List[str]:
+    """
+    Shard directories of a collection.
+
+    The default collection keeps the layout from before collections existed:
+    INDEX_SHARD_PATHS, else TXTAI_INDEX_PATH and INDEX_SHARDS - 1 below it.
+    Other collections use the same layout below a collections/<name> directory.
+    """
+    paths = [path.strip() for path in settings.INDEX_SHARD_PATHS.split(",") if path.strip()]
+    if paths:
+        if collection == DEFAULT_COLLECTION:
+            return paths
+        return [os.path.join(path, COLLECTIONS_DIRECTORY, collection) for path in paths]
+
+    root = settings.TXTAI_INDEX_PATH
+    if collection != DEFAULT_COLLECTION:
+        root = os.path.join(root, COLLECTIONS_DIRECTORY, collection)
+    # The first shard keeps the unsharded layout, so an existing index is
+    # still searched after shards are added
+    return [root] + [os.path.join(root, f"shard-{i:02d}") for i in range(1, settings.INDEX_SHARDS)]
+
+
+def collection_names() -> List[str]:
+    """Collections with an index on disk, the default first."""
+    root = os.path.join(shard_paths()[0], COLLECTIONS_DIRECTORY)
+    names = sorted(os.listdir(root)) if os.path.isdir(root) else []
+    return [DEFAULT_COLLECTION] + [
+        name for name in names
+        if name != DEFAULT_COLLECTION and COLLECTION_NAME.match(name) and os.path.isdir(os.path.join(root, name))
+    ]
+
+
+def collection_exists(name: str) -> bool:
+    return name == DEFAULT_COLLECTION or os.path.isdir(shard_paths(name)[0])
+
+
+class IndexCollection:
+    """
+    One named index, split into shards (see IndexShard).
+
+    Chunks are routed to a shard by a stable hash of their INDEX_SHARD_KEY
+    metadata field, the document id by default, so all chunks of a document
+    share a shard. Searches run on every shard in parallel and the candidates
+    are merged by score.
+
+    The shards are only loaded while the collection is in use or cached:
+    acquire() loads them if needed and pins the collection until release(),
+    and unload() flushes and frees an idle collection.
+    """
+
+    def __init__(self, name: str, models: Dict[str, Any], embedding_cache: EmbeddingCache):
+        """
+        Args:
+            name: Collection name, see collection_name
+            models: txtai model cache, shared so all collections load the embedding model once
+            embedding_cache: Chunk vector cache, shared by all collections
+        """
+        self.name = name
+        self.paths = shard_paths(name)
+        self.shards: Optional[List[IndexShard]] = None
+
+        self._models = models
+        self._embedding_cache = embedding_cache
+        self._pool = None
+        # Guards loading and unloading, and the count of callers using the shards
+        self._lock = threading.Lock()
+        self._users = 0
+
+        # Filter chunk ids per DocumentFilter, valid for one revision
+        self._selections = LRUCache(settings.SEARCH_FILTER_CACHE_SIZE)
+        # Incremented by every shard write
+        self.revision = 0
+
+        self.last_used = 0.0
+        self.loads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.shards is not None
+
+    def acquire(self) -> bool:
+        """
+        Load the collection if needed and keep it loaded until release().
+
+        Returns:
+            True if this call loaded it
+        """
+        with self._lock:
+            self._users += 1
+            self.last_used = time.monotonic()
+            if self.shards is not None:
+                return False
+            try:
+                self._load()
+            except Exception:
+                self._users -= 1
+                raise
+            return True
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+
+    def _load(self):
+        start = time.perf_counter()
+        self.shards = [IndexShard(path, self._models, self._embedding_cache) for path in self.paths]
+        if len(self.shards) > 1:
+            # Faiss and SQLite release the GIL, so shards search in parallel on threads
+            self._pool = ThreadPoolExecutor(
+                max_workers=len(self.shards), thread_name_prefix=f"index-shard-{self.name}"
+            )
+        self.loads += 1
+        logger.info(
+            f"Loaded collection {self.name}: {len(self.shards)} shard(s), {self.count()} chunks "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+    def unload(self, force: bool = False) -> bool:
+        """
+        Save pending changes and free the shards.
+
+        Args:
+            force: Unload even while in use, at shutdown
+
+        Returns:
+            True if the collection was unloaded
+        """
+        with self._lock:
+            if self.shards is None or (self._users and not force):
+                return False
+            for shard in self.shards:
+                shard.close()
+            if self._pool is not None:
+                self._pool.shutdown()
+            self.shards, self._pool = None, None
+            self._selections.clear()
+            return True
+
+    def count(self) -> int:
+        return sum(shard.count() for shard in self.shards)
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the vector indexes, 0 when unloaded."""
+        return sum(shard.memory_bytes() for shard in self.shards or [])
+
+    def shard(self, document_id: str, metadata: Optional[Dict[str, Any]] = None) -> IndexShard:
+        """Shard a document's chunks are written to."""
+        if len(self.shards) == 1:
+            return self.shards[0]
+
+        key = None
+        if settings.INDEX_SHARD_KEY != "document_id":
+            key = (metadata or {}).get(settings.INDEX_SHARD_KEY)
+        # A digest is stable across processes, unlike hash(), and spreads similar keys
+        value = str(key) if key is not None else document_id
+        digest = hashlib.sha256(value.encode("utf-8")).digest()
+        return self.shards[int.from_bytes(digest[:8], "big") % len(self.shards)]
+
+    def _home_shard(self, document_id: str, chunk_ids: List[str]) -> Optional[IndexShard]:
+        """Shard the current chunks of a document were routed to, None if unknown."""
+        if len(self.shards) == 1 or settings.INDEX_SHARD_KEY == "document_id":
+            return self.shard(document_id)
+        if not chunk_ids:
+            return None
+
+        metadata = metadata_store.hydrate({chunk_ids[0]: document_id}).get(chunk_ids[0])
+        return self.shard(document_id, metadata) if metadata is not None else None
+
+    def _scatter(self, function: Callable[[IndexShard], Any]) -> List[Any]:
+        """Call a function on every shard, in parallel when there are several."""
+        if self._pool is None:
+            return [function(self.shards[0])]
+        return list(self._pool.map(function, self.shards))
+
+    def rebuild(self, config: Optional[Dict[str, Any]] = None) -> int:
+        """Rebuild the vector index of every shard, see TxtaiClient.rebuild."""
+        count = 0
+        for shard in self.shards:
+            count += shard.rebuild(config)
+            self.revision += 1
+        return count
+
+    def retune(self, shards: Iterable[IndexShard]) -> bool:
+        """
+        Rebuild shards whose chunks have outgrown their index type, see ann_index.rebuild_reason.
+
+        Returns:
+            True if any shard was rebuilt
+        """
+        if not settings.INDEX_AUTO_TUNE:
+            return False
+        rebuilt = False
+        for shard in shards:
+            if shard.retune():
+                self.revision += 1
+                rebuilt = True
+        return rebuilt
+
+    def upsert(self, documents: Iterable[Dict[str, Any]]) -> Tuple[List[str], List[IndexShard]]:
+        """Upsert documents in INDEX_BATCH_SIZE batches, returning their ids and the shards written."""
+        ids, shards = [], []
+        iterator = iter(documents)
+
+        while True:
+            batch = list(itertools.islice(iterator, settings.INDEX_BATCH_SIZE))
+            if not batch:
+                return ids, shards
+
+            routed: Dict[IndexShard, List[Dict[str, Any]]] = {}
+            for doc in batch:
+                routed.setdefault(self.shard(chunk_document_id(doc["id"]), doc.get("metadata")), []).append(doc)
+
+            # Writers lock one shard per batch, so searches interleave with long ingests
+            for shard, docs in routed.items():
+                # Metadata goes first, so searches never find a chunk without it
+                metadata_store.put_chunks([
+                    ChunkRecord(doc["id"], chunk_document_id(doc["id"]), doc.get("metadata") or {})
+                    for doc in docs
+                ])
+                try:
+                    shard.upsert(docs)
+                except Exception:
+                    self._discard_metadata(shard, [doc["id"] for doc in docs])
+                    raise
+                self.revision += 1
+                if shard not in shards:
+                    shards.append(shard)
+            ids.extend(doc["id"] for doc in batch)
+
+    def _discard_metadata(self, shard: IndexShard, ids: List[str]):
+        """
+        Delete the metadata written for chunks a failed upsert didn't index.
+
+        Chunks the shard still holds from an earlier version keep theirs.
+        """
+        documents: Dict[str, List[str]] = {}
+        for uid in ids:
+            documents.setdefault(chunk_document_id(uid), []).append(uid)
+
+        try:
+            for document_id, chunk_ids in documents.items():
+                indexed = set(shard.chunk_ids(document_id))
+                metadata_store.delete_chunks(document_id, [uid for uid in chunk_ids if uid not in indexed])
+        except Exception as e:
+            logger.error(f"Error discarding metadata of chunks that failed to index: {e}")
+
+    def delete_stale(
+        self,
+        document_id: str,
+        keep_ids: Optional[List[str]] = None
+    ) -> Tuple[List[str], List[IndexShard]]:
+        """
+        Delete a document's chunks, except keep_ids in the shard they are routed to.
+
+        Every shard is checked, in case the document was routed elsewhere
+        under an earlier shard configuration.
+
+        Args:
+            document_id: Document identifier used as the chunk id prefix
+            keep_ids: Chunk ids of the current version; None deletes every chunk
+
+        Returns:
+            Ids of the deleted chunks and the shards they were deleted from
+        """
+        keep = keep_ids or []
+        home = self._home_shard(document_id, keep) if keep else None
+
+        stale, shards = [], []
+        for shard in self.shards:
+            ids = shard.delete_stale(document_id, keep if home in (None, shard) else ())
+            if ids:
+                self.revision += 1
+                stale.extend(ids)
+                shards.append(shard)
+        if stale:
+            metadata_store.delete_chunks(document_id, stale)
+        return stale, shards
+
+    def row_metadata(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Metadata kept in content store rows, by chunks indexed before the metadata store."""
+        metadata: Dict[str, Dict[str, Any]] = {}
+        missing = ids
+        for shard in self.shards:
+            if not missing:
+                break
+            metadata.update(shard.row_metadata(missing))
+            missing = [uid for uid in missing if uid not in metadata]
+        return metadata
+
+    def search(
+        self,
+        queries: List[str],
+        vectors: Optional[np.ndarray],
+        limit: int,
+        mode: str,
+        filters: Optional[DocumentFilter] = None
+    ) -> ShardResults:
+        """
+        Search candidates for a batch of queries in every shard.
+
+        Returns:
+            The best limit dense and keyword candidates per query across shards,
+            with the texts of all of them
+        """
+        # Filters resolve to chunk ids through the metadata store, once per index change
+        chunk_ids = None
+        if filters is not None:
+            revision = self.revision
+            cached = self._selections.get(filters)
+            if cached is not None and cached[0] == revision:
+                chunk_ids = cached[1]
+            else:
+                chunk_ids = metadata_store.find_chunks(filters._replace(collection=self.name))
+                self._selections.put(filters, (revision, chunk_ids))
+
+        parts: List[ShardResults] = self._scatter(
+            lambda shard: shard.search(queries, vectors, limit, mode, filters, chunk_ids)
+        )
+
+        # Similarity scores are comparable across shards; BM25 scores use
+        # each shard's term statistics, which agree closely for hashed routing
+        return ShardResults(
+            self._gather([part.dense for part in parts], limit) if mode != "keyword" else None,
+            self._gather([part.sparse for part in parts], limit) if mode != "dense" else None,
+            {uid: text for part in parts for uid, text in part.texts.items()}
+        )
+
+    @staticmethod
+    def _gather(parts: List[List[List[Tuple[str, float]]]], limit: int) -> List[List[Tuple[str, float]]]:
+        """Merge per-shard candidate lists into the best limit per query."""
+        if len(parts) == 1:
+            return parts[0]
+        return [
+            heapq.nlargest(limit, itertools.chain.from_iterable(results), key=lambda item: item[1])
+            for results in zip(*parts)
+        ]
+
+    def refresh(self) -> bool:
+        """
+        Load snapshots published by the writer since, on a read-only server; see IndexShard.refresh.
+
+        Returns:
+            True if any shard switched to a newer snapshot
+        """
+        with self._lock:
+            if self.shards is None:
+                return False
+            # Pinned like a search, so the collection isn't unloaded meanwhile
+            self._users += 1
+            shards = self.shards
+        try:
+            refreshed = False
+            for shard in shards:
+                if shard.refresh():
+                    self.revision += 1
+                    refreshed = True
+            return refreshed
+        finally:
+            self.release()
+
+    def invalidate(self):
+        """Drop resolved filters after an index change."""
+        self._selections.clear()
+
+    def flush(self) -> bool:
+        """Persist pending index changes of every shard immediately."""
+        return any([shard.flush() for shard in self.shards or []])
+
+    def get_stats(self) -> Dict[str, Any]:
+        shards = self.shards
+        stats = {
+            "name": self.name,
+            "loaded": shards is not None,
+            "users": self._users,
+            "loads": self.loads,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1) if self.last_used else None,
+            "documents": None,
+            "memory_bytes": 0
+        }
+        if shards is not None:
+            shard_stats = [shard.get_stats() for shard in shards]
+            stats.update({
+                "documents": sum(shard["documents"] for shard in shard_stats),
+                "memory_bytes": sum((shard["ann"] or {}).get("bytes", 0) for shard in shard_stats),
+                "shards": shard_stats,
+                "filter_cache": self._selections.get_stats()
+            })
+        return stats
@@ -0,0 +1,270 @@
+"""
+Write-behind persistence for the txtai index.
+
+Index changes are recorded as pending and flushed by a background thread once
+the flush interval has elapsed or enough changes have accumulated. Every flush
+writes a complete snapshot into a temporary directory, renames it into place
+and then atomically repoints the `index` symlink at it, so readers never see a
+partially written index.
+
+A snapshot directory has a single writer: lock_writer() holds an exclusive
+lock on it for as long as a process has the index open for writing. Other
+processes serve the published snapshots read-only (see snapshot_cache).
+"""
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = "index-"
+LINK_NAME = "index"
+WRITER_LOCK = ".writer.lock"
+
+
+class WriterLockedError(RuntimeError):
+    """Another process has the index open for writing."""
+
+
+def lock_writer(index_path: str):
+    """
+    Take the exclusive writer lock of a snapshot directory.
+
+    The lock is released when the returned file is closed, or when the
+    process exits.
+
+    Raises:
+        WriterLockedError: If another process holds it
+    """
+    lock = open(os.path.join(index_path, WRITER_LOCK), "a+")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        raise WriterLockedError(
+            f"Index in {index_path} is open for writing in another process; "
+            "start other servers with INDEX_READ_ONLY=true"
+        )
+
+    # Tells whoever finds the lock taken who holds it
+    lock.truncate(0)
+    lock.write(f"{os.getpid()}\n")
+    lock.flush()
+    return lock
+
+
+class IndexPersistenceManager:
+    """Coalesces index changes into periodic atomic snapshot saves."""
+
+    def __init__(
+        self,
+        save: Callable[[str], None],
+        index_path: str,
+        interval: float,
+        max_pending: int,
+        keep_snapshots: int = 2
+    ):
+        """
+        Args:
+            save: Callable writing the full index to the given directory
+            index_path: Directory holding snapshots and the `index` link
+            interval: Seconds to wait after the first pending change before flushing
+            max_pending: Number of pending changes that triggers an immediate flush
+            keep_snapshots: Number of snapshots retained on disk
+        """
+        self._save = save
+        self.index_path = index_path
+        self.interval = interval
+        self.max_pending = max_pending
+        self.keep_snapshots = max(keep_snapshots, 1)
+
+        self._state_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._pending = 0
+        self._first_pending_at: Optional[float] = None
+        self._flush_count = 0
+        self._failed_flushes = 0
+        self._last_flush_at: Optional[float] = None
+        self._last_flush_seconds: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    @property
+    def link_path(self) -> str:
+        """Path of the symlink pointing at the current snapshot."""
+        return os.path.join(self.index_path, LINK_NAME)
+
+    def start(self):
+        """Start the background flush thread."""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(
+                target=self._run,
+                name="index-persistence",
+                daemon=True
+            )
+            self._thread.start()
+
+    def close(self):
+        """Stop the background thread and flush any pending changes."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def mark_dirty(self, changes: int = 1):
+        """
+        Record index changes that have not been persisted yet.
+
+        With a non-positive interval the index is flushed synchronously.
+        """
+        with self._state_lock:
+            self._pending += changes
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            pending = self._pending
+
+        if self.interval <= 0:
+            self.flush()
+        elif pending >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self) -> bool:
+        """
+        Write a new snapshot if there are pending changes.
+
+        Returns:
+            True if a snapshot was written
+        """
+        with self._flush_lock:
+            with self._state_lock:
+                pending, first_pending_at = self._pending, self._first_pending_at
+                self._pending, self._first_pending_at = 0, None
+
+            if not pending:
+                return False
+
+            started = time.monotonic()
+            try:
+                snapshot = self._write_snapshot()
+            except Exception as e:
+                # Put the changes back so the next flush retries them
+                with self._state_lock:
+                    self._pending += pending
+                    if self._first_pending_at is None or first_pending_at < self._first_pending_at:
+                        self._first_pending_at = first_pending_at
+                    self._failed_flushes += 1
+                    self._last_error = str(e)
+                logger.error(f"Error flushing index: {e}")
+                return False
+
+            elapsed = time.monotonic() - started
+            with self._state_lock:
+                self._flush_count += 1
+                self._last_flush_at = time.time()
+                self._last_flush_seconds = elapsed
+                self._last_error = None
+
+            logger.info(f"Flushed {pending} index changes to {snapshot} in {elapsed:.2f}s")
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Flush and lag metrics."""
+        with self._state_lock:
+            lag = time.monotonic() - self._first_pending_at if self._first_pending_at else 0.0
+            return {
+                "pending_changes": self._pending,
+                "lag_seconds": round(lag, 3),
+                "flush_count": self._flush_count,
+                "failed_flushes": self._failed_flushes,
+                "last_flush_at": (
+                    datetime.utcfromtimestamp(self._last_flush_at).isoformat()
+                    if self._last_flush_at else None
+                ),
+                "last_flush_seconds": (
+                    round(self._last_flush_seconds, 3)
+                    if self._last_flush_seconds is not None else None
+                ),
+                "last_error": self._last_error,
+                "snapshot": self.current_snapshot(),
+                "flush_interval_seconds": self.interval,
+                "flush_max_pending": self.max_pending
+            }
+
+    def current_snapshot(self) -> Optional[str]:
+        """Name of the snapshot the `index` link points at."""
+        if os.path.islink(self.link_path):
+            return os.readlink(self.link_path)
+        return LINK_NAME if os.path.exists(self.link_path) else None
+
+    def _run(self):
+        """Background loop flushing once the interval or pending threshold is reached."""
+        while not self._stopped.is_set():
+            with self._state_lock:
+                first_pending_at, pending = self._first_pending_at, self._pending
+
+            if first_pending_at is None:
+                timeout = self.interval
+            else:
+                timeout = max(self.interval - (time.monotonic() - first_pending_at), 0)
+
+            if pending >= self.max_pending or (first_pending_at is not None and timeout == 0):
+                if not self.flush():
+                    # Back off before retrying a failed flush
+                    self._stopped.wait(self.interval)
+                continue
+
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _write_snapshot(self) -> str:
+        """Save into a temporary directory, rename it and swap the `index` link."""
+        name = f"{SNAPSHOT_PREFIX}{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+        final = os.path.join(self.index_path, name)
+        temp = os.path.join(self.index_path, f".{name}.tmp")
+
+        try:
+            self._save(temp)
+            os.rename(temp, final)
+        except Exception:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+
+        # Indexes saved before snapshots existed are a plain directory at the link path
+        if os.path.isdir(self.link_path) and not os.path.islink(self.link_path):
+            os.rename(self.link_path, os.path.join(self.index_path, f"{SNAPSHOT_PREFIX}0-legacy"))
+
+        link = os.path.join(self.index_path, f".{LINK_NAME}.tmp")
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(name, link)
+        os.replace(link, self.link_path)
+
+        self._prune(name)
+        return name
+
+    def _prune(self, current: str):
+        """Remove snapshots beyond the retention count, oldest first."""
+        older = [name for name in self._snapshots() if name != current]
+        keep = self.keep_snapshots - 1
+        stale = older[:len(older) - keep] if keep else older
+
+        for name in stale:
+            shutil.rmtree(os.path.join(self.index_path, name), ignore_errors=True)
+
+    def _snapshots(self) -> List[str]:
+        """Snapshot directory names sorted oldest first."""
+        return sorted(
+            name for name in os.listdir(self.index_path)
+            if name.startswith(SNAPSHOT_PREFIX)
+            and os.path.isdir(os.path.join(self.index_path, name))
+        )
@@ -0,0 +1,581 @@
+"""
+One partition of the search index.
+
+A shard owns a txtai embeddings index with its content database, the BM25
+keyword index over the same chunks, and write-behind snapshots in its own
+directory. Each shard has its own lock and persistence, so a write only
+blocks and saves the shard it lands in. IndexCollection routes documents
+to shards and merges their search results.
+
+Read-only shards serve a local copy of the current snapshot with the
+vector index and both databases memory-mapped, see snapshot_cache. They
+have no working files and no persistence, and reject writes. refresh()
+swaps in the snapshot a writer in another process published since.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core import ann_index, filtered_ann, snapshot_cache
+from app.core.config import settings
+from app.core.embedding_cache import EmbeddingCache
+from app.core.index_persistence import LINK_NAME, IndexPersistenceManager, lock_writer
+from app.core.keyword_index import KeywordIndex
+from app.core.lru_cache import LRUCache
+from app.core.metadata_store import DocumentFilter
+
+logger = logging.getLogger(__name__)
+
+# Chunk ids are "{document_id}_chunk_{index}"
+CHUNK_ID_SEPARATOR = "_chunk_"
+
+# Live content database, kept outside the immutable index snapshots
+WORKING_DATABASE = ".documents.working"
+
+# Live keyword index, and its file name inside snapshots
+WORKING_KEYWORDS = ".keywords.working"
+KEYWORD_INDEX = "keywords"
+
+
+class ReadOnlyIndexError(RuntimeError):
+    """A write to an index served read-only."""
+
+
+class FilterSelection(NamedTuple):
+    """Chunks matching a DocumentFilter, prepared for searching one shard's ANN index."""
+    # Shard revision the ANN selection was prepared for
+    revision: int
+    ann: Optional[filtered_ann.Selection]
+
+
+class ShardResults(NamedTuple):
+    """Candidates from one shard, per query, best first."""
+    # (chunk id, score) lists; None for modes that skip the index
+    dense: Optional[List[List[Tuple[str, float]]]]
+    sparse: Optional[List[List[Tuple[str, float]]]]
+    texts: Dict[str, str]
+
+
+def index_config() -> Dict[str, Any]:
+    """txtai configuration for new and rebuilt indexes."""
+    return {
+        "path": settings.TXTAI_MODEL,
+        "content": True,
+        # Chooses flat, IVF or HNSW and compression per build, see ann_index
+        "backend": ann_index.BACKEND,
+        "faiss": ann_index.index_options()
+    }
+
+
+class IndexShard:
+    """A txtai index with its keyword index and snapshots, in one directory."""
+
+    def __init__(self, path: str, models: Dict[str, Any], embedding_cache: EmbeddingCache):
+        """
+        Args:
+            path: Directory for snapshots and working files
+            models: txtai model cache, shared so shards load the embedding model once
+            embedding_cache: Chunk vector cache, shared by all shards
+        """
+        self.path = path
+        self.read_only = settings.INDEX_READ_ONLY
+        os.makedirs(path, exist_ok=True)
+
+        self._models = models
+        self._embedding_cache = embedding_cache
+        self._lock = threading.RLock()
+        # Incremented under the lock by every index write, which may move vectors
+        # within the ANN index; filter selections are only valid for one revision
+        self._revision = 0
+
+        # Only one process may write a shard; the others serve it read-only
+        self._writer_lock = lock_writer(path) if not self.read_only else None
+
+        self.embeddings = self._new_embeddings()
+
+        self._keywords = None
+        if settings.KEYWORD_INDEX_ENABLED and not self.read_only:
+            self._keywords = KeywordIndex(os.path.join(path, WORKING_KEYWORDS))
+
+        # Load existing index if available
+        index_file = os.path.join(path, LINK_NAME)
+        # Read-only shards: the local copy served, and the name of its snapshot
+        self.snapshot = None
+        self.version = None
+        self.refreshes = 0
+        self._copy: Optional[snapshot_cache.LocalSnapshot] = None
+        if self.read_only:
+            if os.path.exists(index_file):
+                self._copy = snapshot_cache.local_snapshot(path, index_file)
+                self.snapshot = self._copy.path
+                self.version = os.path.basename(self.snapshot)
+                self._load_read_only(self.embeddings, self.snapshot)
+            else:
+                logger.info(f"No index in {path} yet; serving an empty read-only index")
+            self._keywords = self._read_only_keywords(self.embeddings, self.snapshot)
+        elif os.path.exists(index_file):
+            self.embeddings.load(index_file)
+            # Search parameters follow the settings; index types change by rebuilding
+            self.embeddings.config["faiss"] = {
+                **(self.embeddings.config.get("faiss") or {}),
+                **ann_index.search_options(ann_index.index_options())
+            }
+            self._use_working_database()
+            if self._keywords is not None:
+                self._load_keywords(index_file)
+            logger.info(f"Loaded existing index from {index_file}")
+        else:
+            logger.info(f"Initializing new embeddings index in {path}")
+
+        # Index saves happen in the background, coalescing many changes
+        self._persistence = None
+        if not self.read_only:
+            self._persistence = IndexPersistenceManager(
+                save=self._write_index,
+                index_path=path,
+                interval=settings.INDEX_FLUSH_INTERVAL_SECONDS,
+                max_pending=settings.INDEX_FLUSH_MAX_PENDING,
+                keep_snapshots=settings.INDEX_SNAPSHOTS_TO_KEEP
+            )
+            self._persistence.start()
+
+        self._selections = LRUCache(settings.SEARCH_FILTER_CACHE_SIZE)
+
+    def _new_embeddings(self):
+        # Importing txtai loads PyTorch, so it waits until an index is opened
+        from txtai.embeddings import Embeddings
+
+        embeddings = Embeddings(index_config(), models=self._models)
+        self._embedding_cache.install(embeddings)
+        return embeddings
+
+    def count(self) -> int:
+        with self._lock:
+            return self.embeddings.count()
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the vector index; the content and keyword stores are on disk."""
+        with self._lock:
+            ann = self.embeddings.ann
+            return ann_index.memory_bytes(ann.backend) if ann is not None and ann.backend is not None else 0
+
+    def upsert(self, documents: List[Dict[str, Any]]):
+        """Add or update chunks; only the text is kept, metadata lives in the metadata store."""
+        self._check_writable()
+        # Encoding is the slow part; searches of the shard only wait for the index update
+        self._embedding_cache.prefetch(self.embeddings, [doc["text"] for doc in documents])
+        with self._lock:
+            self.embeddings.upsert([(doc["id"], doc["text"], None) for doc in documents])
+            self._revision += 1
+            if self._keywords is not None:
+                self._keywords.upsert((doc["id"], doc["text"]) for doc in documents)
+        self._persistence.mark_dirty(len(documents))
+
+    def delete_stale(self, document_id: str, keep: Iterable[str] = ()) -> List[str]:
+        """
+        Delete a document's chunks, except the ones in keep.
+
+        Returns:
+            Ids of the deleted chunks
+        """
+        self._check_writable()
+        keep = set(keep)
+        with self._lock:
+            stale = [uid for uid in self._document_chunk_ids(document_id) if uid not in keep]
+            if not stale:
+                return []
+
+            deleted = self.embeddings.delete(stale)
+            self._revision += 1
+            if self._keywords is not None:
+                self._keywords.delete(deleted)
+        self._persistence.mark_dirty(len(deleted))
+        return deleted
+
+    def chunk_ids(self, document_id: str) -> List[str]:
+        """Ids of the chunks stored for a document."""
+        with self._lock:
+            return self._document_chunk_ids(document_id)
+
+    def _document_chunk_ids(self, document_id: str) -> List[str]:
+        """Look up the ids of all chunks stored for a document."""
+        count = self.embeddings.count()
+        if not count:
+            return []
+
+        # txtai's SQL has no ESCAPE clause or bound parameters, and can't parse
+        # quoted quotes. `_` and `%` in the id and LIKE's case-insensitivity
+        # only widen the match, and a quote ends the pattern early, so the
+        # query returns a superset that is narrowed to the exact prefix here.
+        prefix = f"{document_id}{CHUNK_ID_SEPARATOR}"
+        pattern = prefix.split("'")[0]
+        results = self.embeddings.search(f"select id from txtai where id like '{pattern}%' limit {count}")
+        return [result["id"] for result in results if result["id"].startswith(prefix)]
+
+    def rebuild(self, config: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Rebuild the vector index from the content store, see TxtaiClient.rebuild.
+
+        Returns:
+            Number of chunks indexed
+        """
+        self._check_writable()
+        with self._lock:
+            count = self.embeddings.count()
+            if not count:
+                return 0
+
+            self.embeddings.reindex(
+                {**index_config(), **(config or {})},
+                function=self._rebuild_keywords if self._keywords is not None else None
+            )
+            self._revision += 1
+            count = self.embeddings.count()
+        self._persistence.mark_dirty(count)
+
+        logger.info(f"Rebuilt index in {self.path} with {count} chunks")
+        return count
+
+    def retune(self) -> bool:
+        """
+        Rebuild the index if its chunks have outgrown its index type, see ann_index.rebuild_reason.
+
+        Returns:
+            True if the index was rebuilt
+        """
+        if self.read_only:
+            return False
+        with self._lock:
+            reason = ann_index.rebuild_reason(self.embeddings.ann, ann_index.index_options())
+        if not reason:
+            return False
+
+        logger.info(f"Rebuilding index in {self.path}: {reason}")
+        self.rebuild()
+        return True
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ReadOnlyIndexError(f"Index in {self.path} is served read-only")
+
+    def _rebuild_keywords(self, rows: Iterable[tuple]) -> Iterator[tuple]:
+        """Pass the rows of a reindex through, rebuilding the keyword index from them."""
+        self._keywords.clear()
+        batch = []
+        for row in rows:
+            uid, text, _ = row
+            batch.append((uid, text if isinstance(text, str) else ""))
+            if len(batch) >= settings.INDEX_BATCH_SIZE:
+                self._keywords.upsert(batch)
+                batch = []
+            yield row
+        self._keywords.upsert(batch)
+
+    def _load_keywords(self, index_file: str):
+        """Load the keyword index saved with a snapshot, or build it from the content store."""
+        snapshot = os.path.join(index_file, KEYWORD_INDEX)
+        if os.path.exists(snapshot):
+            self._keywords.load(snapshot)
+            return
+
+        # Indexes saved before the keyword index existed
+        self._build_keywords(self._keywords, self.embeddings)
+
+    @staticmethod
+    def _build_keywords(keywords: KeywordIndex, embeddings):
+        """Fill a keyword index from the content store."""
+        count = embeddings.count()
+        logger.info(f"Building keyword index for {count} chunks")
+        keywords.clear()
+        if count:
+            rows = embeddings.search(f"select id, text from txtai limit {count}")
+            keywords.upsert((row["id"], row["text"] or "") for row in rows)
+
+    @staticmethod
+    def _load_read_only(embeddings, snapshot: str):
+        """Load a local snapshot copy, memory-mapped and read-only."""
+        # Snapshots are saved without the mmap option; it only applies to this load
+        loadconfig = embeddings.loadconfig
+
+        def mapped(path):
+            config = loadconfig(path)
+            config["faiss"] = {**(config.get("faiss") or {}), "mmap": True}
+            return config
+
+        embeddings.loadconfig = mapped
+        embeddings.load(snapshot)
+        embeddings.config["faiss"] = {
+            **embeddings.config["faiss"],
+            **ann_index.search_options(ann_index.index_options())
+        }
+
+        # txtai opens the content database for writing; reopen it mapped
+        database = embeddings.database
+        if database is not None:
+            database.close()
+            database.connection = snapshot_cache.connect_read_only(database.path)
+            database.cursor = database.getcursor()
+            database.addfunctions()
+        logger.info(f"Loaded read-only index from {snapshot}")
+
+    def _read_only_keywords(self, embeddings, snapshot: Optional[str]) -> Optional[KeywordIndex]:
+        """The keyword index saved with a local snapshot copy."""
+        if not settings.KEYWORD_INDEX_ENABLED:
+            return None
+
+        path = os.path.join(snapshot, KEYWORD_INDEX) if snapshot else None
+        if path and os.path.exists(path):
+            return KeywordIndex(path, read_only=True)
+
+        # Snapshots saved before the keyword index existed; built in memory
+        keywords = KeywordIndex(":memory:")
+        if snapshot:
+            self._build_keywords(keywords, embeddings)
+        return keywords
+
+    def refresh(self) -> bool:
+        """
+        Serve the shard's current snapshot if a writer has published a newer one.
+
+        The new snapshot is copied and loaded next to the one being served,
+        then swapped in under the lock: searches running on the old snapshot
+        finish first and later ones use the new one. Read-only shards only.
+
+        Returns:
+            True if a newer snapshot was loaded
+        """
+        index_file = os.path.join(self.path, LINK_NAME)
+        if not self.read_only or not os.path.exists(index_file):
+            return False
+        if os.path.basename(os.path.realpath(index_file)) == self.version:
+            return False
+
+        start = time.perf_counter()
+        copy = snapshot_cache.local_snapshot(self.path, index_file)
+        snapshot = copy.path
+        embeddings = self._new_embeddings()
+        try:
+            self._load_read_only(embeddings, snapshot)
+            keywords = self._read_only_keywords(embeddings, snapshot)
+        except Exception:
+            embeddings.close()
+            copy.release()
+            raise
+
+        with self._lock:
+            previous = (self.embeddings, self._keywords, self.version, self._copy)
+            self.embeddings, self._keywords = embeddings, keywords
+            self.snapshot, self.version, self._copy = snapshot, os.path.basename(snapshot), copy
+            self._revision += 1
+            self._selections.clear()
+            self.refreshes += 1
+
+        # No search can be using the old snapshot any more
+        old_embeddings, old_keywords, old_version, old_copy = previous
+        if old_keywords is not None:
+            old_keywords.close()
+        old_embeddings.close()
+        if old_copy is not None:
+            old_copy.release()
+        logger.info(
+            f"Switched {self.path} from snapshot {old_version} to {self.version} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return True
+
+    def search(
+        self,
+        queries: List[str],
+        vectors: Optional[np.ndarray],
+        limit: int,
+        mode: str,
+        filters: Optional[DocumentFilter] = None,
+        chunk_ids: Optional[List[str]] = None
+    ) -> ShardResults:
+        """
+        Search candidates for a batch of queries in this shard.
+
+        Args:
+            queries: Query strings, for the keyword index
+            vectors: Query vectors, None for keyword searches
+            limit: Candidates per query and index
+            mode: "dense", "keyword" or "hybrid"
+            filters: Filter the chunk ids were resolved from, to cache the ANN selection
+            chunk_ids: Only search these chunks; None searches all
+
+        Returns:
+            Dense and keyword candidates with the texts of all of them
+        """
+        # Searches run on worker threads; txtai shares one ANN index and
+        # database cursor, so they must not interleave with writes
+        with self._lock:
+            selection = self._selection(filters, chunk_ids) if chunk_ids is not None else None
+
+            dense, texts = None, {}
+            if vectors is not None:
+                if selection is not None:
+                    results = self._filtered_dense(vectors, limit, selection)
+                else:
+                    results = self.embeddings.batchsearch(list(vectors), limit)
+                texts = {result["id"]: result["text"] for rows in results for result in rows}
+                dense = [[(result["id"], result.get("score", 0.0)) for result in rows] for rows in results]
+
+            sparse = None
+            if mode != "dense":
+                sparse = self._keywords.search(queries, limit, ids=chunk_ids)
+                texts.update(self.texts([uid for results in sparse for uid, _ in results if uid not in texts]))
+
+        return ShardResults(dense, sparse, texts)
+
+    def _selection(self, filters: Optional[DocumentFilter], chunk_ids: List[str]) -> FilterSelection:
+        """ANN selection of a filter's chunks for the current revision; call with the lock held."""
+        selection = self._selections.get(filters) if filters is not None else None
+        if selection is not None and selection.revision == self._revision:
+            return selection
+
+        ann = None
+        if chunk_ids and self.embeddings.ann is not None:
+            # Chunks of other shards have no index id here
+            indexids = [indexid for indexid, _ in self.embeddings.database.ids(chunk_ids)]
+            ann = filtered_ann.select(self.embeddings.ann.backend, indexids)
+
+        selection = FilterSelection(self._revision, ann)
+        if filters is not None:
+            self._selections.put(filters, selection)
+        return selection
+
+    def _filtered_dense(
+        self,
+        vectors: np.ndarray,
+        limit: int,
+        selection: FilterSelection
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Vector search restricted to the selected chunks inside the ANN index,
+        in the shape of txtai's batchsearch results.
+        """
+        if selection.ann is None:
+            return [[] for _ in vectors]
+
+        hits = filtered_ann.search(selection.ann, vectors, limit, self.embeddings.ann.nprobe())
+        indexids = sorted({indexid for results in hits for indexid, _ in results})
+        rows = {}
+        if indexids:
+            rows = {
+                row["indexid"]: row
+                for row in self.embeddings.search(
+                    f"select indexid, id, text from txtai where indexid in ({', '.join(map(str, indexids))}) "
+                    f"limit {len(indexids)}"
+                )
+            }
+
+        return [
+            [
+                {"id": rows[indexid]["id"], "text": rows[indexid]["text"], "score": score}
+                for indexid, score in results if indexid in rows
+            ]
+            for results in hits
+        ]
+
+    def texts(self, ids: List[str]) -> Dict[str, str]:
+        """Chunk texts from the content store, for keyword results."""
+        if not ids:
+            return {}
+
+        quoted = ", ".join("'" + uid.replace("'", "''") + "'" for uid in ids)
+        with self._lock:
+            rows = self.embeddings.search(
+                f"select id, text from txtai where id in ({quoted}) limit {len(ids)}"
+            )
+        return {row["id"]: row["text"] for row in rows}
+
+    def row_metadata(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Metadata stored as data fields of content store rows, by chunks indexed before the metadata store."""
+        quoted = ", ".join("'" + uid.replace("'", "''") + "'" for uid in ids)
+        with self._lock:
+            rows = self.embeddings.search(
+                f"select id, data from txtai where id in ({quoted}) limit {len(ids)}"
+            )
+
+        metadata = {}
+        for row in rows:
+            data = json.loads(row["data"]) if row.get("data") else {}
+            if isinstance(data, dict):
+                data.pop("text", None)
+                metadata[row["id"]] = data
+        return metadata
+
+    def _write_index(self, path: str):
+        """Write the full embeddings index to a directory."""
+        try:
+            with self._lock:
+                self._use_working_database()
+                self.embeddings.save(path)
+                if self._keywords is not None:
+                    self._keywords.save(os.path.join(path, KEYWORD_INDEX))
+            logger.debug(f"Saved index to {path}")
+        except Exception as e:
+            logger.error(f"Error saving index: {e}")
+            raise
+
+    def _use_working_database(self):
+        """
+        Point the content database at a private working file.
+
+        txtai keeps writing to the SQLite file an index was loaded from or
+        first saved to. Left alone, that file is inside a snapshot, which
+        would then change after it was written and break once it is pruned.
+        Saving copies the working file into each snapshot instead.
+        """
+        database = self.embeddings.database
+        working = os.path.join(self.path, WORKING_DATABASE)
+        if database is None or database.path == working:
+            return
+
+        # A temporary database moves its connection to the saved file;
+        # one loaded from a snapshot is copied and reopened
+        database.save(working)
+        if database.path != working:
+            database.close()
+            database.load(working)
+
+    def flush(self) -> bool:
+        """Persist pending changes immediately."""
+        return self._persistence.flush() if self._persistence is not None else False
+
+    def close(self):
+        """Stop background persistence after flushing pending changes, and free the index."""
+        if self._persistence is not None:
+            self._persistence.close()
+        with self._lock:
+            if self._keywords is not None:
+                self._keywords.close()
+            self.embeddings.close()
+        if self._copy is not None:
+            self._copy.release()
+            self._copy = None
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ann = ann_index.describe(self.embeddings.ann)
+            documents = self.embeddings.count()
+        return {
+            "path": self.path,
+            "documents": documents,
+            "ann": ann,
+            "read_only": self.read_only,
+            "snapshot": self.snapshot,
+            "version": self.version,
+            "refreshes": self.refreshes,
+            "persistence": self._persistence.get_stats() if self._persistence is not None else None,
+            "keyword_index": self._keywords.get_stats() if self._keywords else None,
+            "filter_cache": self._selections.get_stats()
+        }
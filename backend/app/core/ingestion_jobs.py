@@ -0,0 +1,963 @@
+"""
+Background ingestion jobs.
+
+Uploads are spooled to local disk and queued, and the HTTP request returns
+immediately with a job id. A job holds one document, or many for bulk uploads
+and archives. Worker threads take jobs off the queue and run the pipeline
+stages:
+
+    store  - upload the original files to S3
+    parse  - extract text (PDF pages in parallel) and chunk it
+    embed  - embed chunks and upsert them into the index, batch by batch
+
+Within a job the stages overlap: S3 uploads run ahead on a small thread pool,
+and parsing runs on its own thread a few batches ahead of embedding. Chunks
+from consecutive documents share INDEX_BATCH_SIZE batches, so many small files
+are embedded and committed to the index in a few large upserts instead of one
+per file.
+
+Each stage has its own concurrency cap, so a burst of uploads can't occupy
+every embedding slot with parsing work or vice versa. Jobs report progress
+(documents indexed, pages parsed, chunks embedded, throughput) and failed
+documents are retried with exponential backoff. Job state is kept in memory;
+jobs queued when the process exits are lost and have to be resubmitted.
+"""
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from queue import Full, Queue
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.document_processor import document_processor
+from app.core.embedding_cache import content_hash
+from app.core.job_queue import JobQueueFullError, LocalJobQueue
+from app.core.metadata_store import (
+    DEFAULT_COLLECTION, DOCUMENT_FAILED, DOCUMENT_INDEXED, DOCUMENT_INDEXING, DocumentRecord, document_record,
+    metadata_store
+)
+from app.core.s3_client import s3_client
+from app.core.txtai_client import txtai_client
+
+logger = logging.getLogger(__name__)
+
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "md": "text/markdown",
+    "markdown": "text/markdown"
+}
+
+ARCHIVE_TYPES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+SUCCEEDED = "succeeded"
+PARTIAL = "partial"  # Some documents of a bulk job failed on every attempt
+FAILED = "failed"
+
+# Document statuses within a job
+PENDING = "pending"
+INDEXED = "indexed"
+
+STAGES = ("store", "parse", "embed")
+
+# Parsed batches waiting for the embed stage, per job
+PIPELINE_DEPTH = 2
+
+# Job state listings only include documents for jobs up to this size
+MAX_LISTED_DOCUMENTS = 100
+
+# Read size when spooling and hashing bulk uploads
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+class BulkUploadError(Exception):
+    """Raised when a bulk upload or archive can't be accepted."""
+
+
+def _extension(filename: str) -> str:
+    """Lower-cased extension of a filename."""
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def _is_archive(filename: str) -> bool:
+    """Whether a filename names a supported archive."""
+    return filename.lower().endswith(ARCHIVE_TYPES)
+
+
+class JobDocument:
+    """One file of an ingestion job."""
+
+    def __init__(self, document_id: str, filename: str, file_type: str, spool_path: str, content_hash: str):
+        self.document_id = document_id
+        self.filename = filename
+        self.file_type = file_type
+        self.spool_path = spool_path
+        self.content_hash = content_hash
+
+        self.status = PENDING
+        # Set when the file's content is already indexed, or repeats an earlier file of the job
+        self.duplicate = False
+        self.original: Optional["JobDocument"] = None
+        self.s3_key: Optional[str] = None
+        self.error: Optional[str] = None
+        # Ingest version, set once per job: 1 for uploads, one more than the
+        # recorded version for replacements
+        self.version: Optional[int] = None
+        # Whether a document record was written; kept across retries
+        self.recorded = False
+        # Whether chunks may have reached the index on any attempt; kept across retries
+        self.embedded = False
+        # Parse progress is written by the job's parse thread, embed progress
+        # by its worker thread
+        self.parsed = False
+        self.pages_parsed = 0
+        self.total_chars = 0
+        self.chunks = 0
+        self.chunks_embedded = 0
+        self.chunk_ids: List[str] = []
+
+    def reset(self):
+        """Clear parse and embed progress before another attempt."""
+        self.status = PENDING
+        self.error = None
+        self.duplicate = False
+        self.original = None
+        self.parsed = False
+        self.pages_parsed = 0
+        self.total_chars = 0
+        self.chunks = 0
+        self.chunks_embedded = 0
+        self.chunk_ids = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "document_id": self.document_id,
+            "filename": self.filename,
+            "status": self.status,
+            "duplicate": self.duplicate,
+            "version": self.version,
+            "chunks": self.chunks_embedded,
+            "s3_key": self.s3_key,
+            "error": self.error
+        }
+
+
+class IngestionJob:
+    """State and progress of one ingestion: a single upload or a bulk upload."""
+
+    def __init__(
+        self,
+        documents: List[JobDocument],
+        spool_dir: str,
+        replace: bool = False,
+        bulk: bool = False,
+        collection: str = DEFAULT_COLLECTION
+    ):
+        self.id = str(uuid.uuid4())
+        self.documents = documents
+        self.spool_dir = spool_dir
+        self.replace = replace
+        self.bulk = bulk
+        self.collection = collection
+
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.attempts = 0
+        self.chunks_embedded = 0
+        self.skipped: List[str] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow().isoformat()
+        self.updated_at = self.created_at
+
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._ended: Optional[float] = None
+
+    def update(self, **fields):
+        """Set fields and bump updated_at."""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = datetime.utcnow().isoformat()
+
+    def start(self):
+        """Mark the start of an attempt; throughput is measured from the first."""
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, PARTIAL, FAILED)
+
+    @property
+    def operation(self) -> str:
+        if self.bulk:
+            return "bulk"
+        return "replace" if self.replace else "upload"
+
+    def to_dict(self, documents: bool = False) -> Dict[str, Any]:
+        """
+        JSON-serializable job state.
+
+        Args:
+            documents: List every document; by default only small jobs list them
+        """
+        with self._lock:
+            # Duplicates resolve without being indexed, so they don't count towards throughput
+            deduplicated = sum(1 for doc in self.documents if doc.status == INDEXED and doc.duplicate)
+            indexed = sum(1 for doc in self.documents if doc.status == INDEXED) - deduplicated
+            failed = sum(1 for doc in self.documents if doc.status == FAILED)
+
+            elapsed = 0.0
+            if self._started is not None:
+                elapsed = (self._ended or time.monotonic()) - self._started
+
+            state = {
+                "job_id": self.id,
+                "operation": self.operation,
+                "collection": self.collection,
+                "status": self.status,
+                "stage": self.stage,
+                "attempts": self.attempts,
+                "progress": {
+                    "documents": len(self.documents),
+                    "documents_indexed": indexed,
+                    "documents_deduplicated": deduplicated,
+                    "documents_failed": failed,
+                    "pages_parsed": sum(doc.pages_parsed for doc in self.documents),
+                    "chunks_embedded": self.chunks_embedded,
+                    "docs_per_minute": round(indexed * 60 / elapsed, 1) if elapsed else 0.0,
+                    "chunks_per_second": round(self.chunks_embedded / elapsed, 1) if elapsed else 0.0
+                },
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at
+            }
+
+            if not self.bulk:
+                # Single uploads keep their document fields at the top level
+                document = self.documents[0]
+                state.update({
+                    "document_id": document.document_id,
+                    "filename": document.filename,
+                    "duplicate": document.duplicate,
+                    "version": document.version,
+                    "total_chars": document.total_chars,
+                    "s3_key": document.s3_key
+                })
+            else:
+                state["skipped"] = list(self.skipped)
+                if documents or len(self.documents) <= MAX_LISTED_DOCUMENTS:
+                    state["documents"] = [doc.to_dict() for doc in self.documents]
+
+            return state
+
+
+class StageLimiter:
+    """Concurrency cap for one pipeline stage, with usage counters."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(limit, 1)
+
+        self._semaphore = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the stage's slots, waiting for one if all are taken."""
+        with self._lock:
+            self._waiting += 1
+        self._semaphore.acquire()
+        with self._lock:
+            self._waiting -= 1
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"limit": self.limit, "active": self._active, "waiting": self._waiting}
+
+
+class IngestionJobManager:
+    """Queues ingestion jobs and runs them on a pool of worker threads."""
+
+    def __init__(
+        self,
+        queue: LocalJobQueue,
+        workers: int,
+        max_attempts: int,
+        retry_backoff: float,
+        spool_dir: str,
+        stage_limits: Dict[str, int],
+        history: int,
+        bulk_max_files: int = 10000,
+        bulk_max_bytes: int = 2 * 1024 ** 3,
+        deduplicate: bool = True
+    ):
+        """
+        Args:
+            queue: Queue carrying job ids to the workers
+            workers: Worker threads
+            max_attempts: Attempts per job before it is marked failed
+            retry_backoff: Delay before the first retry, doubled for each further retry
+            spool_dir: Directory holding uploaded files until their job finishes
+            stage_limits: Maximum concurrent work per stage
+            history: Finished jobs kept for status polling
+            bulk_max_files: Maximum documents per bulk upload
+            bulk_max_bytes: Maximum total size of a bulk upload after unpacking archives
+            deduplicate: Skip documents whose file content is already indexed
+        """
+        self.queue = queue
+        self.workers = max(workers, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_backoff = retry_backoff
+        self.spool_dir = spool_dir
+        self.history = history
+        self.bulk_max_files = bulk_max_files
+        self.bulk_max_bytes = bulk_max_bytes
+        self.deduplicate = deduplicate
+
+        self.stages = {name: StageLimiter(name, stage_limits[name]) for name in STAGES}
+
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    def submit(
+        self,
+        file_content: bytes,
+        filename: str,
+        file_type: str,
+        document_id: str,
+        replace: bool = False,
+        collection: str = DEFAULT_COLLECTION
+    ) -> IngestionJob:
+        """
+        Spool an uploaded file to disk and queue a job for it.
+
+        Args:
+            collection: Collection the document is indexed into
+
+        Raises:
+            JobQueueFullError: If the queue is full
+        """
+        job_dir = self._job_dir()
+        spool_path = os.path.join(job_dir, f"0.{file_type}")
+        with open(spool_path, "wb") as f:
+            f.write(file_content)
+
+        document = JobDocument(document_id, filename, file_type, spool_path, content_hash(file_content))
+        job = IngestionJob([document], job_dir, replace=replace, collection=collection)
+        self._queue(job)
+
+        logger.info(f"Queued ingestion job {job.id} for {filename} ({document_id}) in collection {collection}")
+        return job
+
+    def submit_bulk(self, files: List[Tuple[str, BinaryIO]], collection: str = DEFAULT_COLLECTION) -> IngestionJob:
+        """
+        Spool many uploaded files, unpacking archives, and queue one job for all of them.
+
+        Every document gets a new id. Archive members of unsupported types are
+        skipped and listed on the job.
+
+        Args:
+            files: (filename, file object) pairs; files may be PDF, Markdown or
+                zip/tar archives of them
+            collection: Collection the documents are indexed into
+
+        Raises:
+            BulkUploadError: If a file type is unsupported, an archive can't be
+                read, the upload exceeds the bulk limits or holds no documents
+            JobQueueFullError: If the queue is full
+        """
+        job_dir = self._job_dir()
+        documents: List[JobDocument] = []
+        skipped: List[str] = []
+        budget = [self.bulk_max_bytes]
+
+        try:
+            for filename, fileobj in files:
+                if _is_archive(filename):
+                    self._unpack(filename, fileobj, job_dir, documents, skipped, budget)
+                elif _extension(filename) in CONTENT_TYPES:
+                    self._spool(filename, fileobj, job_dir, documents, budget)
+                else:
+                    raise BulkUploadError(
+                        f"Unsupported file type: {filename}. Supported: pdf, md, markdown, "
+                        f"and {', '.join(ARCHIVE_TYPES)} archives of them"
+                    )
+
+            if not documents:
+                raise BulkUploadError("Upload contains no PDF or Markdown documents")
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        job = IngestionJob(documents, job_dir, bulk=True, collection=collection)
+        job.skipped = skipped
+        self._queue(job)
+
+        logger.info(f"Queued bulk ingestion job {job.id} for {len(documents)} documents ({len(skipped)} skipped)")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently submitted jobs first."""
+        with self._lock:
+            jobs = list(itertools.islice(reversed(self._jobs.values()), limit))
+        return [job.to_dict() for job in jobs]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, job counts by status and stage usage."""
+        with self._lock:
+            statuses: Dict[str, int] = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue": self.queue.get_stats(),
+            "jobs": statuses,
+            "stages": {name: stage.get_stats() for name, stage in self.stages.items()}
+        }
+
+    def shutdown(self):
+        """Stop the workers after their current jobs."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _job_dir(self) -> str:
+        """Create a spool directory for a new job."""
+        self._start()
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return tempfile.mkdtemp(dir=self.spool_dir)
+
+    def _queue(self, job: IngestionJob):
+        """Register and queue a spooled job."""
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self.queue.send({"job_id": job.id})
+        except JobQueueFullError:
+            self._discard(job)
+            raise
+
+    def _spool(
+        self,
+        filename: str,
+        fileobj: BinaryIO,
+        job_dir: str,
+        documents: List[JobDocument],
+        budget: List[int]
+    ):
+        """Copy one document of a bulk upload to the job's spool directory."""
+        if len(documents) >= self.bulk_max_files:
+            raise BulkUploadError(f"Bulk uploads are limited to {self.bulk_max_files} documents")
+
+        ext = _extension(filename)
+        spool_path = os.path.join(job_dir, f"{len(documents)}.{ext}")
+        digest = hashlib.sha256()
+        with open(spool_path, "wb") as f:
+            for block in iter(lambda: fileobj.read(SPOOL_BLOCK_SIZE), b""):
+                digest.update(block)
+                f.write(block)
+            size = f.tell()
+
+        budget[0] -= size
+        if budget[0] < 0:
+            raise BulkUploadError(f"Bulk uploads are limited to {self.bulk_max_bytes} bytes")
+
+        documents.append(JobDocument(str(uuid.uuid4()), filename, ext, spool_path, digest.hexdigest()))
+
+    def _unpack(
+        self,
+        filename: str,
+        fileobj: BinaryIO,
+        job_dir: str,
+        documents: List[JobDocument],
+        skipped: List[str],
+        budget: List[int]
+    ):
+        """
+        Spool the supported members of a zip or tar archive.
+
+        Members are written under generated names, so paths inside the
+        archive never touch the filesystem. Sizes are checked against the
+        budget before anything is decompressed.
+        """
+        try:
+            if filename.lower().endswith(".zip"):
+                with zipfile.ZipFile(fileobj) as archive:
+                    for info in archive.infolist():
+                        if info.is_dir():
+                            continue
+                        if _extension(info.filename) not in CONTENT_TYPES:
+                            skipped.append(info.filename)
+                            continue
+                        if info.file_size > budget[0]:
+                            raise BulkUploadError(f"Bulk uploads are limited to {self.bulk_max_bytes} bytes")
+                        with archive.open(info) as member:
+                            self._spool(info.filename, member, job_dir, documents, budget)
+            else:
+                # Streaming mode reads compressed tars without seeking back
+                with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                    for info in archive:
+                        if not info.isfile():
+                            continue
+                        if _extension(info.name) not in CONTENT_TYPES:
+                            skipped.append(info.name)
+                            continue
+                        if info.size > budget[0]:
+                            raise BulkUploadError(f"Bulk uploads are limited to {self.bulk_max_bytes} bytes")
+                        self._spool(info.name, archive.extractfile(info), job_dir, documents, budget)
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            raise BulkUploadError(f"Could not read archive {filename}: {e}")
+
+    def _start(self):
+        """Start the worker threads on first use."""
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"ingestion-worker-{number}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        """Worker loop: run queued jobs until shutdown."""
+        while not self._stopped.is_set():
+            message = self.queue.receive(timeout=1.0)
+            if message is None:
+                continue
+
+            job = self.get(message["job_id"])
+            if job is None or job.finished:
+                continue
+
+            # A job must not take its worker, and the jobs queued behind it, down with it
+            try:
+                self._attempt(job)
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} failed unexpectedly: {e}")
+                job.update(status=FAILED, error=job.error or str(e), _ended=time.monotonic())
+                self._finish(job)
+
+    def _attempt(self, job: IngestionJob):
+        """Run a job once, scheduling a retry of its failed documents or marking it failed."""
+        job.update(status=RUNNING, attempts=job.attempts + 1, error=None)
+        job.start()
+
+        try:
+            self._run(job)
+            error = self._document_errors(job)
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed on attempt {job.attempts} in stage {job.stage}: {e}")
+            error = str(e)
+
+        if error is None:
+            job.update(status=SUCCEEDED, stage=None, _ended=time.monotonic())
+            self._finish(job)
+            state = job.to_dict()
+            logger.info(
+                f"Ingestion job {job.id} indexed {job.chunks_embedded} chunks of "
+                f"{state['progress']['documents_indexed']} document(s) in {job.attempts} attempt(s), "
+                f"{state['progress']['documents_deduplicated']} duplicate(s) skipped, "
+                f"{state['progress']['docs_per_minute']} docs/min"
+            )
+            return
+
+        if job.attempts < self.max_attempts:
+            delay = self.retry_backoff * 2 ** (job.attempts - 1)
+            job.update(status=RETRYING, error=error)
+            try:
+                self.queue.send({"job_id": job.id}, delay=delay)
+                return
+            except JobQueueFullError:
+                error = f"{error} (retry could not be queued)"
+
+        # Don't leave partially indexed new documents behind; every step is
+        # tried, so one that fails doesn't leave the others undone
+        failed = []
+        for doc in job.documents:
+            if doc.status != INDEXED:
+                doc.status = FAILED
+                doc.error = doc.error or error
+                if job.replace:
+                    if doc.recorded:
+                        failed.append(self._record(job, doc, DOCUMENT_FAILED))
+                    continue
+                if doc.embedded:
+                    self._clean_up(
+                        f"deleting the chunks of failed document {doc.document_id}",
+                        lambda: txtai_client.delete_document(doc.document_id, job.collection)
+                    )
+                if doc.recorded:
+                    self._clean_up(
+                        f"deleting the record of failed document {doc.document_id}",
+                        lambda: metadata_store.delete_document(doc.document_id)
+                    )
+        self._clean_up("recording failed replacements", lambda: metadata_store.put_documents(failed))
+
+        indexed = any(doc.status == INDEXED for doc in job.documents)
+        job.update(status=PARTIAL if indexed else FAILED, error=error, _ended=time.monotonic())
+        self._finish(job)
+
+    @staticmethod
+    def _clean_up(step: str, action: Callable[[], Any]):
+        """Run one cleanup step of a failed job, logging instead of raising."""
+        try:
+            action()
+        except Exception as e:
+            logger.error(f"Error {step}: {e}")
+
+    @staticmethod
+    def _document_errors(job: IngestionJob) -> Optional[str]:
+        """Summarize documents that failed during the last attempt."""
+        failed = [doc for doc in job.documents if doc.status == FAILED]
+        if not failed:
+            return None
+        if not job.bulk:
+            return failed[0].error
+        return f"{len(failed)} of {len(job.documents)} documents failed, first: {failed[0].filename}: {failed[0].error}"
+
+    def _run(self, job: IngestionJob):
+        """
+        Run the pipeline for the documents of a job that aren't indexed yet.
+
+        The worker thread embeds batches while a parse thread fills the next
+        ones and a small pool uploads originals to S3 ahead of both.
+        """
+        documents = [doc for doc in job.documents if doc.status != INDEXED]
+        for doc in documents:
+            doc.reset()
+        job.update(
+            stage="parse",
+            chunks_embedded=sum(doc.chunks_embedded for doc in job.documents if doc.status == INDEXED)
+        )
+
+        # Duplicates skip every stage, including the S3 upload
+        pending = self._deduplicate(job, documents)
+        documents = [doc for doc in pending if doc.original is None]
+        repeats = [doc for doc in pending if doc.original is not None]
+
+        # Stored originals survive retries of later stages
+        to_store = [doc for doc in documents if doc.s3_key is None]
+        with ThreadPoolExecutor(
+            max_workers=max(min(self.stages["store"].limit, len(to_store)), 1),
+            thread_name_prefix=f"ingestion-store-{job.id[:8]}"
+        ) as uploads:
+            stored = {doc.document_id: uploads.submit(self._store, doc) for doc in to_store}
+
+            batches: Queue = Queue(maxsize=PIPELINE_DEPTH)
+            stop = threading.Event()
+            producer = threading.Thread(
+                target=self._produce,
+                args=(job, documents, stored, batches, stop),
+                name=f"ingestion-parse-{job.id[:8]}",
+                daemon=True
+            )
+            producer.start()
+
+            try:
+                while True:
+                    batch = batches.get()
+                    if batch is None:
+                        break
+                    if isinstance(batch, Exception):
+                        raise batch
+                    self._embed(job, batch)
+            finally:
+                stop.set()
+                producer.join()
+                for future in stored.values():
+                    future.cancel()
+
+        # Documents whose last chunk closed a batch, or that had no chunks
+        metadata_store.put_documents([
+            self._record(job, doc, DOCUMENT_INDEXED) for doc in documents if self._complete(job, doc)
+        ])
+
+        # Repeated files share the outcome of their first occurrence
+        for doc in repeats:
+            doc.document_id = doc.original.document_id
+            doc.status, doc.error = doc.original.status, doc.original.error
+            doc.version, doc.s3_key = doc.original.version, doc.original.s3_key
+            self._discard_spool(doc)
+
+    def _deduplicate(self, job: IngestionJob, documents: List[JobDocument]) -> List[JobDocument]:
+        """
+        Resolve documents whose file content is already indexed.
+
+        An upload of an indexed file resolves to the existing document, and a
+        replacement with unchanged content is a no-op. Files repeated within
+        the job are linked to their first occurrence.
+
+        Returns:
+            Documents that still have to be processed, repeats included
+        """
+        if not self.deduplicate:
+            return documents
+
+        # Collections are separate search spaces, so only their own copies count
+        indexed = metadata_store.find_by_content_hash(
+            sorted({doc.content_hash for doc in documents}), collection=job.collection
+        )
+        first: Dict[str, JobDocument] = {}
+        pending = []
+        for doc in documents:
+            existing = indexed.get(doc.content_hash, [])
+            if job.replace and doc.document_id in existing:
+                logger.info(f"Content of {doc.document_id} is unchanged, skipping replacement")
+            elif not job.replace and existing:
+                logger.info(f"{doc.filename} is already indexed as {existing[0]}, skipping")
+                doc.document_id = existing[0]
+            elif doc.content_hash in first:
+                doc.duplicate = True
+                doc.original = first[doc.content_hash]
+                pending.append(doc)
+                continue
+            else:
+                first[doc.content_hash] = doc
+                pending.append(doc)
+                continue
+
+            doc.duplicate = True
+            doc.status = INDEXED
+            existing = metadata_store.get_document(doc.document_id)
+            if existing is not None:
+                doc.version, doc.s3_key = existing.version, existing.s3_key
+            self._discard_spool(doc)
+        return pending
+
+    def _store(self, doc: JobDocument):
+        """Upload a document's original file to S3."""
+        with self.stages["store"].slot():
+            with open(doc.spool_path, "rb") as f:
+                s3_key = s3_client.upload_document(
+                    file_content=f.read(),
+                    document_id=doc.document_id,
+                    filename=doc.filename,
+                    content_type=CONTENT_TYPES.get(doc.file_type, "application/octet-stream")
+                )
+        doc.s3_key = s3_key
+        logger.info(f"Document uploaded to S3: {s3_key}")
+
+    def _produce(
+        self,
+        job: IngestionJob,
+        documents: List[JobDocument],
+        stored: Dict[str, Future],
+        batches: Queue,
+        stop: threading.Event
+    ):
+        """Parse thread: fill cross-document batches of (document, chunk) pairs."""
+        chunks = self._document_chunks(job, documents, stored)
+        end: Optional[Exception] = None
+        try:
+            while not stop.is_set():
+                # Extraction and chunking happen lazily while the batch is pulled
+                with self.stages["parse"].slot():
+                    batch = list(itertools.islice(chunks, settings.INDEX_BATCH_SIZE))
+                if not batch:
+                    break
+                self._put(batches, batch, stop)
+        except Exception as e:
+            end = e
+        finally:
+            chunks.close()
+        self._put(batches, end, stop)
+
+    @staticmethod
+    def _put(batches: Queue, item: Any, stop: threading.Event):
+        """Hand an item to the embed stage unless the job stopped consuming."""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def _document_chunks(
+        self,
+        job: IngestionJob,
+        documents: List[JobDocument],
+        stored: Dict[str, Future]
+    ) -> Iterator[Tuple[JobDocument, Dict[str, Any]]]:
+        """Stream chunks of all documents in order; a failing document is skipped."""
+        for doc in documents:
+            try:
+                if doc.document_id in stored:
+                    stored[doc.document_id].result()
+                if doc.version is None:
+                    doc.version = self._next_version(job, doc)
+
+                # Document fields live in the document record
+                metadata = {"document_id": doc.document_id, "version": doc.version}
+                for chunk in self._chunks(doc):
+                    chunk["id"] = f"{doc.document_id}_{chunk['id']}"
+                    chunk["metadata"].update(metadata)
+                    doc.chunks += 1
+                    if job.replace:
+                        doc.chunk_ids.append(chunk["id"])
+                    yield doc, chunk
+                doc.parsed = True
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} could not process {doc.filename}: {e}")
+                doc.status = FAILED
+                doc.error = str(e)
+
+    def _chunks(self, doc: JobDocument) -> Iterator[Dict[str, Any]]:
+        """Stream chunks of a spooled file, tracking parse progress."""
+        if doc.file_type == "pdf":
+            def pages():
+                for number, text in document_processor.iter_pdf_pages(doc.spool_path):
+                    doc.pages_parsed = number
+                    doc.total_chars += len(text)
+                    yield number, text
+
+            yield from document_processor.iter_page_chunks(pages())
+        else:
+            with open(doc.spool_path, "rb") as f:
+                text = document_processor.process_markdown(f.read(), doc.filename)
+            doc.pages_parsed = 1
+            doc.total_chars = len(text)
+            yield from document_processor.iter_chunks(text)
+
+    def _embed(self, job: IngestionJob, batch: List[Tuple[JobDocument, Dict[str, Any]]]):
+        """Embed one cross-document batch and commit it to the index in a single upsert."""
+        job.update(stage="embed")
+        documents = list({doc.document_id: doc for doc, _ in batch}.values())
+
+        # Records of documents first seen in this batch, written together
+        started = [doc for doc in documents if not doc.recorded]
+        metadata_store.put_documents([self._record(job, doc, DOCUMENT_INDEXING) for doc in started])
+        for doc in started:
+            doc.recorded = True
+
+        for doc in documents:
+            doc.embedded = True
+        with self.stages["embed"].slot():
+            txtai_client.index_documents([chunk for _, chunk in batch], collection=job.collection)
+
+        for doc, _ in batch:
+            doc.chunks_embedded += 1
+        metadata_store.put_documents([
+            self._record(job, doc, DOCUMENT_INDEXED) for doc in documents if self._complete(job, doc)
+        ])
+
+        job.update(stage="parse", chunks_embedded=job.chunks_embedded + len(batch))
+
+    def _complete(self, job: IngestionJob, doc: JobDocument) -> bool:
+        """
+        Mark a document indexed once all of its chunks are embedded.
+
+        Returns:
+            True if the document was completed by this call
+        """
+        if doc.status != PENDING or not doc.parsed or doc.chunks_embedded < doc.chunks:
+            return False
+
+        # Chunks left over from a longer previous version
+        if job.replace:
+            txtai_client.delete_stale_chunks(doc.document_id, doc.chunk_ids, collection=job.collection)
+
+        doc.status = INDEXED
+        self._discard_spool(doc)
+        return True
+
+    @staticmethod
+    def _next_version(job: IngestionJob, doc: JobDocument) -> int:
+        """Ingest version of a document: replacements bump the recorded one."""
+        if not job.replace:
+            return 1
+        existing = metadata_store.get_document(doc.document_id)
+        return existing.version + 1 if existing else 1
+
+    @staticmethod
+    def _record(job: IngestionJob, doc: JobDocument, status: str) -> DocumentRecord:
+        return document_record(
+            document_id=doc.document_id,
+            filename=doc.filename,
+            file_type=doc.file_type,
+            s3_key=doc.s3_key,
+            content_hash=doc.content_hash,
+            version=doc.version or 1,
+            status=status,
+            chunks=doc.chunks_embedded,
+            uploaded_at=job.created_at,
+            collection=job.collection
+        )
+
+    @staticmethod
+    def _discard_spool(doc: JobDocument):
+        try:
+            os.remove(doc.spool_path)
+        except FileNotFoundError:
+            pass
+
+    def _finish(self, job: IngestionJob):
+        """Remove the spooled files and trim the job history."""
+        shutil.rmtree(job.spool_dir, ignore_errors=True)
+        with self._lock:
+            finished = [uid for uid, item in self._jobs.items() if item.finished]
+            for uid in finished[:max(len(finished) - self.history, 0)]:
+                del self._jobs[uid]
+
+    def _discard(self, job: IngestionJob):
+        """Forget a job that was never queued."""
+        shutil.rmtree(job.spool_dir, ignore_errors=True)
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+
+# Global instance
+ingestion_jobs = IngestionJobManager(
+    queue=LocalJobQueue(settings.INGESTION_QUEUE_SIZE),
+    workers=settings.INGESTION_WORKERS,
+    max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+    retry_backoff=settings.INGESTION_RETRY_BACKOFF_SECONDS,
+    spool_dir=settings.INGESTION_SPOOL_DIR or os.path.join(tempfile.gettempdir(), "ragaws-ingestion"),
+    stage_limits={
+        "store": settings.INGESTION_STORE_CONCURRENCY,
+        "parse": settings.INGESTION_PARSE_CONCURRENCY,
+        "embed": settings.INGESTION_EMBED_CONCURRENCY
+    },
+    history=settings.INGESTION_JOB_HISTORY,
+    bulk_max_files=settings.INGESTION_BULK_MAX_FILES,
+    bulk_max_bytes=settings.INGESTION_BULK_MAX_BYTES,
+    deduplicate=settings.INGESTION_DEDUPLICATE
+)
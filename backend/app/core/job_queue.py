@@ -0,0 +1,82 @@
+"""
+In-process stand-in for a message queue such as SQS.
+
+Messages are JSON-serializable dicts, can be delayed (used for retry
+backoff) and are received by polling with a timeout. The queue is bounded;
+sending to a full queue raises JobQueueFullError, which routers map to
+HTTP 429.
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job queue has reached its capacity."""
+
+
+class LocalJobQueue:
+    """Bounded, thread-safe delay queue."""
+
+    def __init__(self, max_size: int):
+        """
+        Args:
+            max_size: Maximum number of queued messages, including delayed ones
+        """
+        self.max_size = max_size
+
+        self._condition = threading.Condition()
+        # (visible_at, sequence, message); the sequence keeps FIFO order for ties
+        self._messages: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._sequence = itertools.count()
+        self._sent = 0
+        self._received = 0
+
+    def send(self, message: Dict[str, Any], delay: float = 0.0):
+        """
+        Queue a message, visible to receivers after `delay` seconds.
+
+        Raises:
+            JobQueueFullError: If the queue is full
+        """
+        with self._condition:
+            if len(self._messages) >= self.max_size:
+                raise JobQueueFullError("Ingestion queue is full, retry later")
+
+            heapq.heappush(self._messages, (time.monotonic() + delay, next(self._sequence), message))
+            self._sent += 1
+            self._condition.notify()
+
+    def receive(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait up to timeout seconds for a visible message."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._messages and self._messages[0][0] <= now:
+                    self._received += 1
+                    return heapq.heappop(self._messages)[2]
+
+                if now >= deadline:
+                    return None
+
+                # Wake up for the next delayed message or the deadline
+                wait = deadline - now
+                if self._messages:
+                    wait = min(wait, self._messages[0][0] - now)
+                self._condition.wait(wait)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and counters."""
+        with self._condition:
+            now = time.monotonic()
+            delayed = sum(1 for visible_at, _, _ in self._messages if visible_at > now)
+            return {
+                "depth": len(self._messages),
+                "delayed": delayed,
+                "max_size": self.max_size,
+                "sent": self._sent,
+                "received": self._received
+            }
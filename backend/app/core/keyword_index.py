@@ -0,0 +1,220 @@
+"""
+BM25 keyword index kept next to the dense vector index.
+
+Embeddings capture meaning, but exact strings such as error codes, part
+numbers and config keys embed like any other token and are often missed.
+This index scores chunks with BM25 over their terms, using an SQLite FTS5
+table. TxtaiClient writes it in the same batches as the vector index and
+copies it into the same snapshots.
+
+Identifiers are indexed whole and split into their parts, so "PN-77812-B"
+matches a query for the full part number as well as one for "77812".
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.snapshot_cache import connect_read_only
+
+logger = logging.getLogger(__name__)
+
+# Words joined by - . _ : / stay one token: E-4012, v2.3.1, ERR_TIMEOUT, api/v1
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.:/]\w+)*")
+PART_SEPARATORS = re.compile(r"[-.:/_]")
+
+# Lucene's English stop words, as used by txtai's tokenizer
+STOP_WORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+    "no", "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these",
+    "they", "this", "to", "was", "will", "with"
+))
+
+# Rows per SQL statement, below SQLite's variable limit
+BATCH = 500
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms of a text, with identifiers also split into their parts.
+
+    Args:
+        text: Chunk or query text
+
+    Returns:
+        Terms in order of appearance, stop words and single characters removed
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = PART_SEPARATORS.split(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return [term for term in terms if len(term) > 1 and term not in STOP_WORDS]
+
+
+class KeywordIndex:
+    """FTS5 index of chunk terms, addressed by chunk id."""
+
+    def __init__(self, path: str, read_only: bool = False):
+        """
+        Args:
+            path: Working database file; snapshots are copies of it
+            read_only: Search a snapshot file in place, memory-mapped; writes fail
+        """
+        self.path = path
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = self._connect(path, read_only)
+
+    def upsert(self, documents: Iterable[Tuple[str, str]]):
+        """
+        Index chunks, replacing chunks with the same ids.
+
+        Args:
+            documents: (chunk id, text) pairs
+        """
+        documents = list(documents)
+        if not documents:
+            return
+
+        with self._lock:
+            self._delete([uid for uid, _ in documents])
+            for uid, text in documents:
+                row = self._connection.execute("insert into chunks (id) values (?)", (uid,)).lastrowid
+                self._connection.execute(
+                    "insert into terms (rowid, text) values (?, ?)", (row, " ".join(tokenize(text)))
+                )
+            self._connection.commit()
+
+    def delete(self, ids: List[str]):
+        """Remove chunks from the index."""
+        if not ids:
+            return
+        with self._lock:
+            self._delete(ids)
+            self._connection.commit()
+
+    def clear(self):
+        """Remove every chunk, e.g. before a rebuild."""
+        with self._lock:
+            self._connection.execute("delete from terms")
+            self._connection.execute("delete from chunks")
+            self._connection.commit()
+
+    def search(
+        self,
+        queries: List[str],
+        limit: int,
+        ids: Optional[List[str]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        BM25 search for each query.
+
+        Args:
+            queries: Query strings
+            limit: Maximum results per query
+            ids: Only return these chunks, e.g. those matching a metadata filter
+
+        Returns:
+            (chunk id, score) lists, best first; scores are positive BM25
+        """
+        results = []
+        with self._lock:
+            if ids is not None:
+                self._select(ids)
+            for query in queries:
+                terms = dict.fromkeys(tokenize(query))
+                if not terms:
+                    results.append([])
+                    continue
+
+                # Any term may match; BM25 ranks chunks matching more and rarer terms first
+                match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+                rows = self._connection.execute(
+                    "select c.id, -bm25(terms) from terms join chunks c on c.rowid = terms.rowid "
+                    "where terms match ? "
+                    + ("and terms.rowid in (select rowid from temp.selection) " if ids is not None else "")
+                    + "order by rank limit ?",
+                    (match, limit)
+                ).fetchall()
+                results.append([(uid, float(score)) for uid, score in rows])
+        return results
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection.execute("select count(*) from chunks").fetchone()[0]
+
+    def save(self, path: str):
+        """Write a consistent copy of the index to a snapshot file."""
+        with self._lock:
+            self._connection.commit()
+            target = sqlite3.connect(path)
+            try:
+                self._connection.backup(target)
+            finally:
+                target.close()
+
+    def load(self, path: str):
+        """Replace the working index with a snapshot copy."""
+        source = sqlite3.connect(path)
+        with self._lock:
+            try:
+                source.backup(self._connection)
+            finally:
+                source.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "chunks": self.count(), "read_only": self.read_only}
+
+    def _select(self, ids: List[str]):
+        """Load the rowids of chunks into the temporary selection table."""
+        self._connection.execute("delete from temp.selection")
+        for start in range(0, len(ids), BATCH):
+            batch = ids[start:start + BATCH]
+            self._connection.execute(
+                f"insert or ignore into temp.selection select rowid from chunks where id in ({', '.join('?' * len(batch))})",
+                batch
+            )
+
+    def _delete(self, ids: List[str]):
+        for start in range(0, len(ids), BATCH):
+            batch = ids[start:start + BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            rows = [row for row, in self._connection.execute(
+                f"select rowid from chunks where id in ({placeholders})", batch
+            )]
+            if rows:
+                placeholders = ", ".join("?" * len(rows))
+                self._connection.execute(f"delete from terms where rowid in ({placeholders})", rows)
+                self._connection.execute(f"delete from chunks where rowid in ({placeholders})", rows)
+
+    @staticmethod
+    def _connect(path: str, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            # Temporary tables are private to the connection and still writable
+            connection = connect_read_only(path)
+            connection.execute("create temp table selection (rowid integer primary key)")
+            return connection
+
+        connection = sqlite3.connect(path, check_same_thread=False)
+        # Terms are tokenized before indexing; FTS5 only has to keep them intact
+        # and reduce plain words to their stems
+        connection.executescript("""
+            create table if not exists chunks (rowid integer primary key, id text not null unique);
+            create virtual table if not exists terms using fts5(
+                text, tokenize = "porter unicode61 tokenchars '-.:/_'"
+            );
+            create temp table if not exists selection (rowid integer primary key);
+        """)
+        connection.commit()
+        return connection
@@ -0,0 +1,85 @@
+"""
+Module-level singletons created on first use.
+
+Clients such as txtai_client are module globals that the rest of the code
+imports directly. Created at import time, they load PyTorch and the
+embedding model, open the index and build boto3 clients before the server
+has bound its port. A Lazy global is used the same way, but creates its
+instance on first attribute access. Startup work then happens in the
+background warm-up (see app.core.warmup), or on the first request that
+needs it.
+
+A Lazy is also a FastAPI dependency: Depends(txtai_client) resolves to the
+instance, and app.dependency_overrides can replace it.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Proxy for a singleton that is created by the first thread to use it.
+
+    Attributes the proxy defines itself (get, loaded, on_load) are not
+    forwarded, so the wrapped classes must not use those names.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str):
+        """
+        Args:
+            factory: Creates the instance, called once
+            name: For logs
+        """
+        self._factory = factory
+        self._name = name
+        self._lock = threading.Lock()
+        self._instance: Optional[T] = None
+        self._callbacks: List[Callable[[T], None]] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        """The instance, created on the first call; concurrent callers wait for it."""
+        instance = self._instance
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                instance = self._factory()
+                for callback in self._callbacks:
+                    callback(instance)
+                logger.info(f"Created {self._name} in {time.perf_counter() - start:.2f}s")
+                self._instance = instance
+            return self._instance
+
+    def on_load(self, callback: Callable[[T], None]):
+        """Run a callback with the instance once it exists, e.g. to register listeners."""
+        with self._lock:
+            if self._instance is None:
+                self._callbacks.append(callback)
+                return
+        callback(self._instance)
+
+    def __call__(self) -> T:
+        return self.get()
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for names the proxy doesn't have. Introspection, e.g. by
+        # FastAPI inspecting a dependency, must not create the instance, and
+        # private names are never forwarded
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self) -> str:
+        return f"Lazy({self._name}, loaded={self.loaded})"
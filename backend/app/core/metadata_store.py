@@ -0,0 +1,575 @@
+"""
+Document and chunk metadata repository.
+
+The index only stores chunk text. Document records (filename, S3 key,
+content hash, ingest version) and chunk metadata (offsets, pages, tokens)
+live here: chunk metadata is written batch by batch next to every index
+upsert, and search results are hydrated with one batched read.
+
+Backends:
+    sqlite   - a local file, for development and tests
+    dynamodb - AWS_DYNAMODB_TABLE, single-table layout:
+                   pk=DOC#<document_id>  sk=DOC               document record
+                   pk=DOC#<document_id>  sk=CHUNK#<chunk_id>  chunk metadata
+                   pk=HASH#<sha256>      sk=HASH              ids of documents with that content
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.lazy import Lazy
+
+logger = logging.getLogger(__name__)
+
+# Document record statuses
+DOCUMENT_INDEXING = "indexing"
+DOCUMENT_INDEXED = "indexed"
+DOCUMENT_FAILED = "failed"
+
+# Collection of documents ingested without one, and of records written before collections
+DEFAULT_COLLECTION = "default"
+
+# Keys per SQLite `in (...)` lookup, below SQLite's variable limit
+LOOKUP_BATCH = 500
+
+
+class DocumentRecord(NamedTuple):
+    document_id: str
+    filename: str
+    file_type: str
+    s3_key: Optional[str]
+    content_hash: Optional[str]
+    version: int
+    status: str
+    chunks: int
+    uploaded_at: str
+    updated_at: str
+    # Named index the document's chunks are in, see index_collection
+    collection: str = DEFAULT_COLLECTION
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class ChunkRecord(NamedTuple):
+    chunk_id: str
+    document_id: str
+    metadata: Dict[str, Any]
+
+
+class DocumentFilter(NamedTuple):
+    """Restricts a search to chunks of matching documents; None fields match anything."""
+    document_id: Optional[str] = None
+    file_type: Optional[str] = None
+    # UTC ISO timestamps compared with uploaded_at, after inclusive and before exclusive
+    uploaded_after: Optional[str] = None
+    uploaded_before: Optional[str] = None
+    # Set by the collection being searched, not by requests
+    collection: Optional[str] = None
+
+    def matches(self, record: DocumentRecord) -> bool:
+        return (
+            (self.document_id is None or record.document_id == self.document_id)
+            and (self.collection is None or record.collection == self.collection)
+            and (self.file_type is None or record.file_type == self.file_type)
+            and (self.uploaded_after is None or (record.uploaded_at or "") >= self.uploaded_after)
+            and (self.uploaded_before is None or (record.uploaded_at or "") < self.uploaded_before)
+        )
+
+
+# Document fields merged into hydrated chunk metadata
+DOCUMENT_FIELDS = ("document_id", "filename", "file_type", "s3_key", "content_hash", "version", "uploaded_at")
+
+
+class MetadataStore(ABC):
+    """Interface of the metadata backends."""
+
+    backend = "none"
+
+    @abstractmethod
+    def put_documents(self, records: List[DocumentRecord]):
+        """Create or overwrite document records."""
+
+    @abstractmethod
+    def get_document(self, document_id: str) -> Optional[DocumentRecord]:
+        """Look up one document record."""
+
+    @abstractmethod
+    def find_by_content_hash(self, hashes: List[str], collection: Optional[str] = None) -> Dict[str, List[str]]:
+        """Ids of indexed documents per content hash, for the hashes that have any, optionally in one collection."""
+
+    @abstractmethod
+    def delete_document(self, document_id: str):
+        """Delete a document record and all of its chunk metadata."""
+
+    @abstractmethod
+    def put_chunks(self, chunks: List[ChunkRecord]):
+        """Create or overwrite chunk metadata in one batch."""
+
+    @abstractmethod
+    def delete_chunks(self, document_id: str, chunk_ids: List[str]):
+        """Delete chunk metadata of a document."""
+
+    @abstractmethod
+    def hydrate(self, chunks: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadata for search results in one batched read.
+
+        Args:
+            chunks: Document id per chunk id
+
+        Returns:
+            Document fields merged with chunk metadata, per chunk id found
+        """
+
+    @abstractmethod
+    def find_chunks(self, filters: DocumentFilter) -> List[str]:
+        """Ids of the chunks of all documents matching a filter."""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend, location and usage counters."""
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _merge(document: Optional[Dict[str, Any]], chunk: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = {field: document[field] for field in DOCUMENT_FIELDS} if document else {}
+        metadata.update(chunk)
+        return metadata
+
+
+class SQLiteMetadataStore(MetadataStore):
+    """Metadata in a local SQLite file."""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(f"""
+            create table if not exists documents (
+                document_id text primary key, filename text, file_type text, s3_key text,
+                content_hash text, version integer, status text, chunks integer,
+                uploaded_at text, updated_at text, collection text not null default '{DEFAULT_COLLECTION}'
+            );
+            create index if not exists documents_content_hash on documents (content_hash);
+            create index if not exists documents_file_type on documents (file_type, uploaded_at);
+            create index if not exists documents_uploaded_at on documents (uploaded_at);
+            create table if not exists chunks (
+                chunk_id text primary key, document_id text not null, metadata text not null
+            );
+            create index if not exists chunks_document on chunks (document_id);
+        """)
+        # Files created before collections existed
+        columns = {row["name"] for row in self._connection.execute("pragma table_info(documents)")}
+        if "collection" not in columns:
+            self._connection.execute(
+                f"alter table documents add column collection text not null default '{DEFAULT_COLLECTION}'"
+            )
+        self._connection.commit()
+
+    def put_documents(self, records: List[DocumentRecord]):
+        if not records:
+            return
+        with self._lock:
+            self._connection.executemany(
+                f"insert or replace into documents ({', '.join(DocumentRecord._fields)}) "
+                f"values ({', '.join('?' * len(DocumentRecord._fields))})",
+                records
+            )
+            self._connection.commit()
+
+    def get_document(self, document_id: str) -> Optional[DocumentRecord]:
+        with self._lock:
+            row = self._connection.execute(
+                "select * from documents where document_id = ?", (document_id,)
+            ).fetchone()
+        return DocumentRecord(**dict(row)) if row else None
+
+    def find_by_content_hash(self, hashes: List[str], collection: Optional[str] = None) -> Dict[str, List[str]]:
+        if not hashes:
+            return {}
+        scope = " and collection = ?" if collection is not None else ""
+        rows = []
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_BATCH):
+                batch = hashes[start:start + LOOKUP_BATCH]
+                rows.extend(self._connection.execute(
+                    f"select content_hash, document_id from documents "
+                    f"where status = ? and content_hash in ({', '.join('?' * len(batch))}){scope}",
+                    [DOCUMENT_INDEXED, *batch, *([collection] if collection is not None else [])]
+                ).fetchall())
+
+        documents: Dict[str, List[str]] = {}
+        for row in rows:
+            documents.setdefault(row["content_hash"], []).append(row["document_id"])
+        return documents
+
+    def delete_document(self, document_id: str):
+        with self._lock:
+            self._connection.execute("delete from documents where document_id = ?", (document_id,))
+            self._connection.execute("delete from chunks where document_id = ?", (document_id,))
+            self._connection.commit()
+
+    def put_chunks(self, chunks: List[ChunkRecord]):
+        if not chunks:
+            return
+        with self._lock:
+            self._connection.executemany(
+                "insert or replace into chunks (chunk_id, document_id, metadata) values (?, ?, ?)",
+                [(chunk.chunk_id, chunk.document_id, json.dumps(chunk.metadata)) for chunk in chunks]
+            )
+            self._connection.commit()
+
+    def delete_chunks(self, document_id: str, chunk_ids: List[str]):
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._connection.executemany("delete from chunks where chunk_id = ?", [(uid,) for uid in chunk_ids])
+            self._connection.commit()
+
+    def hydrate(self, chunks: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        if not chunks:
+            return {}
+        ids = list(chunks)
+        rows = []
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_BATCH):
+                batch = ids[start:start + LOOKUP_BATCH]
+                rows.extend(self._connection.execute(
+                    f"select c.chunk_id, c.metadata, d.* from chunks c "
+                    f"left join documents d on d.document_id = c.document_id "
+                    f"where c.chunk_id in ({', '.join('?' * len(batch))})",
+                    batch
+                ).fetchall())
+
+        return {
+            row["chunk_id"]: self._merge(
+                dict(row) if row["filename"] is not None else None,
+                json.loads(row["metadata"])
+            )
+            for row in rows
+        }
+
+    def find_chunks(self, filters: DocumentFilter) -> List[str]:
+        clauses, values = [], []
+        for field, condition in (
+            ("document_id", "d.document_id = ?"),
+            ("file_type", "d.file_type = ?"),
+            ("uploaded_after", "d.uploaded_at >= ?"),
+            ("uploaded_before", "d.uploaded_at < ?"),
+            ("collection", "d.collection = ?")
+        ):
+            value = getattr(filters, field)
+            if value is not None:
+                clauses.append(condition)
+                values.append(value)
+
+        with self._lock:
+            rows = self._connection.execute(
+                "select c.chunk_id from documents d join chunks c on c.document_id = d.document_id"
+                + (f" where {' and '.join(clauses)}" if clauses else ""),
+                values
+            ).fetchall()
+        return [row["chunk_id"] for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents = self._connection.execute("select count(*) from documents").fetchone()[0]
+            chunks = self._connection.execute("select count(*) from chunks").fetchone()[0]
+        return {"backend": self.backend, "path": self.path, "documents": documents, "chunks": chunks}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class DynamoDBMetadataStore(MetadataStore):
+    """Metadata in a DynamoDB table with pk/sk string keys."""
+
+    backend = "dynamodb"
+
+    # DynamoDB request limits
+    BATCH_GET_KEYS = 100
+
+    # Global secondary index over the document records, see find_chunks
+    DOCUMENTS_INDEX = "collection-uploaded_at"
+
+    def __init__(self, table_name: str, region: str):
+        import boto3
+
+        self.table_name = table_name
+        self._dynamodb = boto3.resource("dynamodb", region_name=region)
+        self._table = self._dynamodb.Table(table_name)
+
+        self._lock = threading.Lock()
+        self._reads = 0
+        self._writes = 0
+
+    def put_documents(self, records: List[DocumentRecord]):
+        if not records:
+            return
+        with self._table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+            for record in records:
+                batch.put_item(Item={"pk": f"DOC#{record.document_id}", "sk": "DOC", **record._asdict()})
+
+        # Hash links are only added; find_by_content_hash drops stale ones
+        for record in records:
+            if record.status == DOCUMENT_INDEXED and record.content_hash:
+                self._table.update_item(
+                    Key={"pk": f"HASH#{record.content_hash}", "sk": "HASH"},
+                    UpdateExpression="ADD document_ids :id",
+                    ExpressionAttributeValues={":id": {record.document_id}}
+                )
+        self._count(writes=len(records))
+
+    def get_document(self, document_id: str) -> Optional[DocumentRecord]:
+        item = self._table.get_item(Key={"pk": f"DOC#{document_id}", "sk": "DOC"}).get("Item")
+        self._count(reads=1)
+        return self._record(item) if item else None
+
+    def find_by_content_hash(self, hashes: List[str], collection: Optional[str] = None) -> Dict[str, List[str]]:
+        links = self._batch_get([{"pk": f"HASH#{value}", "sk": "HASH"} for value in hashes])
+        candidates = {item["pk"][len("HASH#"):]: sorted(item.get("document_ids", ())) for item in links}
+
+        # Confirm against the document records
+        keys = [{"pk": f"DOC#{uid}", "sk": "DOC"} for uids in candidates.values() for uid in uids]
+        records = {item["document_id"]: self._record(item) for item in self._batch_get(keys)}
+
+        documents: Dict[str, List[str]] = {}
+        for value, uids in candidates.items():
+            for uid in uids:
+                record = records.get(uid)
+                if (
+                    record and record.status == DOCUMENT_INDEXED and record.content_hash == value
+                    and (collection is None or record.collection == collection)
+                ):
+                    documents.setdefault(value, []).append(uid)
+        return documents
+
+    def delete_document(self, document_id: str):
+        keys = self._document_items(document_id, "pk, sk")
+        with self._table.batch_writer() as batch:
+            for key in keys:
+                batch.delete_item(Key={"pk": key["pk"], "sk": key["sk"]})
+        self._count(writes=len(keys))
+
+    def put_chunks(self, chunks: List[ChunkRecord]):
+        if not chunks:
+            return
+        with self._table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+            for chunk in chunks:
+                batch.put_item(Item={
+                    "pk": f"DOC#{chunk.document_id}",
+                    "sk": f"CHUNK#{chunk.chunk_id}",
+                    # JSON avoids DynamoDB's Decimal round trip for numbers
+                    "metadata": json.dumps(chunk.metadata)
+                })
+        self._count(writes=len(chunks))
+
+    def delete_chunks(self, document_id: str, chunk_ids: List[str]):
+        if not chunk_ids:
+            return
+        with self._table.batch_writer() as batch:
+            for uid in chunk_ids:
+                batch.delete_item(Key={"pk": f"DOC#{document_id}", "sk": f"CHUNK#{uid}"})
+        self._count(writes=len(chunk_ids))
+
+    def hydrate(self, chunks: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        if not chunks:
+            return {}
+
+        # Chunks and their documents in the same batched read
+        keys = [{"pk": f"DOC#{document_id}", "sk": f"CHUNK#{uid}"} for uid, document_id in chunks.items()]
+        keys.extend({"pk": f"DOC#{document_id}", "sk": "DOC"} for document_id in set(chunks.values()))
+
+        documents, found = {}, {}
+        for item in self._batch_get(keys):
+            if item["sk"] == "DOC":
+                documents[item["document_id"]] = self._record(item).to_dict()
+            else:
+                found[item["sk"][len("CHUNK#"):]] = json.loads(item["metadata"])
+
+        return {
+            uid: self._merge(documents.get(chunks[uid]), metadata)
+            for uid, metadata in found.items()
+        }
+
+    def find_chunks(self, filters: DocumentFilter) -> List[str]:
+        if filters.document_id is not None:
+            items = self._document_items(filters.document_id)
+            records = [self._record(item) for item in items if item["sk"] == "DOC"]
+            if not records or not filters.matches(records[0]):
+                return []
+            return [item["sk"][len("CHUNK#"):] for item in items if item["sk"] != "DOC"]
+
+        # Other filters read the document records from the index, which chunk
+        # items aren't in; the collection caches the resolved chunks until the
+        # index changes
+        documents = [
+            record.document_id for record in map(self._record, self._document_records(filters))
+            if filters.matches(record)
+        ]
+        return [
+            item["sk"][len("CHUNK#"):]
+            for document_id in documents
+            for item in self._document_items(document_id, "sk", chunks_only=True)
+        ]
+
+    def _document_records(self, filters: DocumentFilter) -> List[Dict[str, Any]]:
+        """
+        Document records that may match a filter, from the DOCUMENTS_INDEX GSI.
+
+        The GSI is keyed on collection and uploaded_at, attributes only
+        document records have, so it holds one small item per document. A
+        collection is queried with the upload range as key condition; without
+        one, the GSI is scanned. file_type is checked by the caller.
+        """
+        kwargs: Dict[str, Any] = {
+            "IndexName": self.DOCUMENTS_INDEX,
+            "ProjectionExpression": "document_id, #collection, file_type, uploaded_at",
+            "ExpressionAttributeNames": {"#collection": "collection"}
+        }
+        if filters.collection is not None:
+            condition, values = "#collection = :collection", {":collection": filters.collection}
+            # Both bounds are inclusive here; matches() excludes uploaded_before
+            if filters.uploaded_after is not None and filters.uploaded_before is not None:
+                condition += " and uploaded_at between :after and :before"
+                values.update({":after": filters.uploaded_after, ":before": filters.uploaded_before})
+            elif filters.uploaded_after is not None:
+                condition += " and uploaded_at >= :after"
+                values[":after"] = filters.uploaded_after
+            elif filters.uploaded_before is not None:
+                condition += " and uploaded_at < :before"
+                values[":before"] = filters.uploaded_before
+            kwargs.update({"KeyConditionExpression": condition, "ExpressionAttributeValues": values})
+            read = self._table.query
+        else:
+            read = self._table.scan
+
+        items = []
+        while True:
+            response = read(**kwargs)
+            items.extend(response["Items"])
+            self._count(reads=1)
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        return items
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.backend, "table": self.table_name, "reads": self._reads, "writes": self._writes}
+
+    def _batch_get(self, keys: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """BatchGetItem in groups of 100 keys, retrying unprocessed keys."""
+        unique = list({(key["pk"], key["sk"]): key for key in keys}.values())
+        items = []
+        for start in range(0, len(unique), self.BATCH_GET_KEYS):
+            request = {self.table_name: {"Keys": unique[start:start + self.BATCH_GET_KEYS]}}
+            attempt = 0
+            while request:
+                response = self._dynamodb.batch_get_item(RequestItems=request)
+                items.extend(response["Responses"].get(self.table_name, []))
+                request = response.get("UnprocessedKeys") or None
+                if request:
+                    attempt += 1
+                    time.sleep(min(0.05 * 2 ** attempt, 1.0))
+        self._count(reads=len(unique))
+        return items
+
+    def _document_items(
+        self,
+        document_id: str,
+        projection: Optional[str] = None,
+        chunks_only: bool = False
+    ) -> List[Dict[str, Any]]:
+        """All items under a document's partition key: its record and chunk metadata, or only the chunks."""
+        items = []
+        kwargs = {
+            "KeyConditionExpression": "pk = :pk",
+            "ExpressionAttributeValues": {":pk": f"DOC#{document_id}"}
+        }
+        if chunks_only:
+            kwargs["KeyConditionExpression"] += " and begins_with(sk, :chunk)"
+            kwargs["ExpressionAttributeValues"][":chunk"] = "CHUNK#"
+        if projection:
+            kwargs["ProjectionExpression"] = projection
+        while True:
+            response = self._table.query(**kwargs)
+            items.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        self._count(reads=1)
+        return items
+
+    @staticmethod
+    def _record(item: Dict[str, Any]) -> DocumentRecord:
+        fields = {field: item.get(field) for field in DocumentRecord._fields}
+        # Numbers come back as Decimal
+        fields["version"] = int(fields["version"] or 0)
+        fields["chunks"] = int(fields["chunks"] or 0)
+        fields["collection"] = fields["collection"] or DEFAULT_COLLECTION
+        return DocumentRecord(**fields)
+
+    def _count(self, reads: int = 0, writes: int = 0):
+        with self._lock:
+            self._reads += reads
+            self._writes += writes
+
+
+def document_record(
+    document_id: str,
+    filename: str,
+    file_type: str,
+    s3_key: Optional[str],
+    content_hash: Optional[str],
+    version: int,
+    status: str,
+    chunks: int,
+    uploaded_at: str,
+    collection: str = DEFAULT_COLLECTION
+) -> DocumentRecord:
+    """Build a document record stamped with the current time."""
+    return DocumentRecord(
+        document_id=document_id,
+        filename=filename,
+        file_type=file_type,
+        s3_key=s3_key,
+        content_hash=content_hash,
+        version=version,
+        status=status,
+        chunks=chunks,
+        uploaded_at=uploaded_at,
+        updated_at=datetime.utcnow().isoformat(),
+        collection=collection
+    )
+
+
+def create_metadata_store() -> MetadataStore:
+    """Metadata store for the configured METADATA_BACKEND."""
+    if settings.METADATA_BACKEND == "dynamodb":
+        return DynamoDBMetadataStore(settings.AWS_DYNAMODB_TABLE, settings.AWS_REGION)
+    if settings.METADATA_BACKEND == "sqlite":
+        return SQLiteMetadataStore(
+            settings.METADATA_SQLITE_PATH or os.path.join(settings.TXTAI_INDEX_PATH, "metadata.sqlite")
+        )
+    raise ValueError(f"Unsupported METADATA_BACKEND: {settings.METADATA_BACKEND}")
+
+
+# Global instance, created on first use or by the startup warm-up
+metadata_store = Lazy(create_metadata_store, "metadata_store")
@@ -0,0 +1,123 @@
+"""
+Page-parallel PDF text extraction.
+
+Pages are extracted on a process pool, a few pages per task, and yielded in
+page order as they complete. At most PDF_PAGE_WINDOW pages are in flight or
+waiting to be consumed, so memory is bounded by the window rather than the
+document size. Workers open the PDF from a file path instead of receiving
+its bytes.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Reader of the most recently opened file in each worker process, so tasks
+# for consecutive page ranges of one file don't re-parse its structure
+_worker_reader: Dict[str, PdfReader] = {}
+
+
+def _extract_pages(path: str, first: int, last: int) -> List[str]:
+    """Extract text of pages [first, last) in a worker process."""
+    reader = _worker_reader.get(path)
+    if reader is None:
+        _worker_reader.clear()
+        reader = _worker_reader[path] = PdfReader(path)
+
+    return [reader.pages[number].extract_text() or "" for number in range(first, last)]
+
+
+class PdfExtractor:
+    """Extracts PDF pages in parallel while bounding the pages held in memory."""
+
+    def __init__(self, max_workers: int, page_window: int, parallel_min_pages: int):
+        """
+        Args:
+            max_workers: Worker processes
+            page_window: Maximum pages submitted but not yet consumed
+            parallel_min_pages: Smaller documents are extracted in the calling thread
+        """
+        self.max_workers = max_workers
+        self.page_window = max(page_window, 1)
+        self.parallel_min_pages = parallel_min_pages
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def iter_pages(self, path: str) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page_number, text) for every page, in order.
+
+        Page numbers start at 1.
+
+        Args:
+            path: Path of the PDF file
+        """
+        pages = len(PdfReader(path).pages)
+
+        if pages < self.parallel_min_pages or self.max_workers <= 1:
+            reader = PdfReader(path)
+            for number in range(pages):
+                yield number + 1, reader.pages[number].extract_text() or ""
+            return
+
+        # Small tasks keep all workers busy within the window
+        per_task = max(1, min(8, self.page_window // (2 * self.max_workers)))
+        pool = self._get_pool()
+        pending: Deque[Tuple[int, Future]] = deque()
+        next_page = 0
+
+        try:
+            while next_page < pages or pending:
+                # Top up the window of submitted pages
+                in_flight = next_page - (pending[0][0] if pending else next_page)
+                while next_page < pages and in_flight + per_task <= self.page_window:
+                    last = min(next_page + per_task, pages)
+                    pending.append((next_page, pool.submit(_extract_pages, path, next_page, last)))
+                    in_flight += last - next_page
+                    next_page = last
+
+                first, future = pending.popleft()
+                for offset, text in enumerate(future.result()):
+                    yield first + offset + 1, text
+        finally:
+            # Consumer stopped early or a page failed
+            for _, future in pending:
+                future.cancel()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Start the worker processes on first use."""
+        with self._lock:
+            if self._pool is None:
+                # Spawned workers don't inherit the parent's model threads and locks
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Started PDF extraction pool with {self.max_workers} processes")
+            return self._pool
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+# Global instance
+pdf_extractor = PdfExtractor(
+    max_workers=settings.PDF_WORKERS or os.cpu_count() or 1,
+    page_window=settings.PDF_PAGE_WINDOW,
+    parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES
+)
@@ -0,0 +1,199 @@
+"""
+Micro-batching scheduler for concurrent single-query searches.
+
+Queries arriving while a batch is being searched are collected and encoded
+and searched together with TxtaiClient.batch_search, and each caller gets its
+own results back. A query that finds no batch of its kind running is searched
+right away, so an idle server adds no wait. Otherwise the collected queries
+are dispatched when the running batch finishes, when they reach
+QUERY_BATCH_MAX_SIZE, or QUERY_BATCH_MAX_WAIT_MS after the first of them
+arrived, whichever comes first.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.executors import BoundedExecutor, cpu_executor
+from app.core.histogram import Histogram
+from app.core.metadata_store import DocumentFilter
+from app.core.txtai_client import txtai_client
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+
+# Queries share a batch when their (limit, mode, filters, collection) match
+BatchKey = Tuple[int, str, Optional[DocumentFilter], Optional[str]]
+
+
+class PendingQuery(NamedTuple):
+    query: str
+    future: asyncio.Future
+    enqueued: float
+
+
+class QueryBatcher:
+    """Collects in-flight queries per result limit, search mode, filter and collection and searches them as one batch."""
+
+    def __init__(
+        self,
+        search_batch: Callable[..., List[List[Dict[str, Any]]]],
+        executor: BoundedExecutor,
+        max_batch_size: int,
+        max_wait: float
+    ):
+        """
+        Args:
+            search_batch: Blocking callable taking (queries, limit, mode=..., filters=..., collection=...), returning one
+                result list per query
+            executor: Pool that runs search_batch
+            max_batch_size: Dispatch as soon as this many queries are waiting
+            max_wait: Longest a query waits for a running batch before it is dispatched anyway
+        """
+        self.search_batch = search_batch
+        self.executor = executor
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait
+
+        # Only touched from the event loop
+        self._pending: Dict[BatchKey, List[PendingQuery]] = {}
+        self._timers: Dict[BatchKey, asyncio.TimerHandle] = {}
+        # Batches handed to the executor and not finished yet
+        self._running: Dict[BatchKey, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._failed_batches = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_ms = Histogram(WAIT_MS_BUCKETS)
+
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        mode: str,
+        filters: Optional[DocumentFilter] = None,
+        collection: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Queue a query for the next batch and await its results.
+
+        Args:
+            query: Search query
+            limit: Maximum number of results
+            mode: Resolved search mode, see TxtaiClient.search_mode
+            filters: Only search chunks of documents matching this filter
+            collection: Collection to search; None for the default collection
+
+        Raises:
+            PoolSaturatedError: If the executor rejected the batch
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # Queries with different limits, modes, filters or collections can't share one search
+        key = (limit, mode, filters, collection)
+        pending = self._pending.setdefault(key, [])
+        pending.append(PendingQuery(query, future, time.monotonic()))
+
+        # Waiting only pays off while a batch is running to collect queries behind
+        if len(pending) >= self.max_batch_size or not self._running.get(key):
+            self._dispatch(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._dispatch, key)
+
+        return await future
+
+    def _dispatch(self, key: BatchKey):
+        """Hand the queries waiting for a (limit, mode, filters, collection) to the executor."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(key, [])
+        if not batch:
+            return
+
+        now = time.monotonic()
+        self.batch_sizes.observe(len(batch))
+        for item in batch:
+            self.wait_ms.observe((now - item.enqueued) * 1000)
+
+        self._running[key] = self._running.get(key, 0) + 1
+        task = asyncio.ensure_future(self._run(batch, *key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        batch: List[PendingQuery],
+        limit: int,
+        mode: str,
+        filters: Optional[DocumentFilter],
+        collection: Optional[str]
+    ):
+        """Search a batch and fan results back out to the waiting callers."""
+        # Identical concurrent queries are searched once
+        queries = list(dict.fromkeys(item.query for item in batch))
+
+        key = (limit, mode, filters, collection)
+        try:
+            results = await self.executor.run(
+                self.search_batch, queries, limit, mode=mode, filters=filters, collection=collection
+            )
+        except Exception as e:
+            logger.error(f"Error searching batch of {len(queries)} queries: {e}")
+            with self._lock:
+                self._batches += 1
+                self._failed_batches += 1
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        finally:
+            self._finished(key)
+
+        with self._lock:
+            self._batches += 1
+
+        by_query = dict(zip(queries, results))
+        for item in batch:
+            # Callers that disconnected have cancelled their future
+            if not item.future.done():
+                item.future.set_result([dict(result) for result in by_query[item.query]])
+
+    def _finished(self, key: BatchKey):
+        """Count a batch as done and dispatch the queries that collected behind it."""
+        self._running[key] -= 1
+        if not self._running[key]:
+            del self._running[key]
+        if key in self._pending:
+            self._dispatch(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch counters and batch-size / wait-time histograms."""
+        with self._lock:
+            batches, failed = self._batches, self._failed_batches
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "failed_batches": failed,
+            "batch_size": self.batch_sizes.get_stats(),
+            "wait_ms": self.wait_ms.get_stats()
+        }
+
+
+# Global instance; route handlers check the result cache before queueing
+query_batcher = QueryBatcher(
+    lambda *args, **kwargs: txtai_client.batch_search(*args, use_cache=False, **kwargs),
+    cpu_executor,
+    max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+    max_wait=settings.QUERY_BATCH_MAX_WAIT_MS / 1000
+)
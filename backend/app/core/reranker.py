@@ -0,0 +1,189 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+
+The first-stage retrievers score query and chunk independently. A
+cross-encoder reads each (query, chunk) pair together and orders the
+candidates more precisely, so fewer chunks need to reach the prompt. It costs
+one forward pass per candidate, so candidates are scored in padded batches
+under a per-request deadline. When the next batch would finish past the
+deadline, or the model can't be loaded, the candidates keep their first-stage
+order.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.histogram import Histogram
+
+logger = logging.getLogger(__name__)
+
+LATENCY_MS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Weight of the latest batch in the per-pair latency estimate
+_ESTIMATE_WEIGHT = 0.2
+
+
+class RerankResult(NamedTuple):
+    results: List[Dict[str, Any]]
+    # False when the first-stage order was kept
+    reranked: bool
+    elapsed_ms: float
+
+
+class Reranker:
+    """Rescores search results with a cross-encoder, within a latency budget."""
+
+    def __init__(self, model: str, batch_size: int, max_length: int):
+        """
+        Args:
+            model: Hugging Face cross-encoder with a single relevance logit
+            batch_size: (query, chunk) pairs per forward pass
+            max_length: Tokens per pair; longer chunks are truncated
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._tokenizer = None
+        self._model = None
+        # Seconds per pair, learned from completed batches
+        self._pair_seconds: Optional[float] = None
+
+        self._reranked = 0
+        self._budget_fallbacks = 0
+        self._error_fallbacks = 0
+        self.latency_ms = Histogram(LATENCY_MS_BUCKETS)
+
+    def rerank(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        limit: int,
+        deadline: Optional[float] = None
+    ) -> RerankResult:
+        """
+        Order search results by cross-encoder relevance.
+
+        Args:
+            query: Search query
+            candidates: Search results with "text", in first-stage order
+            limit: Maximum results to return
+            deadline: time.monotonic() by which scoring must finish; None for no limit
+
+        Returns:
+            The top results, with a "rerank_score" when reranked
+        """
+        start = time.monotonic()
+        scores = None
+        try:
+            scores = self._score(query, [candidate["text"] for candidate in candidates], deadline)
+        except Exception as e:
+            logger.error(f"Reranking failed, keeping first-stage order: {e}")
+            with self._lock:
+                self._error_fallbacks += 1
+
+        elapsed_ms = (time.monotonic() - start) * 1000
+        self.latency_ms.observe(elapsed_ms)
+
+        if scores is None:
+            return RerankResult([dict(candidate) for candidate in candidates[:limit]], False, elapsed_ms)
+
+        with self._lock:
+            self._reranked += 1
+        # Stable sort keeps first-stage order between equal scores
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])[:limit]
+        return RerankResult(
+            [{**candidates[i], "rerank_score": scores[i]} for i in order],
+            True,
+            elapsed_ms
+        )
+
+    def _score(self, query: str, texts: List[str], deadline: Optional[float]) -> Optional[List[float]]:
+        """Relevance logits for each text, or None if the deadline would be missed."""
+        if not texts:
+            return []
+
+        tokenizer, model = self._load()
+        import torch
+
+        scores = []
+        for offset in range(0, len(texts), self.batch_size):
+            batch = texts[offset:offset + self.batch_size]
+            if deadline is not None and not self._fits(len(batch), deadline):
+                with self._lock:
+                    self._budget_fallbacks += 1
+                return None
+
+            started = time.monotonic()
+            inputs = tokenizer(
+                [query] * len(batch),
+                batch,
+                padding=True,
+                truncation="only_second",
+                max_length=self.max_length,
+                return_tensors="pt"
+            )
+            with torch.inference_mode():
+                logits = model(**inputs).logits
+            scores.extend(logits[:, 0].tolist())
+            self._learn((time.monotonic() - started) / len(batch))
+
+        return scores
+
+    def _fits(self, pairs: int, deadline: float) -> bool:
+        """Whether scoring this many pairs is expected to finish before the deadline."""
+        now = time.monotonic()
+        if now >= deadline:
+            return False
+        # Without an estimate yet, the first batch is tried
+        return self._pair_seconds is None or now + self._pair_seconds * pairs <= deadline
+
+    def _learn(self, pair_seconds: float):
+        with self._lock:
+            if self._pair_seconds is None:
+                self._pair_seconds = pair_seconds
+            else:
+                self._pair_seconds += _ESTIMATE_WEIGHT * (pair_seconds - self._pair_seconds)
+
+    def _load(self):
+        """Tokenizer and model, loaded on first use."""
+        if self._loaded:
+            return self._tokenizer, self._model
+
+        with self._load_lock:
+            if not self._loaded:
+                from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+                start = time.monotonic()
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model)
+                self._model = AutoModelForSequenceClassification.from_pretrained(self.model)
+                self._model.eval()
+                self._loaded = True
+                logger.info(f"Loaded cross-encoder {self.model} in {time.monotonic() - start:.1f}s")
+
+        return self._tokenizer, self._model
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model,
+                "loaded": self._loaded,
+                "reranked": self._reranked,
+                "budget_fallbacks": self._budget_fallbacks,
+                "error_fallbacks": self._error_fallbacks,
+                "pair_ms": round(self._pair_seconds * 1000, 3) if self._pair_seconds is not None else None,
+                "latency_ms": self.latency_ms.get_stats()
+            }
+
+
+# Global instance; the model loads on the first reranked request
+reranker = Reranker(
+    settings.RERANK_MODEL,
+    batch_size=settings.RERANK_BATCH_SIZE,
+    max_length=settings.RERANK_MAX_LENGTH
+)
@@ -0,0 +1,197 @@
+"""
+Response cache for LLM generation.
+
+Exact hits are keyed on (model_id, normalized prompt, max_tokens, temperature).
+With semantic caching enabled, a miss can still be answered by a cached
+response to a near-duplicate question asked over the same retrieved chunks,
+matched by cosine similarity of question embeddings.
+"""
+import logging
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.lru_cache import LRUCache
+from app.core.txtai_client import chunk_document_id, txtai_client
+
+logger = logging.getLogger(__name__)
+
+
+class CacheKey(NamedTuple):
+    model_id: str
+    prompt: str
+    max_tokens: int
+    temperature: float
+
+
+class CacheEntry(NamedTuple):
+    result: Dict[str, Any]
+    chunk_ids: FrozenSet[str]
+    document_ids: FrozenSet[str]
+    vector: Optional[np.ndarray]
+
+
+def normalize(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different prompts share a key."""
+    return " ".join(text.split()).casefold()
+
+
+class ResponseCache:
+    """Bounded LRU/TTL cache of generation results with optional semantic matching."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        semantic: bool = False,
+        threshold: float = 0.95
+    ):
+        self.semantic = semantic
+        self.threshold = threshold
+
+        self._cache = LRUCache(max_entries, ttl=ttl, max_bytes=max_bytes, on_evict=self._evicted)
+
+        # Semantic candidates grouped by (model_id, max_tokens, temperature, chunk ids)
+        self._scopes: Dict[Tuple, set] = {}
+        self._scope_lock = threading.Lock()
+        self._semantic_hits = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def key(model_id: str, prompt: str, max_tokens: int, temperature: float) -> CacheKey:
+        """Build the exact-match key for a generation request."""
+        return CacheKey(model_id, normalize(prompt), max_tokens, temperature)
+
+    def uses_semantic(self, chunk_ids: Optional[Iterable[str]]) -> bool:
+        """Semantic matching only applies to questions asked over known chunks."""
+        return self.semantic and bool(chunk_ids)
+
+    def embed(self, question: str) -> np.ndarray:
+        """Embed a question with the txtai model for semantic matching."""
+        return txtai_client.embed([normalize(question)])[0]
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Exact lookup."""
+        entry = self._cache.get(key)
+        return entry.result if entry else None
+
+    def get_similar(
+        self,
+        key: CacheKey,
+        vector: np.ndarray,
+        chunk_ids: Iterable[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Find a cached response to a near-duplicate question over the same chunks."""
+        with self._scope_lock:
+            candidates = list(self._scopes.get(self._scope(key, frozenset(chunk_ids)), ()))
+
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            entry = self._cache.peek(candidate)
+            if entry is None or entry.vector is None:
+                continue
+
+            score = float(np.dot(entry.vector, vector))
+            if score >= best_score:
+                best, best_score = candidate, score
+
+        if best is None:
+            return None
+
+        entry = self._cache.get(best)
+        if entry is None:
+            return None
+
+        with self._scope_lock:
+            self._semantic_hits += 1
+        logger.debug(f"Semantic cache hit with similarity {best_score:.3f}")
+        return entry.result
+
+    def put(
+        self,
+        key: CacheKey,
+        result: Dict[str, Any],
+        chunk_ids: Optional[Iterable[str]] = None,
+        vector: Optional[np.ndarray] = None
+    ):
+        """Store a generation result."""
+        chunk_ids = frozenset(chunk_ids or ())
+        entry = CacheEntry(
+            result=result,
+            chunk_ids=chunk_ids,
+            document_ids=frozenset(chunk_document_id(uid) for uid in chunk_ids),
+            vector=vector
+        )
+
+        size = len(key.prompt) + len(str(result.get("text", ""))) + (vector.nbytes if vector is not None else 0)
+        self._cache.put(key, entry, size=size)
+
+        if vector is not None and chunk_ids:
+            with self._scope_lock:
+                self._scopes.setdefault(self._scope(key, chunk_ids), set()).add(key)
+
+    def invalidate_documents(self, document_ids: Optional[List[str]]) -> int:
+        """Drop responses generated from chunks of the given documents; None drops all of them."""
+        if document_ids is None:
+            removed = len(self._cache)
+            self.clear()
+        else:
+            documents = set(document_ids)
+            removed = self._cache.remove_if(lambda key, entry: bool(entry.document_ids & documents))
+        if removed:
+            with self._scope_lock:
+                self._invalidations += removed
+            scope = f"{len(document_ids)} documents" if document_ids is not None else "a new index snapshot"
+            logger.info(f"Invalidated {removed} cached responses for {scope}")
+        return removed
+
+    def clear(self):
+        """Drop all cached responses."""
+        self._cache.clear()
+        with self._scope_lock:
+            self._scopes.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache size, hit rates and invalidation counters."""
+        stats = self._cache.get_stats()
+        with self._scope_lock:
+            stats.update({
+                "semantic": self.semantic,
+                "semantic_threshold": self.threshold,
+                "semantic_hits": self._semantic_hits,
+                "invalidations": self._invalidations
+            })
+        return stats
+
+    @staticmethod
+    def _scope(key: CacheKey, chunk_ids: FrozenSet[str]) -> Tuple:
+        return (key.model_id, key.max_tokens, key.temperature, chunk_ids)
+
+    def _evicted(self, key: CacheKey, entry: CacheEntry):
+        """Keep the semantic scope index in sync with the LRU cache."""
+        if entry.vector is None or not entry.chunk_ids:
+            return
+
+        scope = self._scope(key, entry.chunk_ids)
+        with self._scope_lock:
+            keys = self._scopes.get(scope)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._scopes[scope]
+
+
+# Global instance
+response_cache = ResponseCache(
+    max_entries=settings.GENERATION_CACHE_MAX_ENTRIES,
+    max_bytes=settings.GENERATION_CACHE_MAX_BYTES,
+    ttl=settings.GENERATION_CACHE_TTL_SECONDS,
+    semantic=settings.GENERATION_CACHE_SEMANTIC,
+    threshold=settings.GENERATION_CACHE_SEMANTIC_THRESHOLD
+)
+
+# Re-ingesting or deleting a document invalidates answers built from it
+txtai_client.on_load(lambda client: client.add_listener(response_cache.invalidate_documents))
@@ -8,6 +8,7 @@ from typing import Optional, BinaryIO
 from botocore.exceptions import ClientError
 from datetime import datetime
 from app.core.config import settings
+from app.core.lazy import Lazy
 
 logger = logging.getLogger(__name__)
 
@@ -246,5 +247,5 @@ class S3Client:
             raise
 
 
-# Global instance
-s3_client = S3Client()
+# Global instance, created on first use or by the startup warm-up
+s3_client = Lazy(S3Client, "s3_client")
@@ -0,0 +1,91 @@
+"""
+Query-vector and search-result caches for the retrieval layer.
+
+Query vectors depend only on the embedding model, so they stay valid across
+index changes. Result lists are keyed on the index generation, which
+TxtaiClient bumps on every change, and the collection searched, and are
+dropped when the index changes.
+"""
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.lru_cache import LRUCache
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace so trivially different queries share cache entries."""
+    return " ".join(query.split())
+
+
+class SearchCache:
+    """In-process caches in front of TxtaiClient.search."""
+
+    def __init__(self, max_results: int, max_vectors: int):
+        """
+        Args:
+            max_results: Maximum number of cached result lists
+            max_vectors: Maximum number of cached query vectors
+        """
+        self._results = LRUCache(max_results)
+        self._vectors = LRUCache(max_vectors)
+
+    def get_results(
+        self,
+        query: str,
+        limit: int,
+        mode: str,
+        generation: int,
+        filters: Optional[Hashable] = None,
+        collection: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Cached results for a query, search mode, filter and collection against the given index generation."""
+        results = self._results.get(self._key(query, limit, mode, generation, filters, collection))
+        # Copy so callers can't modify cached entries
+        return [dict(result) for result in results] if results is not None else None
+
+    def put_results(
+        self,
+        query: str,
+        limit: int,
+        mode: str,
+        generation: int,
+        results: List[Dict[str, Any]],
+        filters: Optional[Hashable] = None,
+        collection: Optional[str] = None
+    ):
+        """Store results for a query, search mode, filter and collection against the given index generation."""
+        self._results.put(
+            self._key(query, limit, mode, generation, filters, collection),
+            [dict(result) for result in results]
+        )
+
+    def get_vector(self, query: str) -> Optional[np.ndarray]:
+        """Cached embedding vector for a query."""
+        return self._vectors.get(normalize_query(query))
+
+    def put_vector(self, query: str, vector: np.ndarray):
+        """Store the embedding vector for a query."""
+        self._vectors.put(normalize_query(query), vector)
+
+    def invalidate(self):
+        """Drop cached results after an index change; vectors remain valid."""
+        self._results.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rates and sizes of both caches."""
+        return {
+            "results": self._results.get_stats(),
+            "vectors": self._vectors.get_stats()
+        }
+
+    @staticmethod
+    def _key(
+        query: str,
+        limit: int,
+        mode: str,
+        generation: int,
+        filters: Optional[Hashable],
+        collection: Optional[str]
+    ) -> Tuple:
+        return (normalize_query(query), limit, mode, generation, filters, collection)
@@ -0,0 +1,186 @@
+"""
+Local, memory-mappable copies of index snapshots for read-only serving.
+
+Snapshots live on a shared file system such as EFS, where every page read
+is a network round trip and pages are cached per client. A read-only
+worker serves a copy of the shard's current snapshot on local disk instead,
+with the vector index in a form Faiss can map (see ann_index.write_mappable)
+and the SQLite content and keyword databases opened read-only with mmap.
+Worker processes on one host map the same files, so the page cache holds
+one copy of the index for all of them.
+
+Copies are written to a temporary directory and renamed into place, so
+workers starting together can race safely: one rename wins and the others
+discard their copy and use it. A writer in another process can publish a
+newer snapshot and prune the one being copied; the copy then starts over
+from the newer one.
+
+Every worker using a copy holds a shared lock on a lock file next to it
+until it releases the copy. Making a copy prunes the copies of older
+snapshots that no worker holds.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import IO, NamedTuple, Optional
+from urllib.parse import quote
+
+from app.core import ann_index
+from app.core.config import settings
+from app.core.index_persistence import SNAPSHOT_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# txtai's vector index file inside a snapshot
+VECTOR_INDEX = "embeddings"
+
+# SQLite maps at most this much of a database file by default
+MAX_MMAP_BYTES = 0x7fff0000
+
+
+def cache_path() -> str:
+    """Directory for local snapshot copies."""
+    return settings.INDEX_LOCAL_CACHE_PATH or os.path.join(tempfile.gettempdir(), "txtai-index-cache")
+
+
+# Copies restarted because the snapshot or its copy was pruned first
+COPY_ATTEMPTS = 3
+
+
+class LocalSnapshot(NamedTuple):
+    """A local snapshot copy, kept from pruning until released."""
+    path: str
+    lock: IO
+
+    def release(self):
+        """Let a later copy prune this one once no other worker holds it."""
+        self.lock.close()
+
+
+def local_snapshot(shard_path: str, index_link: str) -> LocalSnapshot:
+    """
+    Local copy of the snapshot a shard's index link points at, made on first use.
+
+    Args:
+        shard_path: Shard directory, which names the copies' directory
+        index_link: The shard's `index` link or snapshot directory
+
+    Returns:
+        The local copy, laid out like the snapshot; release it when it is no longer served
+    """
+    for attempt in range(COPY_ATTEMPTS):
+        snapshot = os.path.realpath(index_link)
+        try:
+            copy = _copy(shard_path, snapshot)
+        except Exception:
+            # Faiss and shutil fail in different ways on files removed while they are read
+            if os.path.isdir(snapshot) or attempt == COPY_ATTEMPTS - 1:
+                raise
+            logger.info(f"Snapshot {snapshot} was pruned while copying it; copying the current one")
+            continue
+
+        if copy is not None:
+            return copy
+        logger.info(f"Copy of {snapshot} was pruned before it was opened; copying the current one")
+
+    raise RuntimeError(f"Copies of the snapshots of {shard_path} were pruned {COPY_ATTEMPTS} times in a row")
+
+
+def _copy(shard_path: str, snapshot: str) -> Optional[LocalSnapshot]:
+    """
+    Copy one snapshot directory into the cache, unless it is there already, and hold it.
+
+    Returns:
+        The held copy, or None if a worker with a newer copy pruned it before it was held
+    """
+    shard = os.path.realpath(shard_path)
+    # Shards of different collections and volumes can have the same name
+    directory = os.path.join(
+        cache_path(), f"{os.path.basename(shard)}-{hashlib.sha1(shard.encode()).hexdigest()[:12]}"
+    )
+    name = os.path.basename(snapshot)
+    target = os.path.join(directory, name)
+    os.makedirs(directory, exist_ok=True)
+    if not os.path.isdir(target):
+        _write_copy(snapshot, directory, target)
+
+    # Pruning deletes a copy while holding its lock exclusively, so a copy
+    # still there once the shared lock is taken stays until it is released
+    lock = open(_lock_path(directory, name), "a+")
+    fcntl.flock(lock, fcntl.LOCK_SH)
+    if not os.path.isdir(target):
+        lock.close()
+        return None
+
+    _prune(directory, keep=name)
+    return LocalSnapshot(target, lock)
+
+
+def _write_copy(snapshot: str, directory: str, target: str):
+    """Write a snapshot's files into a temporary directory and rename it to target."""
+    start = time.perf_counter()
+    temporary = tempfile.mkdtemp(prefix=f".{os.path.basename(snapshot)}-", dir=directory)
+    try:
+        mappable = True
+        for name in os.listdir(snapshot):
+            if name == VECTOR_INDEX:
+                mappable = ann_index.write_mappable(os.path.join(snapshot, name), os.path.join(temporary, name))
+            else:
+                shutil.copy2(os.path.join(snapshot, name), os.path.join(temporary, name))
+        if not mappable:
+            logger.warning(f"Vector index of {snapshot} can't be memory-mapped; each worker loads its own copy")
+
+        try:
+            os.rename(temporary, target)
+            logger.info(f"Copied {snapshot} to {target} in {time.perf_counter() - start:.1f}s")
+        except OSError:
+            # Another worker renamed its copy first
+            if not os.path.isdir(target):
+                raise
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+
+
+def _lock_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f".{name}.lock")
+
+
+def _prune(directory: str, keep: str):
+    """
+    Remove copies of snapshots older than keep that no worker holds.
+
+    Snapshot names end in a fixed-width UTC timestamp, so they sort by age.
+    Copies of newer snapshots, made by workers that already switched to
+    them, are left alone.
+    """
+    for name in os.listdir(directory):
+        if not name.startswith(SNAPSHOT_PREFIX) or name >= keep:
+            continue
+
+        with open(_lock_path(directory, name), "a+") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Served or about to be loaded by a worker
+                continue
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+            os.remove(_lock_path(directory, name))
+
+
+def connect_read_only(path: str) -> sqlite3.Connection:
+    """
+    Open an SQLite database read-only, reading pages through a shared memory map.
+
+    The file must not change while it is open: it is opened as immutable, so
+    SQLite skips locking and change detection.
+    """
+    connection = sqlite3.connect(
+        f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True, check_same_thread=False
+    )
+    connection.execute(f"pragma mmap_size = {min(os.path.getsize(path), MAX_MMAP_BYTES)}")
+    return connection
@@ -0,0 +1,114 @@
+"""
+txtai Faiss backend that builds the index ann_index plans.
+
+This is the class named by ann_index.BACKEND. It subclasses txtai's Faiss,
+and importing txtai loads PyTorch, so it lives apart from the planning
+functions and is only imported once an index is created or loaded.
+"""
+import faiss
+import numpy as np
+from txtai.ann import Faiss
+
+from app.core.ann_index import _hnsw, plan
+
+
+class TunedFaiss(Faiss):
+    """txtai Faiss backend that picks its index per build and supports HNSW deletes."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        # Search parameters excluding tombstones, rebuilt after deletes
+        self._search_params = None
+
+    def setting(self, name, default=None):
+        # Options live under "faiss" like the built-in backend's, not the class path
+        options = self.config.get("faiss") or {}
+        value = options.get(name)
+        return value if value else default
+
+    def load(self, path):
+        # Mapped files are shared, so they are mapped read-only
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if self.setting("mmap") is True else 0
+        self.backend = faiss.read_index(path, flags)
+
+    def index(self, embeddings):
+        """Build a new index, as txtai's Faiss.index but with the planned components."""
+        train, sample = embeddings, self.setting("sample")
+        if sample:
+            rng = np.random.default_rng(0)
+            indices = sorted(rng.choice(train.shape[0], int(sample * train.shape[0]), replace=False, shuffle=False))
+            train = train[indices]
+
+        components = self.setting("components")
+        if not components:
+            components = plan(embeddings.shape[0], embeddings.shape[1], self.config.get("faiss") or {}).components
+        self.backend = faiss.index_factory(embeddings.shape[1], components, faiss.METRIC_INNER_PRODUCT)
+
+        hnsw = _hnsw(self.backend)
+        if hnsw is not None:
+            hnsw.hnsw.efConstruction = self.setting("ef_construction", 40)
+
+        self.backend.train(train)
+        self.backend.add_with_ids(embeddings, np.arange(embeddings.shape[0], dtype=np.int64))
+
+        self.config["offset"] = embeddings.shape[0]
+        self.config.pop("deleted", None)
+        self._search_params = None
+        self.metadata({
+            "components": components,
+            "vectors": embeddings.shape[0],
+            # Explicit components are kept by automatic retuning
+            "tuned": not self.setting("components")
+        })
+
+    def delete(self, ids):
+        if _hnsw(self.backend) is None:
+            super().delete(ids)
+            return
+
+        # Saved with the index configuration until the next rebuild
+        self.config["deleted"] = sorted(set(self.config.get("deleted", [])) | {int(uid) for uid in ids})
+        self._search_params = None
+
+    def search(self, queries, limit):
+        hnsw = _hnsw(self.backend)
+        if hnsw is None:
+            return super().search(queries, limit)
+
+        # IDMap doesn't take search parameters, so the graph is searched
+        # directly and positions are mapped back to ids
+        if self._search_params is None:
+            self._search_params = self._hnsw_params(hnsw)
+        params, _ = self._search_params
+        scores, positions = hnsw.search(np.ascontiguousarray(queries, dtype=np.float32), limit, params=params)
+
+        labels = faiss.vector_to_array(self.backend.id_map)
+        ids = np.where(positions >= 0, labels[np.maximum(positions, 0)], -1)
+        return [list(zip(row_ids.tolist(), row_scores.tolist())) for row_ids, row_scores in zip(ids, scores)]
+
+    def _hnsw_params(self, hnsw: faiss.IndexHNSW):
+        """Search parameters for the graph, skipping tombstoned positions."""
+        # Selectors are referenced, not owned, by the parameters; keep them alive together
+        selectors = []
+        deleted = self.config.get("deleted")
+        if deleted:
+            labels = faiss.vector_to_array(self.backend.id_map)
+            positions = np.flatnonzero(np.isin(labels, np.asarray(deleted, dtype=np.int64))).astype(np.int64)
+            selectors.append(faiss.IDSelectorBatch(positions))
+            selectors.append(faiss.IDSelectorNot(selectors[0]))
+
+        # Faiss 1.7 reads efSearch from the graph, not from the parameters
+        ef_search = self.setting("ef_search", 16)
+        hnsw.hnsw.efSearch = ef_search
+        params = faiss.SearchParametersHNSW(efSearch=ef_search)
+        if selectors:
+            params.sel = selectors[-1]
+        return params, selectors
+
+    def count(self):
+        return self.backend.ntotal - len(self.config.get("deleted", []))
+
+    def nprobe(self):
+        if isinstance(self.backend, faiss.IndexIVF):
+            return self.setting("nprobe", max(round(self.backend.nlist / 16), 1))
+        return super().nprobe()
@@ -1,20 +1,72 @@
 """
 txtai embeddings client for semantic search.
 """
-from txtai.embeddings import Embeddings
 import os
 import logging
-from typing import List, Dict, Any
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from app.core.config import settings
+from app.core.embedding_cache import EmbeddingCache
+from app.core.index_collection import (
+    CollectionNotFoundError,
+    IndexCollection,
+    chunk_document_id,
+    collection_exists,
+    collection_name,
+    collection_names
+)
+from app.core.index_shard import index_config
+from app.core.lazy import Lazy
+from app.core.vector_store import VectorStore
+from app.core.metadata_store import DEFAULT_COLLECTION, DocumentFilter, metadata_store
+from app.core.search_cache import SearchCache, normalize_query
 
 logger = logging.getLogger(__name__)
 
+# dense: vector search; keyword: BM25; hybrid: both, fused
+SEARCH_MODES = ("dense", "keyword", "hybrid")
+
+
+class SearchModeError(ValueError):
+    """Raised for unknown search modes, or keyword modes without a keyword index."""
+
 
 class TxtaiClient:
-    """Singleton txtai embeddings client."""
+    """
+    Singleton txtai embeddings client.
+    
+    Documents are indexed into named collections (see IndexCollection),
+    each a separate sharded index, selected per call with the collection
+    argument; None is the default collection at TXTAI_INDEX_PATH. A
+    collection is loaded on first use and stays loaded while it is used.
+    When the vector indexes of the loaded collections exceed
+    COLLECTION_MEMORY_BUDGET_MB, the least recently used idle ones are saved
+    and unloaded until they fit; they load from disk again when next used.
+    All collections share the embedding model and caches.
+    
+    With INDEX_READ_ONLY, a background thread checks every
+    INDEX_REFRESH_INTERVAL_SECONDS for snapshots the writer process has
+    published and switches the loaded collections to them.
+    """
     
     _instance = None
-    _embeddings = None
+    _collections: Optional[Dict[str, IndexCollection]] = None
+    _collections_lock = None
+    _models: Optional[Dict[str, Any]] = None
+    _encoder = None
+    _listeners: List[Callable[[List[str]], None]] = []
+    _search_cache = None
+    _embedding_cache = None
+    _keywords_enabled = False
+    # Incremented on every index change; keys cached search results
+    _generation = 0
+    _evictions = 0
+    _refresher: Optional[threading.Thread] = None
+    _refresh_stopped: Optional[threading.Event] = None
+    _refreshes = 0
+    _refresh_error: Optional[str] = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -22,7 +74,7 @@ class TxtaiClient:
         return cls._instance
     
     def __init__(self):
-        if self._embeddings is None:
+        if self._collections is None:
             self._initialize_embeddings()
     
     def _initialize_embeddings(self):
@@ -33,110 +85,594 @@ class TxtaiClient:
             # Ensure directory exists
             os.makedirs(index_path, exist_ok=True)
             
-            # Initialize embeddings
-            self._embeddings = Embeddings({
-                "path": settings.TXTAI_MODEL,
-                "content": True,
-                "backend": "faiss"
-            })
-            
-            # Load existing index if available
-            index_file = os.path.join(index_path, "index")
-            if os.path.exists(index_file):
-                self._embeddings.load(index_file)
-                logger.info(f"Loaded existing index from {index_file}")
-            else:
-                logger.info("Initializing new embeddings index")
-                
+            # Chunks whose text was embedded before reuse the cached vector
+            store = None
+            if settings.EMBEDDING_STORE_ENABLED:
+                store = VectorStore(
+                    path=settings.EMBEDDING_STORE_PATH or os.path.join(index_path, "vector-cache"),
+                    model=settings.TXTAI_MODEL,
+                    dtype=settings.EMBEDDING_STORE_DTYPE,
+                    max_vectors=settings.EMBEDDING_STORE_MAX_VECTORS
+                )
+            self._embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_MAX_VECTORS, store=store)
+            self._keywords_enabled = settings.KEYWORD_INDEX_ENABLED
+            
+            # Collections and their shards share one copy of the embedding model;
+            # queries are encoded without loading any index
+            from txtai.embeddings import Embeddings
+
+            self._models = {}
+            self._encoder = Embeddings(index_config(), models=self._models)
+            
+            self._collections = {}
+            self._collections_lock = threading.Lock()
+            
+            if settings.SEARCH_CACHE_ENABLED:
+                self._search_cache = SearchCache(
+                    max_results=settings.SEARCH_CACHE_MAX_RESULTS,
+                    max_vectors=settings.SEARCH_CACHE_MAX_VECTORS
+                )
+            
+            # The default collection is loaded up front, the others on first use
+            with self._use(DEFAULT_COLLECTION):
+                pass
+            
+            if settings.INDEX_READ_ONLY and settings.INDEX_REFRESH_INTERVAL_SECONDS > 0:
+                self._refresh_stopped = threading.Event()
+                self._refresher = threading.Thread(target=self._refresh_loop, name="index-refresh", daemon=True)
+                self._refresher.start()
+        
         except Exception as e:
             logger.error(f"Error initializing txtai embeddings: {e}")
             raise
     
-    def index_documents(self, documents: List[Dict[str, Any]]) -> int:
+    def collection_name(self, name: Optional[str] = None, existing: bool = False) -> str:
         """
-        Index documents with metadata.
+        Resolve a requested collection name.
         
         Args:
-            documents: List of dicts with 'id', 'text', and optional 'metadata'
+            name: Collection name; None for the default collection
+            existing: Require the collection to exist, for searches
+        
+        Raises:
+            CollectionError: For invalid names
+            CollectionNotFoundError: With existing, if nothing was ever indexed into it
+        """
+        name = collection_name(name)
+        if existing and name not in self._collections and not collection_exists(name):
+            raise CollectionNotFoundError(f"Collection not found: {name}")
+        return name
+    
+    def _collection(self, name: str, create: bool) -> IndexCollection:
+        """Registry entry of a collection, not necessarily loaded."""
+        with self._collections_lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if not create and not collection_exists(name):
+                    raise CollectionNotFoundError(f"Collection not found: {name}")
+                collection = IndexCollection(name, self._models, self._embedding_cache)
+                self._collections[name] = collection
+            return collection
+    
+    @contextmanager
+    def _use(self, name: Optional[str], create: bool = False) -> Iterator[IndexCollection]:
+        """
+        Load a collection if needed and keep it loaded while the block runs.
+        
+        Args:
+            name: Collection name; None for the default collection
+            create: Create the collection if it doesn't exist, for writes
+        """
+        collection = self._collection(collection_name(name), create)
+        loaded = collection.acquire()
+        try:
+            yield collection
+        finally:
+            collection.release()
+            # Loads and writes are what grow the loaded indexes
+            if loaded or create:
+                self._evict(collection)
+    
+    def _evict(self, current: IndexCollection):
+        """
+        Unload idle collections, least recently used first, while the vector
+        indexes of the loaded collections exceed COLLECTION_MEMORY_BUDGET_MB.
+        
+        The collection just used is never unloaded, so one collection larger
+        than the budget still stays loaded while it is the one in use.
+        """
+        budget = settings.COLLECTION_MEMORY_BUDGET_MB * 1024 * 1024
+        if budget <= 0:
+            return
+        
+        with self._collections_lock:
+            loaded = [collection for collection in self._collections.values() if collection.loaded]
+        sizes = {collection.name: collection.memory_bytes() for collection in loaded}
+        used = sum(sizes.values())
+        
+        for collection in sorted(loaded, key=lambda collection: collection.last_used):
+            if used <= budget:
+                break
+            if collection is current or not collection.unload():
+                continue
+            used -= sizes[collection.name]
+            self._evictions += 1
+            logger.info(
+                f"Unloaded collection {collection.name} ({sizes[collection.name] / 1024 ** 2:.1f} MB), "
+                f"{used / 1024 ** 2:.1f} MB of {settings.COLLECTION_MEMORY_BUDGET_MB} MB loaded"
+            )
+    
+    def rebuild(self, config: Optional[Dict[str, Any]] = None, collection: Optional[str] = None) -> int:
+        """
+        Rebuild the vector index of every shard of a collection from its content store.
+        
+        Used after changing index parameters or restoring the content
+        database. Chunk vectors are read from the embedding cache, so only
+        text it hasn't seen is encoded. Searches of a shard wait for its
+        rebuild.
+        
+        Args:
+            config: txtai settings overriding the defaults, e.g.
+                {"faiss": {"components": "IVF1024,SQ8"}} to pin an index
+            collection: Collection to rebuild; None for the default collection
         
         Returns:
-            Number of documents indexed
+            Number of chunks indexed
         """
         try:
-            # Format for txtai: (id, text, metadata)
-            formatted = [
-                (doc["id"], doc["text"], doc.get("metadata", None))
-                for doc in documents
-            ]
-            
-            self._embeddings.index(formatted)
-            self._save_index()
+            with self._use(collection) as index:
+                count = index.rebuild(config)
+                # Scores may change with the new parameters; cached results are dropped
+                self._notify_change([])
             
-            logger.info(f"Indexed {len(documents)} documents")
-            return len(documents)
+            logger.info(f"Rebuilt collection {index.name} with {count} chunks")
+            return count
+        
+        except Exception as e:
+            logger.error(f"Error rebuilding index: {e}")
+            raise
+    
+    def index_documents(self, documents: Iterable[Dict[str, Any]], collection: Optional[str] = None) -> int:
+        """
+        Incrementally index documents with metadata.
+        
+        Chunks are upserted into the existing index, so previously indexed
+        documents are kept and ids that already exist are updated in place.
+        The cost scales with the number of new chunks, not the corpus size.
+        Documents may be a generator; it is consumed in INDEX_BATCH_SIZE batches.
+        
+        Args:
+            documents: Dicts with 'id', 'text', and optional 'metadata'
+            collection: Collection to index into, created if new; None for the default collection
+        
+        Returns:
+            Number of documents indexed
+        """
+        try:
+            with self._use(collection, create=True) as index:
+                ids, shards = index.upsert(documents)
+                self._notify_change(ids)
+                if index.retune(shards):
+                    self._notify_change([])
             
+            logger.info(f"Indexed {len(ids)} documents into collection {index.name}")
+            return len(ids)
+        
         except Exception as e:
             logger.error(f"Error indexing documents: {e}")
             raise
     
-    def search(self, query: str, limit: int = None) -> List[Dict[str, Any]]:
+    def delete_document(self, document_id: str, collection: Optional[str] = None) -> int:
+        """
+        Remove every chunk belonging to a document from the index.
+        
+        Args:
+            document_id: Document identifier used as the chunk id prefix
+            collection: Collection holding the document; None for the default collection
+        
+        Returns:
+            Number of chunks deleted
+        """
+        try:
+            if not collection_exists(collection_name(collection)):
+                return 0
+            with self._use(collection) as index:
+                deleted, shards = index.delete_stale(document_id)
+                if not deleted:
+                    return 0
+                
+                self._notify_change(deleted)
+                if index.retune(shards):
+                    self._notify_change([])
+            
+            logger.info(f"Deleted {len(deleted)} chunks for document {document_id}")
+            return len(deleted)
+        
+        except Exception as e:
+            logger.error(f"Error deleting document {document_id}: {e}")
+            raise
+    
+    def delete_stale_chunks(self, document_id: str, keep_ids: Iterable[str], collection: Optional[str] = None) -> int:
+        """
+        Delete the chunks of a document that are not in keep_ids.
+        
+        Completes a replacement indexed batch by batch with index_documents.
+        Copies left in other shards, after the shard configuration changed,
+        are deleted too.
+        
+        Args:
+            document_id: Document identifier used as the chunk id prefix
+            keep_ids: Chunk ids of the current version
+            collection: Collection holding the document; None for the default collection
+        
+        Returns:
+            Number of chunks deleted
+        """
+        with self._use(collection, create=True) as index:
+            stale, shards = index.delete_stale(document_id, list(keep_ids))
+            if stale:
+                self._notify_change(stale)
+            if index.retune(shards):
+                self._notify_change([])
+        
+        return len(stale)
+    
+    def _metadata(self, index: IndexCollection, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch metadata for chunk ids from the metadata store in one batched read."""
+        if not ids:
+            return {}
+        
+        metadata = metadata_store.hydrate({uid: chunk_document_id(uid) for uid in ids})
+        
+        # Chunks indexed before the metadata store kept metadata in their rows
+        missing = [uid for uid in ids if uid not in metadata]
+        if missing:
+            metadata.update(index.row_metadata(missing))
+        return metadata
+    
+    def search_mode(self, mode: Optional[str] = None) -> str:
+        """
+        Resolve a requested search mode.
+        
+        Args:
+            mode: "dense", "keyword" or "hybrid"; None for the SEARCH_MODE default,
+                which falls back to dense when the keyword index is disabled
+        
+        Raises:
+            SearchModeError: For unknown modes, or keyword modes without a keyword index
         """
-        Semantic search for relevant documents.
+        if mode is None:
+            mode = settings.SEARCH_MODE if self._keywords_enabled else "dense"
+        if mode not in SEARCH_MODES:
+            raise SearchModeError(f"Unknown search mode: {mode}. Supported: {', '.join(SEARCH_MODES)}")
+        if mode != "dense" and not self._keywords_enabled:
+            raise SearchModeError(f"Search mode {mode} requires KEYWORD_INDEX_ENABLED")
+        return mode
+    
+    def search(
+        self,
+        query: str,
+        limit: int = None,
+        mode: str = None,
+        filters: Optional[DocumentFilter] = None,
+        collection: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for relevant documents.
+        
+        Always runs the search and stores the results in the search cache;
+        use cached_search first to serve repeated queries without encoding.
         
         Args:
             query: Search query string
             limit: Maximum number of results (defaults to TOP_K_RESULTS)
+            mode: "dense", "keyword" or "hybrid" (defaults to SEARCH_MODE)
+            filters: Only search chunks of documents matching this filter
+            collection: Collection to search; None for the default collection
         
         Returns:
             List of relevant documents with scores
+        
+        Raises:
+            CollectionNotFoundError: If nothing was ever indexed into the collection
         """
         try:
             limit = limit or settings.TOP_K_RESULTS
+            mode = self.search_mode(mode)
             
-            results = self._embeddings.search(query, limit)
-            
-            # Format results
-            formatted_results = []
-            for result in results:
-                formatted_results.append({
-                    "id": result["id"],
-                    "text": result["text"],
-                    "score": result.get("score", 0.0),
-                    "metadata": result.get("metadata", {})
-                })
+            formatted_results = self._search_many([query], limit, mode, filters, collection)[0]
             
-            logger.info(f"Search returned {len(formatted_results)} results for query: {query[:50]}")
+            logger.info(f"Search ({mode}) returned {len(formatted_results)} results for query: {query[:50]}")
             return formatted_results
-            
+        
         except Exception as e:
             logger.error(f"Error during search: {e}")
             raise
     
-    def _save_index(self):
-        """Save embeddings index to persistent storage."""
+    def batch_search(
+        self,
+        queries: List[str],
+        limit: int = None,
+        use_cache: bool = True,
+        mode: str = None,
+        filters: Optional[DocumentFilter] = None,
+        collection: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries at once.
+        
+        Cached results are reused; the remaining queries are encoded in one
+        batched forward pass and searched with a single multi-vector ANN query.
+        
+        Args:
+            queries: Search query strings
+            limit: Maximum number of results per query (defaults to TOP_K_RESULTS)
+            use_cache: Look up cached results first; callers that already
+                checked cached_search pass False
+            mode: "dense", "keyword" or "hybrid" (defaults to SEARCH_MODE)
+            filters: Only search chunks of documents matching this filter
+            collection: Collection to search; None for the default collection
+        
+        Returns:
+            List of result lists, in the same order as queries
+        """
         try:
-            index_path = settings.TXTAI_INDEX_PATH
-            index_file = os.path.join(index_path, "index")
-            self._embeddings.save(index_file)
-            logger.debug(f"Saved index to {index_file}")
+            limit = limit or settings.TOP_K_RESULTS
+            mode = self.search_mode(mode)
+            
+            results = [
+                self.cached_search(query, limit, mode, filters, collection) if use_cache else None for query in queries
+            ]
+            misses = [i for i, result in enumerate(results) if result is None]
+            
+            if misses:
+                searched = self._search_many([queries[i] for i in misses], limit, mode, filters, collection)
+                for i, result in zip(misses, searched):
+                    results[i] = result
+            
+            logger.info(f"Batch search ran {len(misses)} of {len(queries)} queries ({len(queries) - len(misses)} cached)")
+            return results
+        
         except Exception as e:
-            logger.error(f"Error saving index: {e}")
+            logger.error(f"Error during batch search: {e}")
             raise
     
+    def _search_many(
+        self,
+        queries: List[str],
+        limit: int,
+        mode: str,
+        filters: Optional[DocumentFilter] = None,
+        collection: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Encode and search queries as one batch on every shard of a collection, caching the merged results."""
+        generation = self._generation
+        # Fusion works on a deeper candidate list from each retriever
+        candidates = limit if mode == "dense" else max(limit, settings.HYBRID_CANDIDATES)
+        vectors = self._query_vectors(queries) if mode != "keyword" else None
+        
+        with self._use(collection) as index:
+            dense, sparse, texts = index.search(queries, vectors, candidates, mode, filters)
+            
+            if mode == "dense":
+                batch = dense
+            elif mode == "keyword":
+                batch = [results[:limit] for results in sparse]
+            else:
+                batch = [self._fuse(results, keywords, limit) for results, keywords in zip(dense, sparse)]
+            
+            metadata = self._metadata(index, list({uid for results in batch for uid, _ in results}))
+        
+        # Format results
+        formatted = []
+        for query, results in zip(queries, batch):
+            formatted_results = [
+                {
+                    "id": uid,
+                    "text": texts.get(uid, ""),
+                    "score": score,
+                    "metadata": metadata.get(uid, {})
+                }
+                for uid, score in results
+            ]
+            
+            if self._search_cache is not None:
+                self._search_cache.put_results(
+                    query, limit, mode, generation, formatted_results, filters, index.name
+                )
+            formatted.append(formatted_results)
+        
+        return formatted
+    
+    @staticmethod
+    def _fuse(dense: List[Tuple[str, float]], sparse: List[Tuple[str, float]], limit: int) -> List[Tuple[str, float]]:
+        """
+        Merge dense and keyword results into one ranking.
+        
+        HYBRID_FUSION "rrf" scores each chunk by reciprocal rank fusion,
+        sum(1 / (HYBRID_RRF_K + rank)), which needs no score calibration.
+        "weighted" combines the dense similarity with the BM25 score scaled
+        to the best keyword match, weighted by HYBRID_DENSE_WEIGHT.
+        """
+        scores: Dict[str, float] = {}
+        if settings.HYBRID_FUSION == "weighted":
+            weight = settings.HYBRID_DENSE_WEIGHT
+            best = sparse[0][1] if sparse else 1.0
+            for uid, score in dense:
+                scores[uid] = weight * score
+            for uid, score in sparse:
+                scores[uid] = scores.get(uid, 0.0) + (1 - weight) * score / best
+        else:
+            for results in (dense, sparse):
+                for rank, (uid, _) in enumerate(results, start=1):
+                    scores[uid] = scores.get(uid, 0.0) + 1.0 / (settings.HYBRID_RRF_K + rank)
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+    
+    def cached_search(
+        self,
+        query: str,
+        limit: int = None,
+        mode: str = None,
+        filters: Optional[DocumentFilter] = None,
+        collection: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return cached results for a query if the index hasn't changed since
+        they were computed, without encoding or touching the index.
+        
+        Returns:
+            Cached results, or None on a cache miss
+        """
+        if self._search_cache is None:
+            return None
+        return self._search_cache.get_results(
+            query, limit or settings.TOP_K_RESULTS, self.search_mode(mode), self._generation, filters,
+            collection_name(collection)
+        )
+    
+    def _query_vectors(self, queries: List[str]) -> np.ndarray:
+        """Embedding vectors for queries, encoding only those not already cached."""
+        cache = self._search_cache
+        vectors = [cache.get_vector(query) if cache else None for query in queries]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if misses:
+            # Encoded once; all collections share the model
+            encoded = self._encoder.batchtransform([normalize_query(queries[i]) for i in misses])
+            for i, vector in zip(misses, encoded):
+                vectors[i] = vector
+                if cache is not None:
+                    cache.put_vector(queries[i], vector)
+        
+        return np.stack(vectors)
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts with the index's embedding model.
+        
+        Returns:
+            Array of L2-normalized vectors, one row per text
+        """
+        vectors = np.asarray(self._encoder.batchtransform(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+    
+    def add_listener(self, listener: Callable[[Optional[List[str]]], None]):
+        """
+        Register a callback invoked with the affected document ids after every
+        index change, e.g. to invalidate caches built from indexed content.
+        None means any document may have changed, after a read-only server
+        switched to a newer snapshot.
+        """
+        self._listeners.append(listener)
+    
+    def _notify_change(self, ids: Optional[List[str]]):
+        """Call listeners with the document ids touched by an index change; None for all."""
+        self._generation += 1
+        if self._search_cache is not None:
+            self._search_cache.invalidate()
+        with self._collections_lock:
+            collections = list(self._collections.values())
+        for collection in collections:
+            collection.invalidate()
+        
+        document_ids = sorted({chunk_document_id(uid) for uid in ids}) if ids is not None else None
+        for listener in self._listeners:
+            try:
+                listener(document_ids)
+            except Exception as e:
+                logger.error(f"Error in index change listener: {e}")
+    
+    def refresh(self) -> int:
+        """
+        Switch loaded collections to snapshots published since they were loaded.
+        
+        Only read-only servers refresh; the writer serves its own changes as
+        it makes them. Collections that aren't loaded load the current
+        snapshot when next used.
+        
+        Returns:
+            Number of collections switched to a newer snapshot
+        """
+        with self._collections_lock:
+            collections = list(self._collections.values())
+        
+        refreshed = 0
+        for collection in collections:
+            try:
+                if collection.refresh():
+                    refreshed += 1
+            except Exception as e:
+                # The shard keeps serving its snapshot and retries on the next check
+                self._refresh_error = f"{collection.name}: {e}"
+                logger.error(f"Error refreshing collection {collection.name}: {e}")
+        
+        if refreshed:
+            self._refreshes += refreshed
+            # Any document may have changed
+            self._notify_change(None)
+        return refreshed
+    
+    def _refresh_loop(self):
+        """Background loop of read-only servers checking for new snapshots."""
+        while not self._refresh_stopped.wait(settings.INDEX_REFRESH_INTERVAL_SECONDS):
+            self.refresh()
+    
+    def flush(self) -> bool:
+        """Persist pending index changes of every loaded collection immediately."""
+        with self._collections_lock:
+            collections = list(self._collections.values())
+        return any([collection.flush() for collection in collections])
+    
+    def close(self):
+        """Stop background persistence after flushing pending changes."""
+        if self._refresher is not None:
+            self._refresh_stopped.set()
+            self._refresher.join()
+        with self._collections_lock:
+            collections = list((self._collections or {}).values())
+        for collection in collections:
+            collection.unload(force=True)
+        if self._embedding_cache is not None:
+            self._embedding_cache.close()
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get index statistics."""
         try:
-            count = len(self._embeddings) if hasattr(self._embeddings, '__len__') else 0
+            # Collections on disk are listed without loading them
+            for name in collection_names():
+                self._collection(name, create=False)
+            with self._collections_lock:
+                collections = sorted(self._collections.values(), key=lambda collection: collection.name)
+            
+            stats = [collection.get_stats() for collection in collections]
             return {
-                "total_documents": count,
+                "total_documents": sum(collection["documents"] or 0 for collection in stats),
                 "model": settings.TXTAI_MODEL,
-                "index_path": settings.TXTAI_INDEX_PATH
+                "index_path": settings.TXTAI_INDEX_PATH,
+                "read_only": settings.INDEX_READ_ONLY,
+                "refresh": {
+                    "interval_seconds": settings.INDEX_REFRESH_INTERVAL_SECONDS if self._refresher else None,
+                    "refreshes": self._refreshes,
+                    "last_error": self._refresh_error
+                },
+                "generation": self._generation,
+                "collections": stats,
+                "collection_memory": {
+                    "loaded": sum(1 for collection in stats if collection["loaded"]),
+                    "bytes": sum(collection["memory_bytes"] for collection in stats),
+                    "budget_bytes": settings.COLLECTION_MEMORY_BUDGET_MB * 1024 * 1024 or None,
+                    "evictions": self._evictions
+                },
+                "search_cache": self._search_cache.get_stats() if self._search_cache else None,
+                "embedding_cache": self._embedding_cache.get_stats(),
+                "metadata": metadata_store.get_stats()
             }
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
             return {"error": str(e)}
 
 
-# Global singleton instance
-txtai_client = TxtaiClient()
-
+# Global singleton instance, created on first use or by the startup warm-up
+txtai_client = Lazy(TxtaiClient, "txtai_client")
@@ -0,0 +1,238 @@
+"""
+Persistent store of chunk vectors, keyed by (model, chunk hash).
+
+Vectors live in a flat float32 or float16 array file that is memory-mapped
+and grown in steps. A SQLite table maps each chunk hash to its row. Every
+embedding model gets its own directory, so vectors of different models never
+mix. The store outlives the index: rebuilding with new index parameters,
+after corruption or from a restored content database reads known chunks
+from here instead of encoding them again.
+
+Rows are written before their hashes are committed, so a crash can at worst
+leave unused rows behind. The store expects a single writing process.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.bin"
+INDEX_FILE = "index.sqlite"
+META_FILE = "meta.json"
+
+# Rows added to the vectors file when it is full
+MIN_GROWTH = 4096
+
+# Hashes per SQL lookup, below SQLite's variable limit
+LOOKUP_BATCH = 500
+
+
+def _slug(model: str) -> str:
+    """Directory name for a model name or path."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model).strip("_") or "model"
+
+
+class VectorStore:
+    """Memory-mapped vector array with a hash -> row index."""
+
+    def __init__(self, path: str, model: str, dtype: str = "float32", max_vectors: int = 0):
+        """
+        Args:
+            path: Root directory; vectors are kept in a subdirectory per model
+            model: Embedding model name or path
+            dtype: "float32", or "float16" for half the disk and page cache
+            max_vectors: Maximum stored vectors, 0 for no limit
+        """
+        self.model = model
+        self.path = os.path.join(path, _slug(model))
+        self.dtype = np.dtype(dtype)
+        self.max_vectors = max_vectors
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.memmap] = None
+        self._dimensions: Optional[int] = None
+        self._capacity = 0
+        self._hits = 0
+        self._misses = 0
+        self._full_warned = False
+
+        os.makedirs(self.path, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(self.path, INDEX_FILE), check_same_thread=False)
+        self._connection.execute("create table if not exists vectors (hash text primary key, row integer not null)")
+        self._connection.commit()
+        self._rows = self._connection.execute("select count(*) from vectors").fetchone()[0]
+
+        meta = os.path.join(self.path, META_FILE)
+        if os.path.exists(meta):
+            with open(meta) as f:
+                stored = json.load(f)
+            if stored["dtype"] != self.dtype.name:
+                # Keep reading the existing file in the dtype it was written with
+                logger.warning(
+                    f"Vector store {self.path} holds {stored['dtype']} vectors, ignoring dtype {self.dtype.name}"
+                )
+                self.dtype = np.dtype(stored["dtype"])
+            self._map(stored["dimensions"])
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up stored vectors.
+
+        Args:
+            keys: Chunk hashes
+
+        Returns:
+            float32 vectors for the keys that are stored
+        """
+        with self._lock:
+            if self._vectors is None or not keys:
+                self._misses += len(keys)
+                return {}
+
+            rows = self._lookup(keys)
+            self._hits += len(rows)
+            self._misses += len(keys) - len(rows)
+            if not rows:
+                return {}
+
+            found = list(rows)
+            vectors = np.asarray(self._vectors[[rows[key] for key in found]], dtype=np.float32)
+            return dict(zip(found, vectors))
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """
+        Store vectors for hashes that aren't stored yet.
+
+        Args:
+            keys: Chunk hashes
+            vectors: One vector per key
+        """
+        with self._lock:
+            if self._vectors is None:
+                self._create(vectors.shape[1])
+            elif vectors.shape[1] != self._dimensions:
+                logger.error(
+                    f"Vector store {self.path} holds {self._dimensions}-dimensional vectors, "
+                    f"not caching {vectors.shape[1]}-dimensional ones"
+                )
+                return
+
+            known = self._lookup(keys)
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in known and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+
+            if self.max_vectors:
+                room = max(self.max_vectors - self._rows, 0)
+                if room < len(new):
+                    if not self._full_warned:
+                        logger.warning(f"Vector store {self.path} is full at {self.max_vectors} vectors")
+                        self._full_warned = True
+                    new = dict(list(new.items())[:room])
+                    if not new:
+                        return
+
+            first = self._rows
+            self._reserve(first + len(new))
+            self._vectors[first:first + len(new)] = np.asarray(list(new.values()), dtype=self.dtype)
+            self._vectors.flush()
+
+            self._connection.executemany(
+                "insert into vectors (hash, row) values (?, ?)",
+                [(key, first + offset) for offset, key in enumerate(new)]
+            )
+            self._connection.commit()
+            self._rows += len(new)
+
+    def read(self, limit: int = 0) -> np.ndarray:
+        """
+        Copy stored vectors in insertion order, e.g. to benchmark index types on real data.
+
+        Args:
+            limit: Maximum vectors, 0 for all
+        """
+        with self._lock:
+            if self._vectors is None or not self._rows:
+                return np.empty((0, self._dimensions or 0), dtype=np.float32)
+            rows = min(self._rows, limit) if limit else self._rows
+            return np.asarray(self._vectors[:rows], dtype=np.float32)
+
+    def close(self):
+        """Flush and close the store."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            self._connection.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Stored vectors, file size and lookup hit rate."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "path": self.path,
+                "dtype": self.dtype.name,
+                "dimensions": self._dimensions,
+                "vectors": self._rows,
+                "max_vectors": self.max_vectors,
+                "bytes": self._capacity * (self._dimensions or 0) * self.dtype.itemsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
+
+    def _lookup(self, keys: List[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[start:start + LOOKUP_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            rows.update(self._connection.execute(
+                f"select hash, row from vectors where hash in ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    def _create(self, dimensions: int):
+        """Start an empty store for vectors of the given size."""
+        with open(os.path.join(self.path, META_FILE), "w") as f:
+            json.dump({"model": self.model, "dimensions": dimensions, "dtype": self.dtype.name}, f)
+        open(os.path.join(self.path, VECTORS_FILE), "wb").close()
+        self._map(dimensions)
+
+    def _map(self, dimensions: int):
+        """Memory-map the vectors file at its current size."""
+        self._dimensions = dimensions
+        filename = os.path.join(self.path, VECTORS_FILE)
+        row_bytes = dimensions * self.dtype.itemsize
+        self._capacity = os.path.getsize(filename) // row_bytes
+
+        # np.memmap can't map an empty file
+        if not self._capacity:
+            self._grow(MIN_GROWTH)
+            return
+        self._vectors = np.memmap(filename, dtype=self.dtype, mode="r+", shape=(self._capacity, dimensions))
+
+    def _reserve(self, rows: int):
+        if rows > self._capacity:
+            self._grow(max(rows, self._capacity + max(self._capacity // 2, MIN_GROWTH)))
+
+    def _grow(self, capacity: int):
+        """Extend the vectors file to capacity rows and map it again."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+
+        filename = os.path.join(self.path, VECTORS_FILE)
+        with open(filename, "r+b") as f:
+            f.truncate(capacity * self._dimensions * self.dtype.itemsize)
+        self._capacity = capacity
+        self._vectors = np.memmap(filename, dtype=self.dtype, mode="r+", shape=(capacity, self._dimensions))
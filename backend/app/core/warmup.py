@@ -0,0 +1,124 @@
+"""
+Startup warm-up and readiness.
+
+The API binds its port before any heavy work: the index, the embedding model
+and the AWS clients are created on first use (see app.core.lazy). Warm-up
+creates them in a background thread at startup. It also encodes and searches
+a dummy query, so the first real request doesn't pay for the model's first
+forward pass or for reading the index from disk.
+
+/health only says the process is alive. /ready returns 503 until warm-up has
+finished, so a load balancer keeps sending requests to warm workers. It also
+returns 503 if warm-up fails, with the failed step and its error.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.bedrock_client import bedrock_client
+from app.core.config import settings
+from app.core.metadata_store import metadata_store
+from app.core.reranker import reranker
+from app.core.s3_client import s3_client
+from app.core.txtai_client import txtai_client
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "warm-up"
+
+
+class Warmup:
+    """Runs startup steps in order on a background thread and reports readiness."""
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], Any]]], enabled: bool):
+        """
+        Args:
+            steps: (name, callable) pairs, run in order until one fails
+            enabled: False skips warm-up; everything is created on first use
+                and the server is ready at once
+        """
+        self.steps = steps
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._state = "pending"
+        self._seconds: Dict[str, float] = {}
+        self._error: Optional[str] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._state in ("ready", "disabled")
+
+    def start(self):
+        """Start warming up in the background; later calls do nothing."""
+        with self._lock:
+            if self._state != "pending":
+                return
+            if not self.enabled:
+                self._state = "disabled"
+                return
+
+            self._state = "running"
+            self._started = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up has finished; returns whether the server is ready."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def _run(self):
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"Warm-up step {name} failed: {e}")
+                with self._lock:
+                    self._error = f"{name}: {e}"
+                    self._state = "failed"
+                    self._finished = time.monotonic()
+                return
+            self._seconds[name] = round(time.perf_counter() - start, 3)
+
+        with self._lock:
+            self._state = "ready"
+            self._finished = time.monotonic()
+        logger.info(f"Warm-up finished in {self._finished - self._started:.1f}s: {self._seconds}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self._finished or time.monotonic()
+            return {
+                "state": self._state,
+                "seconds": round(end - self._started, 3) if self._started is not None else None,
+                "steps": dict(self._seconds),
+                "error": self._error
+            }
+
+
+def _rerank():
+    if settings.RERANK_ENABLED:
+        reranker.rerank(WARMUP_QUERY, [{"text": WARMUP_QUERY}], 1)
+
+
+# Global instance
+warmup = Warmup(
+    steps=[
+        ("metadata", metadata_store.get),
+        # Loads the embedding model and the default collection
+        ("index", txtai_client.get),
+        ("encode", lambda: txtai_client.embed([WARMUP_QUERY])),
+        ("search", lambda: txtai_client.search(WARMUP_QUERY, 1)),
+        ("reranker", _rerank),
+        ("s3", s3_client.get),
+        ("bedrock", bedrock_client.get)
+    ],
+    enabled=settings.WARMUP_ENABLED
+)
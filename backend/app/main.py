@@ -2,20 +2,46 @@
 FastAPI backend for txtai RAG system.
 Decoupled retrieval and generation layers.
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-import uvicorn
 import os
 
 from app.routers import ingestion, retrieval, generation
 from app.core.config import settings
+from app.core.bedrock_client import bedrock_client
+from app.core.txtai_client import txtai_client
+from app.core.executors import PoolSaturatedError, get_executor_stats, cpu_executor, io_executor
+from app.core.response_cache import response_cache
+from app.core.query_batcher import query_batcher
+from app.core.reranker import reranker
+from app.core.pdf_extractor import pdf_extractor
+from app.core.ingestion_jobs import ingestion_jobs
+from app.core.warmup import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The index, model and AWS clients load in the background; see /ready
+    warmup.start()
+    yield
+    ingestion_jobs.shutdown()
+    cpu_executor.shutdown()
+    io_executor.shutdown()
+    pdf_extractor.shutdown()
+    # Persist index changes still waiting for the next background flush;
+    # an index that was never loaded has none
+    if txtai_client.loaded:
+        txtai_client.close()
+
 
 app = FastAPI(
     title="txtai RAG API",
     description="Production-grade RAG system with decoupled retrieval and generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -27,10 +53,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include routers
-app.include_router(ingestion.router, prefix="/api/v1/ingestion", tags=["ingestion"])
-app.include_router(retrieval.router, prefix="/api/v1/retrieval", tags=["retrieval"])
-app.include_router(generation.router, prefix="/api/v1/generation", tags=["generation"])
+# Include routers. Their handlers use the clients directly; the dependencies
+# create them on a worker thread first, so a request arriving during warm-up
+# waits there instead of blocking the event loop
+app.include_router(
+    ingestion.router, prefix="/api/v1/ingestion", tags=["ingestion"], dependencies=[Depends(txtai_client)]
+)
+app.include_router(
+    retrieval.router, prefix="/api/v1/retrieval", tags=["retrieval"], dependencies=[Depends(txtai_client)]
+)
+app.include_router(
+    generation.router, prefix="/api/v1/generation", tags=["generation"], dependencies=[Depends(bedrock_client)]
+)
 
 
 @app.get("/")
@@ -43,11 +77,41 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once warm-up has loaded the index and clients, 503 before or if it failed."""
+    stats = warmup.get_stats()
+    return JSONResponse({"ready": warmup.ready, **stats}, status_code=200 if warmup.ready else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    # Not loaded yet during warm-up; waiting for it would block the event loop.
+    # Once loaded, index stats wait for the shard locks, so they run on the I/O pool
+    index = None
+    if txtai_client.loaded:
+        try:
+            index = await io_executor.run(txtai_client.get_stats)
+        except PoolSaturatedError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    return {
+        "executors": get_executor_stats(),
+        "generation_cache": response_cache.get_stats(),
+        "ingestion": ingestion_jobs.get_stats(),
+        "query_batcher": query_batcher.get_stats(),
+        "reranker": reranker.get_stats(),
+        "warmup": warmup.get_stats(),
+        "index": index
+    }
+
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", 8000)),
         reload=True
     )
-
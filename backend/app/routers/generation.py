@@ -3,13 +3,18 @@ Generation router - decoupled from retrieval.
 Takes context and generates LLM response using AWS Bedrock.
 """
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+import json
 import logging
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from app.core.bedrock_client import bedrock_client
 from app.core.config import settings
+from app.core.executors import cpu_executor, io_executor, PoolSaturatedError
+from app.core.response_cache import CacheKey, response_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -21,6 +26,9 @@ class GenerationRequest(BaseModel):
     model_id: Optional[str] = None
     max_tokens: Optional[int] = None
     temperature: Optional[float] = None
+    # Ids of the retrieved chunks the context was built from, used for
+    # semantic cache matching and invalidation on re-ingestion
+    chunk_ids: Optional[List[str]] = None
 
 
 class GenerationResponse(BaseModel):
@@ -28,6 +36,142 @@ class GenerationResponse(BaseModel):
     model: str
     context_used: str
     question: str
+    cached: bool = False
+
+
+def _build_prompt(request: GenerationRequest) -> str:
+    """Construct prompt with explicit context boundaries."""
+    return f"""Context:
+{request.context}
+
+Question: {request.question}
+
+Answer:"""
+
+
+async def _cache_lookup(
+    request: GenerationRequest,
+    prompt: str
+) -> Tuple[Optional[CacheKey], Optional[np.ndarray], Optional[Dict[str, Any]]]:
+    """
+    Look up a cached response for the request.
+
+    Returns:
+        The cache key and question vector to store a fresh result under, and
+        the cached result if there was a hit
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return None, None, None
+
+    key = response_cache.key(
+        request.model_id or bedrock_client.model_id,
+        prompt,
+        request.max_tokens or settings.BEDROCK_MAX_TOKENS,
+        request.temperature or settings.BEDROCK_TEMPERATURE
+    )
+    cached = response_cache.get(key)
+
+    vector = None
+    if cached is None and response_cache.uses_semantic(request.chunk_ids):
+        vector = await cpu_executor.run(response_cache.embed, request.question)
+        cached = response_cache.get_similar(key, vector, request.chunk_ids)
+
+    return key, vector, cached
+
+
+async def _generate(request: GenerationRequest) -> Tuple[Dict[str, Any], bool]:
+    """
+    Generate a response, serving it from the response cache when possible.
+
+    Returns:
+        Generation result and whether it came from the cache
+    """
+    prompt = _build_prompt(request)
+
+    key, vector, cached = await _cache_lookup(request, prompt)
+    if cached is not None:
+        return cached, True
+
+    # Generate response, overriding the model per request if specified
+    result = await io_executor.run(
+        bedrock_client.generate,
+        prompt=prompt,
+        max_tokens=request.max_tokens,
+        temperature=request.temperature,
+        model_id=request.model_id
+    )
+
+    if key is not None:
+        response_cache.put(key, result, chunk_ids=request.chunk_ids, vector=vector)
+    return result, False
+
+
+async def _sse(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Format generation events as Server-Sent Events."""
+    try:
+        async for event in events:
+            yield f"data: {json.dumps(event)}\n\n"
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band
+        logger.error(f"Error streaming response: {e}")
+        yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+
+async def _replay(result: Dict[str, Any]) -> AsyncIterator[dict]:
+    """Emit a cached result as a single-token stream."""
+    yield {"type": "token", "text": result["text"]}
+    yield {
+        "type": "done",
+        "model": result["model"],
+        "stop_reason": result.get("stop_reason", "unknown"),
+        "cached": True
+    }
+
+
+async def _record(
+    events: AsyncIterator[dict],
+    key: CacheKey,
+    request: GenerationRequest,
+    vector: Optional[np.ndarray]
+) -> AsyncIterator[dict]:
+    """Pass stream events through and cache the full text once generation completes."""
+    parts = []
+    async for event in events:
+        if event["type"] == "token":
+            parts.append(event["text"])
+        elif event["type"] == "done":
+            result = {
+                "text": "".join(parts),
+                "model": event["model"],
+                "stop_reason": event["stop_reason"]
+            }
+            response_cache.put(key, result, chunk_ids=request.chunk_ids, vector=vector)
+        yield event
+
+
+async def _stream_response(request: GenerationRequest) -> StreamingResponse:
+    """Start a streamed generation and wrap it in an SSE response."""
+    prompt = _build_prompt(request)
+
+    key, vector, cached = await _cache_lookup(request, prompt)
+    if cached is not None:
+        events = _replay(cached)
+    else:
+        events = io_executor.iterate(
+            bedrock_client.generate_stream,
+            prompt=prompt,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+            model_id=request.model_id
+        )
+        if key is not None:
+            events = _record(events, key, request, vector)
+
+    return StreamingResponse(
+        _sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/generate", response_model=GenerationResponse)
@@ -40,38 +184,18 @@ async def generate_response(request: GenerationRequest):
         Generated answer and metadata
     """
     try:
-        # Construct prompt with explicit context boundaries
-        prompt = f"""Context:
-{request.context}
-
-Question: {request.question}
-
-Answer:"""
+        result, cached = await _generate(request)
         
-        # Override model if specified
-        original_model = bedrock_client.model_id
-        if request.model_id:
-            bedrock_client.model_id = request.model_id
-        
-        try:
-            # Generate response
-            result = bedrock_client.generate(
-                prompt=prompt,
-                max_tokens=request.max_tokens,
-                temperature=request.temperature
-            )
-            
-            return JSONResponse({
-                "answer": result["text"],
-                "model": result["model"],
-                "context_used": request.context[:200] + "..." if len(request.context) > 200 else request.context,
-                "question": request.question
-            })
-            
-        finally:
-            # Restore original model
-            bedrock_client.model_id = original_model
+        return JSONResponse({
+            "answer": result["text"],
+            "model": result["model"],
+            "context_used": request.context[:200] + "..." if len(request.context) > 200 else request.context,
+            "question": request.question,
+            "cached": cached
+        })
         
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error generating response: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
@@ -88,37 +212,71 @@ async def rag_pipeline(request: GenerationRequest):
         # In production, you might want to keep them separate
         # and call retrieval first, then generation
         
-        prompt = f"""Context:
-{request.context}
-
-Question: {request.question}
-
-Answer:"""
-        
-        result = bedrock_client.generate(
-            prompt=prompt,
-            max_tokens=request.max_tokens,
-            temperature=request.temperature
-        )
+        result, cached = await _generate(request)
         
         return JSONResponse({
             "answer": result["text"],
             "model": result["model"],
-            "question": request.question
+            "question": request.question,
+            "cached": cached
         })
         
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error in RAG pipeline: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate/stream")
+async def generate_response_stream(request: GenerationRequest):
+    """
+    Stream an LLM response token by token as Server-Sent Events.
+    
+    Each event is a JSON object: {"type": "token", "text": ...} while the
+    model generates, then {"type": "done", "model": ..., "stop_reason": ...},
+    or {"type": "error", "detail": ...} if generation fails mid-stream.
+    Cached answers are replayed as a single token with "cached": true on
+    the done event.
+    """
+    try:
+        return await _stream_response(request)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error starting response stream: {e}")
+        raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
+
+
+@router.post("/rag/stream")
+async def rag_pipeline_stream(request: GenerationRequest):
+    """Streaming variant of the combined RAG pipeline endpoint."""
+    try:
+        return await _stream_response(request)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error in streaming RAG pipeline: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/models")
 async def list_models():
     """List available Bedrock models."""
     try:
-        models = bedrock_client.list_available_models()
+        models = await io_executor.run(bedrock_client.list_available_models)
         return JSONResponse({"models": models})
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error listing models: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Response cache size, hit rates and invalidations."""
+    stats = response_cache.get_stats()
+    stats["enabled"] = settings.GENERATION_CACHE_ENABLED
+    return JSONResponse(stats)
@@ -1,150 +1,293 @@
 """
 Ingestion router for document upload and indexing.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from typing import List, Optional
 from fastapi.responses import JSONResponse
 import logging
-from typing import List
 import uuid
-from datetime import datetime
 
+from app.core.config import settings
 from app.core.txtai_client import txtai_client
-from app.core.document_processor import document_processor
 from app.core.s3_client import s3_client
-from app.core.config import settings
+from app.core.executors import cpu_executor, io_executor, PoolSaturatedError
+from app.core.index_collection import CollectionError
+from app.core.ingestion_jobs import CONTENT_TYPES, BulkUploadError, ingestion_jobs
+from app.core.job_queue import JobQueueFullError
+from app.core.metadata_store import DEFAULT_COLLECTION, metadata_store
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+def _file_extension(file: UploadFile) -> str:
+    """Validate the upload's file type and return its extension."""
+    ext = file.filename.split('.')[-1].lower() if file.filename else ""
+
+    if ext not in CONTENT_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {ext}. Supported: pdf, md, markdown"
+        )
+    return ext
+
+
+def _check_writable():
+    """Reject index changes on read-only servers."""
+    if settings.INDEX_READ_ONLY:
+        raise HTTPException(status_code=403, detail="This server serves the index read-only")
+
+
+def _collection(collection: Optional[str]) -> str:
+    """Validate a requested collection name."""
+    try:
+        return txtai_client.collection_name(collection)
+    except CollectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _submit(file: UploadFile, doc_id: str, collection: str, replace: bool = False) -> JSONResponse:
+    """
+    Spool an upload and queue an ingestion job for it.
+
+    When replace is set, the job replaces the chunks of an existing document
+    with the same id instead of appending to the index.
     """
-    Upload and index a document (PDF or Markdown).
+    ext = _file_extension(file)
+    file_content = await file.read()
+
+    job = await io_executor.run(
+        ingestion_jobs.submit, file_content, file.filename, ext, doc_id, replace=replace, collection=collection
+    )
+    return JSONResponse(job.to_dict(), status_code=202)
+
+
+@router.post("/upload", status_code=202)
+async def upload_document(file: UploadFile = File(...), collection: Optional[str] = Form(None)):
+    """
+    Upload a document (PDF or Markdown) and queue it for indexing.
+    
+    Storing, parsing and embedding run in the background; poll
+    /jobs/{job_id} for progress.
+    
+    Args:
+        collection: Collection to index into, created on first upload;
+            defaults to the default collection
     
     Returns:
-        Indexing status and metadata
+        The queued ingestion job
     """
     try:
-        # Validate file type
-        ext = file.filename.split('.')[-1].lower() if file.filename else ""
+        _check_writable()
+        # Generate document ID
+        doc_id = str(uuid.uuid4())
 
-        if ext not in ["pdf", "md", "markdown"]:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type: {ext}. Supported: pdf, md, markdown"
-            )
+        return await _submit(file, doc_id, _collection(collection))
+        
+    except HTTPException:
+        raise
+    except (PoolSaturatedError, JobQueueFullError) as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error queueing document: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
-        # Read file content
-        file_content = await file.read()
 
-        # Generate document ID
-        doc_id = str(uuid.uuid4())
+@router.put("/document/{document_id}", status_code=202)
+async def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    collection: Optional[str] = Form(None)
+):
+    """
+    Upload a new version of a document and queue the replacement of its chunks.
 
-        # Upload original document to S3
-        try:
-            # Determine content type
-            content_type_map = {
-                "pdf": "application/pdf",
-                "md": "text/markdown",
-                "markdown": "text/markdown"
-            }
-            content_type = content_type_map.get(ext, "application/octet-stream")
-
-            s3_key = s3_client.upload_document(
-                file_content=file_content,
-                document_id=doc_id,
-                filename=file.filename,
-                content_type=content_type
-            )
-            logger.info(f"Document uploaded to S3: {s3_key}")
-        except Exception as e:
-            logger.error(f"Failed to upload document to S3: {e}")
+    Args:
+        document_id: The unique document identifier
+        collection: Collection of a new document; existing documents stay in theirs
+
+    Returns:
+        The queued ingestion job
+    """
+    try:
+        _check_writable()
+        record = await io_executor.run(metadata_store.get_document, document_id)
+        name = _collection(collection)
+        if record is not None:
+            if collection and name != record.collection:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Document {document_id} is in collection {record.collection}, not {name}"
+                )
+            name = record.collection
+
+        return await _submit(file, document_id, name, replace=True)
+
+    except HTTPException:
+        raise
+    except (PoolSaturatedError, JobQueueFullError) as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error queueing replacement of {document_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+
+
+@router.post("/bulk", status_code=202)
+async def bulk_upload(files: List[UploadFile] = File(...), collection: Optional[str] = Form(None)):
+    """
+    Upload many documents, or zip/tar archives of them, as one ingestion job.
+
+    Chunks of all documents are embedded and committed to the index in large
+    cross-document batches. Every document gets a new id; poll
+    /jobs/{job_id}?documents=true for the ids and per-document status.
+
+    Args:
+        collection: Collection to index all documents into; defaults to the default collection
+
+    Returns:
+        The queued ingestion job
+    """
+    try:
+        _check_writable()
+        name = _collection(collection)
+        # Uploads are already spooled by the server; copy them on the I/O pool
+        job = await io_executor.run(
+            ingestion_jobs.submit_bulk, [(file.filename or "", file.file) for file in files], name
+        )
+        return JSONResponse(job.to_dict(), status_code=202)
+
+    except HTTPException:
+        raise
+    except BulkUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PoolSaturatedError, JobQueueFullError) as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error queueing bulk upload: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing documents: {str(e)}")
+
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50):
+    """List the most recent ingestion jobs."""
+    return JSONResponse({"jobs": ingestion_jobs.recent(limit)})
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, documents: bool = False):
+    """
+    Get the status and progress of an ingestion job.
+
+    Args:
+        job_id: Id returned by /upload, /bulk or PUT /document/{document_id}
+        documents: List every document of a bulk job, however large
+
+    Returns:
+        Job status, current stage, attempts and progress
+    """
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job not found: {job_id}")
+    return JSONResponse(job.to_dict(documents=documents))
+
+
+@router.delete("/document/{document_id}")
+async def delete_document(document_id: str):
+    """
+    Remove a document's chunks from the index and its metadata record.
+
+    Args:
+        document_id: The unique document identifier
+
+    Returns:
+        Number of chunks removed
+    """
+    try:
+        _check_writable()
+        record = await io_executor.run(metadata_store.get_document, document_id)
+        # Documents without a record can only be in the default collection
+        collection = record.collection if record is not None else None
+        deleted = await cpu_executor.run(txtai_client.delete_document, document_id, collection)
+        await io_executor.run(metadata_store.delete_document, document_id)
+        if not deleted and record is None:
             raise HTTPException(
-                status_code=500,
-                detail=f"Failed to store document: {str(e)}"
+                status_code=404,
+                detail=f"Document not found in index: {document_id}"
             )
 
-        # Process document based on type
-        if ext == "pdf":
-            text = document_processor.process_pdf(file_content, file.filename)
-        elif ext in ["md", "markdown"]:
-            text = document_processor.process_markdown(file_content, file.filename)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type")
-
-        # Chunk text
-        chunks = document_processor.chunk_text(text)
-
-        # Add document metadata to chunks
-        indexed_chunks = []
-
-        for chunk in chunks:
-            chunk["id"] = f"{doc_id}_{chunk['id']}"
-            chunk["metadata"].update({
-                "filename": file.filename,
-                "document_id": doc_id,
-                "file_type": ext,
-                "uploaded_at": datetime.utcnow().isoformat(),
-                "s3_key": s3_key  # Store S3 location for reference
-            })
-            indexed_chunks.append(chunk)
-
-        # Index chunks
-        num_indexed = txtai_client.index_documents(indexed_chunks)
-
         return JSONResponse({
-            "status": "indexed",
-            "document_id": doc_id,
-            "filename": file.filename,
-            "s3_key": s3_key,
-            "s3_bucket": settings.AWS_S3_BUCKET,
-            "chunks": num_indexed,
-            "total_chars": len(text)
+            "status": "deleted",
+            "document_id": document_id,
+            "collection": collection or DEFAULT_COLLECTION,
+            "chunks": deleted
         })
-        
+
     except HTTPException:
         raise
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Error ingesting document: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+        logger.error(f"Error deleting document {document_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/stats")
 async def get_index_stats():
     """Get indexing statistics."""
     try:
-        stats = txtai_client.get_stats()
+        # Waits for every shard's lock, which a long upsert or rebuild holds
+        stats = await io_executor.run(txtai_client.get_stats)
         return JSONResponse(stats)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/document/{document_id}")
-async def get_document(document_id: str):
+async def get_document(document_id: str, expiration: int = 3600):
     """
-    Get presigned URL for downloading a document from S3.
+    Get a document's metadata record and a presigned URL for its original file.
 
     Args:
         document_id: The unique document identifier
+        expiration: Time in seconds for the URL to remain valid (default: 3600 = 1 hour)
 
     Returns:
-        Presigned URL for temporary access to the document
+        Document record (filename, version, status, chunks, s3_key) with a
+        presigned download URL when the original is stored in S3
     """
     try:
-        # Note: This assumes we can reconstruct the S3 key from the document_id
-        # In a production system, you might want to store the s3_key in a metadata database
-        # For now, we'll return instructions on how to implement this properly
-        raise HTTPException(
-            status_code=501,
-            detail="Document retrieval requires metadata storage (DynamoDB) to map document_id to s3_key. "
-                   "Please implement metadata storage first."
-        )
+        if expiration < 60 or expiration > 604800:  # Between 1 minute and 7 days
+            raise HTTPException(
+                status_code=400,
+                detail="Expiration must be between 60 and 604800 seconds (1 min to 7 days)"
+            )
+
+        record = await io_executor.run(metadata_store.get_document, document_id)
+        if record is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Document not found: {document_id}"
+            )
+
+        document = record.to_dict()
+        document["download_url"] = None
+        if record.s3_key:
+            document["download_url"] = await io_executor.run(
+                s3_client.generate_presigned_url, record.s3_key, expiration
+            )
+            document["expires_in"] = expiration
+
+        return JSONResponse(document)
+
     except HTTPException:
         raise
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Error retrieving document: {e}")
+        logger.error(f"Error retrieving document {document_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -169,17 +312,17 @@ async def get_download_url(s3_key: str, expiration: int = 3600):
             )
 
         # Check if document exists
-        if not s3_client.document_exists(s3_key):
+        if not await io_executor.run(s3_client.document_exists, s3_key):
             raise HTTPException(
                 status_code=404,
                 detail=f"Document not found: {s3_key}"
             )
 
         # Generate presigned URL
-        presigned_url = s3_client.generate_presigned_url(s3_key, expiration)
+        presigned_url = await io_executor.run(s3_client.generate_presigned_url, s3_key, expiration)
 
         # Get document metadata
-        metadata = s3_client.get_document_metadata(s3_key)
+        metadata = await io_executor.run(s3_client.get_document_metadata, s3_key)
 
         return JSONResponse({
             "download_url": presigned_url,
@@ -190,6 +333,8 @@ async def get_download_url(s3_key: str, expiration: int = 3600):
 
     except HTTPException:
         raise
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error generating download URL: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,20 +3,49 @@ Retrieval router - decoupled from generation.
 Returns relevant chunks and context for LLM.
 """
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+import json
 import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
 
-from app.core.txtai_client import txtai_client
+from app.core.index_collection import CollectionError, CollectionNotFoundError
+from app.core.txtai_client import SearchModeError, txtai_client
 from app.core.config import settings
+from app.core.context_builder import context_builder
+from app.core.executors import cpu_executor, PoolSaturatedError
+from app.core.metadata_store import DocumentFilter
+from app.core.query_batcher import query_batcher
+from app.core.reranker import reranker
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+class QueryFilters(BaseModel):
+    document_id: Optional[str] = None
+    # File extension, e.g. "pdf" or "md"
+    file_type: Optional[str] = None
+    # Upload time range; after is inclusive, before exclusive
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+
 class QueryRequest(BaseModel):
     question: str
     top_k: int = None
+    # "dense", "keyword" or "hybrid"; defaults to SEARCH_MODE
+    mode: Optional[str] = None
+    filters: Optional[QueryFilters] = None
+    # Named collection to search; defaults to the default collection
+    collection: Optional[str] = None
+    # Rescore candidates with the cross-encoder; defaults to RERANK_ENABLED
+    rerank: Optional[bool] = None
+    # Generation settings the context is budgeted for; default to BEDROCK_MODEL_ID and BEDROCK_MAX_TOKENS
+    model_id: Optional[str] = None
+    max_tokens: Optional[int] = None
 
 
 class QueryResponse(BaseModel):
@@ -24,6 +53,59 @@ class QueryResponse(BaseModel):
     context: str
     chunks: list
     top_k: int
+    mode: str
+    collection: str
+    # Chunks the context was assembled from, for GenerationRequest.chunk_ids
+    context_chunk_ids: List[str]
+    # Context token estimate and budget, merged/duplicate/dropped chunk counts
+    context_stats: dict
+    reranked: bool
+    # Milliseconds spent in each stage, e.g. {"retrieval": 3.1, "rerank": 42.0}
+    timings: dict
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    top_k: int = None
+    mode: Optional[str] = None
+    # Applied to every question
+    filters: Optional[QueryFilters] = None
+    collection: Optional[str] = None
+    model_id: Optional[str] = None
+    max_tokens: Optional[int] = None
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    """UTC ISO timestamp comparable with document records' uploaded_at."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+def _document_filter(filters: Optional[QueryFilters]) -> Optional[DocumentFilter]:
+    """Search filter for request filters, None when nothing is filtered."""
+    if filters is None:
+        return None
+    document_filter = DocumentFilter(
+        document_id=filters.document_id or None,
+        file_type=filters.file_type.lower().lstrip(".") if filters.file_type else None,
+        uploaded_after=_timestamp(filters.uploaded_after),
+        uploaded_before=_timestamp(filters.uploaded_before)
+    )
+    return document_filter if any(document_filter) else None
+
+
+def _assemble(results: list, budget: int) -> dict:
+    """Merge, deduplicate and budget results into a context block with explicit boundaries."""
+    assembled = context_builder.build(results, budget)
+    context = "\n\n".join(passage.text for passage in assembled.passages)
+    return {
+        "context": f"<context>\n{context}\n</context>",
+        "context_chunk_ids": assembled.chunk_ids,
+        "context_stats": assembled.get_stats()
+    }
 
 
 @router.post("/query", response_model=QueryResponse)
@@ -32,34 +114,148 @@ async def retrieve_context(request: QueryRequest):
     Retrieve relevant context chunks for a query.
     Decoupled from generation - returns context only.
     
+    Filters restrict the search to chunks of matching documents inside
+    the vector and keyword indexes, not by dropping results afterwards.
+    
+    With reranking, RERANK_CANDIDATES results are retrieved and rescored
+    by the cross-encoder. If that would take longer than RERANK_BUDGET_MS,
+    the top_k first-stage results are returned and reranked is false.
+    
+    The context merges overlapping chunks of a document, skips
+    near-duplicates and fits the token budget of the generation model;
+    chunks lists every result, context_chunk_ids those in the context.
+    
     Returns:
-        Retrieved chunks and formatted context
+        Retrieved chunks and formatted context, with per-stage timings
     """
     try:
         query = request.question
         top_k = request.top_k or settings.TOP_K_RESULTS
+        mode = txtai_client.search_mode(request.mode)
+        filters = _document_filter(request.filters)
+        collection = txtai_client.collection_name(request.collection, existing=True)
+        rerank = settings.RERANK_ENABLED if request.rerank is None else request.rerank
+        limit = max(top_k, settings.RERANK_CANDIDATES) if rerank else top_k
         
-        # Semantic search
-        results = txtai_client.search(query, limit=top_k)
-        
-        # Format context
-        context_parts = []
-        for result in results:
-            context_parts.append(result["text"])
+        start = time.monotonic()
+        # Cache hits are served without leaving the event loop
+        results = txtai_client.cached_search(query, limit=limit, mode=mode, filters=filters, collection=collection)
+        if results is None and settings.QUERY_BATCH_ENABLED:
+            # Encoded and searched together with other in-flight queries
+            results = await query_batcher.search(query, limit, mode, filters, collection)
+        elif results is None:
+            results = await cpu_executor.run(
+                txtai_client.search, query, limit=limit, mode=mode, filters=filters, collection=collection
+            )
+        timings = {"retrieval": round((time.monotonic() - start) * 1000, 2)}
         
-        context = "\n\n".join(context_parts)
-        
-        # Format with explicit boundaries (best practice)
-        formatted_context = f"<context>\n{context}\n</context>"
+        reranked = False
+        if rerank:
+            # The budget includes time spent waiting for a CPU worker
+            deadline = time.monotonic() + settings.RERANK_BUDGET_MS / 1000
+            start = time.monotonic()
+            results, reranked, _ = await cpu_executor.run(reranker.rerank, query, results, top_k, deadline)
+            timings["rerank"] = round((time.monotonic() - start) * 1000, 2)
         
+        budget = context_builder.budget(request.model_id, request.max_tokens, query)
         return JSONResponse({
             "query": query,
-            "context": formatted_context,
+            **_assemble(results, budget),
             "chunks": results,
-            "top_k": top_k
+            "top_k": top_k,
+            "mode": mode,
+            "collection": collection,
+            "reranked": reranked,
+            "timings": timings
         })
         
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (SearchModeError, CollectionError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error retrieving context: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving context: {str(e)}")
 
+
+async def _stream_batch(
+    questions: List[str],
+    top_k: int,
+    mode: str,
+    filters: Optional[DocumentFilter],
+    collection: str,
+    model_id: Optional[str],
+    max_tokens: Optional[int]
+) -> AsyncIterator[str]:
+    """Search questions in batches, yielding one NDJSON line per question."""
+    size = settings.BATCH_QUERY_CHUNK_SIZE
+    for offset in range(0, len(questions), size):
+        batch = questions[offset:offset + size]
+        try:
+            results = await cpu_executor.run(
+                txtai_client.batch_search, batch, limit=top_k, mode=mode, filters=filters, collection=collection
+            )
+        except Exception as e:
+            # The response has started, so failures are reported per question
+            logger.error(f"Error in batch retrieval: {e}")
+            results = [e] * len(batch)
+
+        for index, (query, result) in enumerate(zip(batch, results), start=offset):
+            if isinstance(result, Exception):
+                line = {"index": index, "query": query, "error": str(result)}
+            else:
+                line = {
+                    "index": index,
+                    "query": query,
+                    **_assemble(result, context_builder.budget(model_id, max_tokens, query)),
+                    "chunks": result,
+                    "top_k": top_k,
+                    "mode": mode,
+                    "collection": collection
+                }
+            yield json.dumps(line) + "\n"
+
+
+@router.post("/query/batch")
+async def retrieve_context_batch(request: BatchQueryRequest):
+    """
+    Retrieve context for many questions in one request.
+    
+    Questions are encoded and searched in batches of BATCH_QUERY_CHUNK_SIZE,
+    and results stream back as newline-delimited JSON, one object per
+    question in request order: {"index", "query", "context",
+    "context_chunk_ids", "context_stats", "chunks", "top_k", "mode",
+    "collection"} or
+    {"index", "query", "error"}.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(request.questions) > settings.BATCH_QUERY_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_QUERY_MAX_QUESTIONS} questions per batch"
+        )
+
+    try:
+        mode = txtai_client.search_mode(request.mode)
+        collection = txtai_client.collection_name(request.collection, existing=True)
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (SearchModeError, CollectionError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    top_k = request.top_k or settings.TOP_K_RESULTS
+    return StreamingResponse(
+        _stream_batch(
+            request.questions,
+            top_k,
+            mode,
+            _document_filter(request.filters),
+            collection,
+            request.model_id,
+            request.max_tokens
+        ),
+        media_type="application/x-ndjson"
+    )
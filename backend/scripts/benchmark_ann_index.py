@@ -0,0 +1,145 @@
+"""
+Compare vector index types on recall@k, search latency and memory.
+
+Reads chunk vectors from the persistent vector store of TXTAI_MODEL (our own
+data), or generates clustered synthetic vectors with --synthetic. Some
+vectors, with a little noise added, serve as queries. Each configuration is
+built with the same TunedFaiss backend the API uses and searched one query
+at a time:
+
+    recall@k   share of the exact top k (flat inner product) that was found
+    p50/p95    single-query search latency in milliseconds
+    MB         approximate index memory, see ann_index.memory_bytes
+
+IVF configurations are searched at every --nprobe value and HNSW ones at
+every --ef-search value, so the recall/latency trade-off can be read off
+directly.
+
+Usage (from backend/):
+    python scripts/benchmark_ann_index.py
+    python scripts/benchmark_ann_index.py --synthetic 1000000 --configs flat ivf ivf-sq8 ivf-pq hnsw
+    python scripts/benchmark_ann_index.py --configs ivf --nprobe 4 8 16 32 64
+
+The vector store location is taken from EMBEDDING_STORE_PATH or
+TXTAI_INDEX_PATH as usual.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core import ann_index  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.vector_store import VectorStore  # noqa: E402
+
+# Configuration name -> (type, compression)
+CONFIGS = {
+    "flat": ("flat", "none"),
+    "flat-sq8": ("flat", "sq8"),
+    "ivf": ("ivf", "none"),
+    "ivf-sq8": ("ivf", "sq8"),
+    "ivf-pq": ("ivf", "pq"),
+    "hnsw": ("hnsw", "none"),
+    "hnsw-sq8": ("hnsw", "sq8"),
+}
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.synthetic:
+        # Gaussian clusters, closer to text embeddings than uniform noise
+        rng = np.random.default_rng(args.seed)
+        centers = rng.standard_normal((max(args.synthetic // 1000, 16), args.dimensions)).astype(np.float32)
+        labels = rng.integers(0, len(centers), args.synthetic)
+        vectors = centers[labels] + 0.5 * rng.standard_normal((args.synthetic, args.dimensions)).astype(np.float32)
+        return normalize(vectors).astype(np.float32)
+
+    path = settings.EMBEDDING_STORE_PATH or os.path.join(settings.TXTAI_INDEX_PATH, "vector-cache")
+    store = VectorStore(path, settings.TXTAI_MODEL)
+    vectors = store.read(args.limit)
+    store.close()
+    if not len(vectors):
+        sys.exit(f"No vectors stored for {settings.TXTAI_MODEL} under {path}; ingest documents or use --synthetic")
+    return normalize(vectors).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=["flat", "ivf", "ivf-sq8", "ivf-pq", "hnsw"], choices=CONFIGS)
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many vectors instead of reading the store")
+    parser.add_argument("--dimensions", type=int, default=384, help="Synthetic vector size")
+    parser.add_argument("--limit", type=int, default=0, help="Read at most this many stored vectors")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[0], help="IVF lists searched, 0 for the default")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[settings.INDEX_HNSW_EF_SEARCH])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = normalize(
+        vectors[picks] + 0.05 * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    ).astype(np.float32)
+
+    # Exact neighbours for recall
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dimensions, {len(queries)} queries, k={args.top_k}\n")
+
+    print(f"{'config':<9} {'components':<18} {'build s':>7} {'MB':>8} {'param':<13} {'recall@k':>8} {'p50 ms':>7} {'p95 ms':>7}")
+    for name in args.configs:
+        kind, compression = CONFIGS[name]
+        options = {**ann_index.index_options(), "type": kind, "compression": compression}
+        try:
+            components = ann_index.plan(len(vectors), vectors.shape[1], options).components
+        except ValueError as e:
+            print(f"{name:<9} {str(e)}")
+            continue
+
+        ann = ann_index.TunedFaiss({"backend": ann_index.BACKEND, "faiss": options})
+        start = time.perf_counter()
+        ann.index(vectors)
+        build = time.perf_counter() - start
+        megabytes = ann_index.memory_bytes(ann.backend) / 1024 ** 2
+
+        if kind == "ivf":
+            sweep = [("nprobe", value) for value in args.nprobe]
+        elif kind == "hnsw":
+            sweep = [("ef_search", value) for value in args.ef_search]
+        else:
+            sweep = [(None, None)]
+
+        for param, value in sweep:
+            if param:
+                ann.config["faiss"][param] = value
+                ann._search_params = None
+            label = f"{param}={value or ann.nprobe()}" if param else "exact"
+
+            timings, recalls = [], []
+            for query, truth in zip(queries, exact):
+                start = time.perf_counter()
+                results = ann.search(query.reshape(1, -1), args.top_k)[0]
+                timings.append((time.perf_counter() - start) * 1000)
+                recalls.append(len({uid for uid, _ in results} & set(truth.tolist())) / len(truth))
+
+            print(
+                f"{name:<9} {components:<18} {build:>7.1f} {megabytes:>8.1f} {label:<13} "
+                f"{sum(recalls) / len(recalls):>8.3f} {percentile(timings, 0.5):>7.2f} {percentile(timings, 0.95):>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare per-query search against batch_search throughput.
+
+Builds a throwaway index of synthetic chunks in a temporary directory, then
+times the same query set through a loop of TxtaiClient.search calls and
+through TxtaiClient.batch_search. Caching is disabled so every query is
+encoded and searched.
+
+Usage (from backend/):
+    python scripts/benchmark_batch_search.py --documents 2000 --queries 1000 --batch-size 64
+
+The embedding model is taken from TXTAI_MODEL as usual.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = (
+    "index vector query retrieval document chunk model embedding search result "
+    "bedrock lambda storage bucket latency throughput cluster region service "
+    "policy network cache batch stream token context answer question schema"
+).split()
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000, help="Synthetic chunks to index")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries to run")
+    parser.add_argument("--batch-size", type=int, default=64, help="Queries per batch_search call")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--mode", default="dense", help="Search mode: dense, keyword or hybrid")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="batch-search-bench-")
+    # Settings are read at import time
+    os.environ["TXTAI_INDEX_PATH"] = os.path.join(workdir, "index")
+    os.environ["SEARCH_CACHE_ENABLED"] = "false"
+    os.environ["INDEX_FLUSH_INTERVAL_SECONDS"] = "3600"
+
+    from app.core.config import settings
+    from app.core.txtai_client import TxtaiClient
+
+    client = TxtaiClient()
+    rng = random.Random(args.seed)
+
+    documents = [
+        {"id": f"bench_chunk_{i}", "text": sentence(rng, 40), "metadata": {"filename": "bench.txt"}}
+        for i in range(args.documents)
+    ]
+    start = time.perf_counter()
+    for offset in range(0, len(documents), 500):
+        client.index_documents(documents[offset:offset + 500])
+    print(f"Indexed {len(documents)} chunks in {time.perf_counter() - start:.2f}s")
+
+    queries = [sentence(rng, 8) for _ in range(args.queries)]
+
+    # Warm up the model so the first forward pass isn't counted
+    client.batch_search(queries[:args.batch_size], limit=args.top_k, mode=args.mode)
+
+    start = time.perf_counter()
+    for query in queries:
+        client.search(query, limit=args.top_k, mode=args.mode)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, len(queries), args.batch_size):
+        client.batch_search(queries[offset:offset + args.batch_size], limit=args.top_k, mode=args.mode)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"Model:        {settings.TXTAI_MODEL}")
+    print(f"Per-query:    {len(queries) / loop_seconds:8.1f} queries/s ({loop_seconds:.2f}s)")
+    print(f"batch_search: {len(queries) / batch_seconds:8.1f} queries/s ({batch_seconds:.2f}s, batch size {args.batch_size})")
+    print(f"Speedup:      {loop_seconds / batch_seconds:.2f}x")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
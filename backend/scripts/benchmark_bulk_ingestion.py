@@ -0,0 +1,122 @@
+"""
+Compare ingestion throughput of one upload job per file with a bulk job.
+
+Generates small Markdown documents and ingests them twice through the job
+manager: once as one job per file, as /upload does, and once as a single
+zip archive, as /bulk does. Reports documents per minute and chunks per
+second for both.
+
+Usage (from backend/):
+    python scripts/benchmark_bulk_ingestion.py --documents 500
+
+The embedding model is taken from TXTAI_MODEL as usual. The index is built
+in a temporary directory. S3 uploads are skipped unless --s3 is given, so
+the numbers measure parsing, embedding and index writes.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = (
+    "index vector query retrieval document chunk model embedding search result "
+    "bedrock lambda storage bucket latency throughput cluster region service "
+    "policy network cache batch stream token context answer question schema"
+).split()
+
+
+def synthetic_documents(count: int, sentences: int, seed: int) -> List[bytes]:
+    """Markdown documents with a heading and a few paragraphs each."""
+    rng = random.Random(seed)
+    documents = []
+    for number in range(count):
+        parts = [f"# Document {number}"]
+        for _ in range(max(sentences // 5, 1)):
+            parts.append(" ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "."
+                for _ in range(5)
+            ))
+        documents.append("\n\n".join(parts).encode())
+    return documents
+
+
+def wait(jobs, ingestion_jobs):
+    """Wait for jobs to finish."""
+    while any(not ingestion_jobs.get(job.id).finished for job in jobs):
+        time.sleep(0.05)
+
+
+def report(name: str, documents: int, chunks: int, seconds: float):
+    print(
+        f"{name:<10} {documents:>6} docs {chunks:>7} chunks {seconds:>8.2f}s "
+        f"{documents * 60 / seconds:>10.0f} docs/min {chunks / seconds:>8.0f} chunks/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=500, help="Documents per run")
+    parser.add_argument("--sentences", type=int, default=20, help="Sentences per document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--s3", action="store_true", help="Upload originals to AWS_S3_BUCKET as in production")
+    args = parser.parse_args()
+
+    os.environ["TXTAI_INDEX_PATH"] = tempfile.mkdtemp(prefix="benchmark-index-")
+
+    from app.core.config import settings
+    from app.core.ingestion_jobs import ingestion_jobs
+    from app.core.job_queue import JobQueueFullError
+    from app.core.s3_client import s3_client
+    from app.core.txtai_client import txtai_client
+
+    if not args.s3:
+        s3_client.upload_document = lambda file_content, document_id, filename, content_type=None: (
+            f"benchmark/{document_id}/{filename}"
+        )
+
+    documents = synthetic_documents(args.documents, args.sentences, args.seed)
+    print(f"Model: {settings.TXTAI_MODEL}, index batch size: {settings.INDEX_BATCH_SIZE}")
+
+    # Warm up the model and tokenizer outside the measurements
+    wait([ingestion_jobs.submit(documents[0], "warmup.md", "md", "warmup")], ingestion_jobs)
+
+    jobs = []
+    start = time.perf_counter()
+    for number, content in enumerate(documents):
+        # Like a client honouring 429s from a full queue
+        while True:
+            try:
+                jobs.append(ingestion_jobs.submit(content, f"doc-{number}.md", "md", f"file-{number}"))
+                break
+            except JobQueueFullError:
+                time.sleep(0.05)
+    wait(jobs, ingestion_jobs)
+    seconds = time.perf_counter() - start
+    report("per-file", len(jobs), sum(job.chunks_embedded for job in jobs), seconds)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        for number, content in enumerate(documents):
+            z.writestr(f"docs/doc-{number}.md", content)
+    archive.seek(0)
+
+    start = time.perf_counter()
+    job = ingestion_jobs.submit_bulk([("documents.zip", archive)])
+    wait([job], ingestion_jobs)
+    seconds = time.perf_counter() - start
+    state = job.to_dict()
+    report("bulk", state["progress"]["documents_indexed"], job.chunks_embedded, seconds)
+
+    ingestion_jobs.shutdown()
+    txtai_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare the token-aware chunker against the character chunker.
+
+For each chunker this reports chunking time, peak Python memory while
+chunking, chunk counts, tokens per chunk as counted by the embedding model's
+tokenizer, how many chunks exceed the model's input limit (and get
+truncated when embedded), and how many chunks start or end mid-word or end
+mid-sentence.
+
+Usage (from backend/):
+    python scripts/benchmark_chunker.py docs/guide.md docs/manual.pdf
+    python scripts/benchmark_chunker.py --synthetic-chars 2000000
+
+The tokenizer is taken from TXTAI_MODEL as usual.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core.chunker import Chunker  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.document_processor import document_processor  # noqa: E402
+
+WORDS = (
+    "index vector query retrieval document chunk model embedding search result "
+    "bedrock lambda storage bucket latency throughput cluster region service "
+    "policy network cache batch stream token context answer question schema"
+).split()
+
+
+def synthetic_text(chars: int, seed: int) -> str:
+    """Headed sections of paragraphs made of short sentences."""
+    rng = random.Random(seed)
+    parts, size, section = [], 0, 0
+    while size < chars:
+        section += 1
+        parts.append(f"Section {section} {rng.choice(WORDS).title()}")
+        for _ in range(rng.randint(2, 5)):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                for _ in range(rng.randint(2, 8))
+            ]
+            parts.append(" ".join(sentences))
+        size = sum(len(part) + 2 for part in parts)
+    return "\n\n".join(parts)
+
+
+def load_text(path: str) -> str:
+    with open(path, "rb") as f:
+        content = f.read()
+    if path.lower().endswith(".pdf"):
+        return document_processor.process_pdf(content, path)
+    return document_processor.process_markdown(content, path)
+
+
+def measure(name: str, chunks: Callable[[], Iterable[Dict[str, Any]]], text: str, counter: Chunker, limit: int):
+    """Chunk the text while collecting stats without keeping chunks around."""
+    # Time and memory are measured without token counting
+    tracemalloc.start()
+    start = time.perf_counter()
+    spans = [(chunk["metadata"]["start"], chunk["metadata"]["end"]) for chunk in chunks()]
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tokens, over, mid_word, mid_sentence = [], 0, 0, 0
+    for start, end in spans:
+        end = min(end, len(text))
+        count = counter.count_tokens(text[start:end])
+        tokens.append(count)
+        over += count > limit
+        starts_mid_word = start > 0 and text[start - 1].isalnum() and text[start].isalnum()
+        ends_mid_word = end < len(text) and text[end - 1].isalnum() and text[end].isalnum()
+        mid_word += starts_mid_word or ends_mid_word
+        mid_sentence += text[start:end].rstrip()[-1:] not in (".", "!", "?", "")
+
+    total = len(spans) or 1
+    print(f"{name}")
+    print(f"  time:              {seconds * 1000:10.1f} ms")
+    print(f"  peak memory:       {peak / 1e6:10.2f} MB")
+    print(f"  chunks:            {len(spans):10d}")
+    print(f"  tokens/chunk:      {sum(tokens) / total:10.1f} mean, {max(tokens, default=0)} max")
+    print(f"  tokens embedded:   {sum(tokens):10d}")
+    print(f"  over {limit} tokens:   {over:10d} ({over / total:.1%} truncated when embedded)")
+    print(f"  cut mid-word:      {mid_word:10d} ({mid_word / total:.1%})")
+    print(f"  end mid-sentence:  {mid_sentence:10d} ({mid_sentence / total:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="PDF or Markdown files to chunk")
+    parser.add_argument("--synthetic-chars", type=int, default=500_000, help="Size of generated text when no files are given")
+    parser.add_argument("--max-tokens", type=int, default=254, help="Model input limit without special tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.files:
+        text = "\n\n".join(load_text(path) for path in args.files)
+    else:
+        text = synthetic_text(args.synthetic_chars, args.seed)
+
+    chunker = Chunker()
+    chunker.count_tokens("warm up")
+    print(f"Model: {settings.TXTAI_MODEL}, text: {len(text)} characters\n")
+
+    measure(
+        f"character (CHUNK_SIZE={settings.CHUNK_SIZE}, CHUNK_OVERLAP={settings.CHUNK_OVERLAP})",
+        lambda: document_processor.chunk_text(text),
+        text, chunker, args.max_tokens
+    )
+    measure(
+        f"token (CHUNK_TOKENS={chunker.chunk_tokens}, CHUNK_OVERLAP_TOKENS={chunker.overlap_tokens})",
+        lambda: chunker.iter_chunks(text),
+        text, chunker, args.max_tokens
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Compare filtered search inside the index against over-fetching and filtering.
+
+Builds a throwaway index of synthetic documents with document records spread
+over file types and upload dates, then runs the same queries with filters of
+decreasing selectivity in two ways:
+
+    in-index   TxtaiClient.search with a DocumentFilter; the ANN search skips
+               vectors of other documents
+    overfetch  an unfiltered search for top_k * --overfetch results, dropping
+               results of other documents afterwards
+
+and reports latency and recall@k against an exact search over the filtered
+chunks. Caching is disabled so every query is searched.
+
+Usage (from backend/):
+    python scripts/benchmark_filtered_search.py --documents 2000 --chunks 10
+    python scripts/benchmark_filtered_search.py --components IVF256,Flat
+
+The embedding model is taken from TXTAI_MODEL as usual.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = (
+    "index vector query retrieval document chunk model embedding search result "
+    "bedrock lambda storage bucket latency throughput cluster region service "
+    "policy network cache batch stream token context answer question schema"
+).split()
+
+START = datetime(2024, 1, 1)
+DAYS = 100
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000, help="Synthetic documents to index")
+    parser.add_argument("--chunks", type=int, default=10, help="Chunks per document")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per filter")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--overfetch", type=int, default=10, help="Over-fetch factor of the baseline")
+    parser.add_argument("--components", help="Faiss index to rebuild with, e.g. IVF256,Flat or IDMap,HNSW32")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="filtered-search-bench-")
+    # Settings are read at import time
+    os.environ["TXTAI_INDEX_PATH"] = os.path.join(workdir, "index")
+    os.environ["SEARCH_CACHE_ENABLED"] = "false"
+    os.environ["INDEX_FLUSH_INTERVAL_SECONDS"] = "3600"
+    os.environ["METADATA_BACKEND"] = "sqlite"
+
+    from app.core.config import settings
+    from app.core.metadata_store import DOCUMENT_INDEXED, DocumentFilter, document_record, metadata_store
+    from app.core.txtai_client import TxtaiClient, chunk_document_id
+
+    client = TxtaiClient()
+    rng = random.Random(args.seed)
+
+    # Half PDFs, the rest Markdown; uploads spread evenly over DAYS days
+    records, documents = [], []
+    for i in range(args.documents):
+        document_id = f"doc{i}"
+        file_type = "pdf" if i % 2 == 0 else "md"
+        uploaded_at = (START + timedelta(days=DAYS * i / args.documents)).isoformat()
+        records.append(document_record(
+            document_id, f"{document_id}.{file_type}", file_type, None, None, 1, DOCUMENT_INDEXED, args.chunks, uploaded_at
+        ))
+        documents.extend(
+            {"id": f"{document_id}_chunk_{j}", "text": sentence(rng, 40), "metadata": {"chunk_index": j}}
+            for j in range(args.chunks)
+        )
+    metadata_store.put_documents(records)
+
+    start = time.perf_counter()
+    for offset in range(0, len(documents), 500):
+        client.index_documents(documents[offset:offset + 500])
+    if args.components:
+        client.rebuild({"faiss": {"components": args.components}})
+    print(f"Indexed {len(documents)} chunks of {len(records)} documents in {time.perf_counter() - start:.2f}s")
+    print(f"Model: {settings.TXTAI_MODEL}, index: {args.components or 'default'}, k={args.top_k}\n")
+
+    # Exact scores for the ground truth
+    vectors = client.embed([document["text"] for document in documents])
+    chunk_ids = [document["id"] for document in documents]
+    uploaded = {record.document_id: record.uploaded_at for record in records}
+    types = {record.document_id: record.file_type for record in records}
+
+    def day(n: int) -> str:
+        return (START + timedelta(days=n)).isoformat()
+
+    filters = [
+        ("file_type", DocumentFilter(file_type="pdf")),
+        ("10 days", DocumentFilter(uploaded_after=day(40), uploaded_before=day(50))),
+        ("1 day", DocumentFilter(uploaded_after=day(40), uploaded_before=day(41))),
+        ("1 day pdf", DocumentFilter(file_type="pdf", uploaded_after=day(40), uploaded_before=day(41))),
+        ("document", DocumentFilter(document_id=f"doc{args.documents // 2}"))
+    ]
+
+    queries = [sentence(rng, 8) for _ in range(args.queries)]
+    query_vectors = client.embed(queries)
+    client.search(queries[0], limit=args.top_k, mode="dense")
+
+    print(f"{'filter':<11} {'chunks':>7} {'method':<10} {'recall@k':>8} {'empty':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    for name, document_filter in filters:
+        allowed = {
+            uid for uid in uploaded
+            if document_filter.document_id in (None, uid)
+            and document_filter.file_type in (None, types[uid])
+            and (document_filter.uploaded_after is None or uploaded[uid] >= document_filter.uploaded_after)
+            and (document_filter.uploaded_before is None or uploaded[uid] < document_filter.uploaded_before)
+        }
+        rows = [i for i, uid in enumerate(chunk_ids) if chunk_document_id(uid) in allowed]
+        scores = query_vectors @ vectors[rows].T
+        exact = [
+            {chunk_ids[rows[i]] for i in np.argsort(-row)[:args.top_k]}
+            for row in scores
+        ]
+
+        for method in ("in-index", "overfetch"):
+            timings, recalls, empty = [], [], 0
+            for query, truth in zip(queries, exact):
+                start = time.perf_counter()
+                if method == "in-index":
+                    results = client.search(query, limit=args.top_k, mode="dense", filters=document_filter)
+                else:
+                    results = [
+                        result for result in client.search(query, limit=args.top_k * args.overfetch, mode="dense")
+                        if chunk_document_id(result["id"]) in allowed
+                    ][:args.top_k]
+                timings.append((time.perf_counter() - start) * 1000)
+
+                found = {result["id"] for result in results}
+                recalls.append(len(found & truth) / len(truth))
+                empty += not results
+
+            print(
+                f"{name:<11} {len(rows):>7} {method:<10} {sum(recalls) / len(recalls):>8.3f} {empty:>6} "
+                f"{percentile(timings, 0.5):>7.2f} {percentile(timings, 0.95):>7.2f}"
+            )
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Measure worker startup time and memory with and without read-only serving.
+
+Starts --workers API worker processes on the same index and waits until all
+of them have loaded it and answered --queries searches, then reads each
+worker's memory from /proc/<pid>/smaps_rollup:
+
+    start s    seconds from process start until searches are answered
+    load s     of which loading the index (TxtaiClient construction)
+    RSS MB     resident memory, including pages shared with other processes
+    PSS MB     resident memory with shared pages split between the processes
+               mapping them; the sum over workers is their real footprint
+    anon MB    private memory that can't be shared or dropped
+
+Modes:
+
+    private    INDEX_READ_ONLY=false, the default: every worker reads the
+               vector index into its own memory. Writable workers can't share
+               an index directory, so each gets a copy of it
+    read-only  INDEX_READ_ONLY=true: workers map a local copy of the snapshot.
+               One worker first starts alone on an empty local cache ("cold")
+               and fills it; the others start together on the filled cache
+
+The index at TXTAI_INDEX_PATH is used as it is; --build indexes synthetic
+chunks there first if it has no index yet.
+
+Usage (from backend/):
+    python scripts/benchmark_index_loading.py --workers 4
+    TXTAI_INDEX_PATH=/tmp/bench-index python scripts/benchmark_index_loading.py --build 200000 --workers 4
+
+Linux only (reads /proc).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = (
+    "index shard snapshot vector query latency throughput replica cache memory disk network "
+    "error timeout retry bucket region policy tenant invoice contract clause payment schedule "
+    "sensor reading firmware device battery voltage pressure valve pump pipeline deploy rollback"
+).split()
+
+QUERIES = [
+    "error timeout on retry", "invoice payment schedule", "sensor battery voltage",
+    "rollback after deploy", "replica cache memory", "pump valve pressure"
+]
+
+
+def build(chunks: int, seed: int):
+    """Index synthetic chunks into TXTAI_INDEX_PATH."""
+    from app.core.txtai_client import txtai_client
+
+    rng = random.Random(seed)
+    documents = (
+        {
+            "id": f"bench{i // 10}_chunk_{i % 10}",
+            "text": f"Section {i} " + " ".join(rng.choice(WORDS) for _ in range(40)),
+            "metadata": {"document_id": f"bench{i // 10}"}
+        }
+        for i in range(chunks)
+    )
+    start = time.perf_counter()
+    txtai_client.index_documents(documents)
+    txtai_client.flush()
+    txtai_client.close()
+    print(f"Indexed {chunks} chunks in {time.perf_counter() - start:.1f}s")
+
+
+def worker(queries: int):
+    """Load the index, answer searches, report and wait to be measured."""
+    from app.core.txtai_client import txtai_client
+
+    start = time.perf_counter()
+    txtai_client.get()
+    load = time.perf_counter() - start
+
+    for i in range(queries):
+        txtai_client.search(QUERIES[i % len(QUERIES)], 5)
+
+    print(json.dumps({"load": load}), flush=True)
+    sys.stdin.readline()
+
+
+def memory(pid: int) -> dict:
+    """Rss, Pss and Anonymous of a process, in MB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss", "Anonymous"):
+                values[name] = int(rest.split()[0]) / 1024
+    return values
+
+
+def run(count: int, env: dict, queries: int, index_paths=None) -> list:
+    """Start workers together and measure them once all are ready."""
+    processes, started = [], []
+    for i in range(count):
+        worker_env = {**env, "TXTAI_INDEX_PATH": index_paths[i]} if index_paths else env
+        started.append(time.perf_counter())
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--queries", str(queries)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=worker_env, text=True
+        ))
+
+    results = []
+    for process, start in zip(processes, started):
+        line = process.stdout.readline()
+        if not line:
+            sys.exit(f"Worker {process.pid} failed with exit code {process.wait()}")
+        results.append({"start": time.perf_counter() - start, **json.loads(line)})
+
+    # Shared pages are split between the workers mapping them, so measure with all alive
+    for process, result in zip(processes, results):
+        result.update(memory(process.pid))
+    for process in processes:
+        process.stdin.close()
+        process.wait()
+    return results
+
+
+def report(label: str, results: list):
+    mean = lambda name: sum(result[name] for result in results) / len(results)  # noqa: E731
+    print(
+        f"{label:<20} {len(results):>7} {mean('start'):>8.1f} {mean('load'):>7.1f} {mean('Rss'):>7.0f} "
+        f"{mean('Pss'):>7.0f} {mean('Anonymous'):>8.0f} {sum(result['Pss'] for result in results):>10.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=20, help="Searches per worker before measuring")
+    parser.add_argument("--build", type=int, default=0, help="Synthetic chunks to index if there is no index")
+    parser.add_argument("--modes", nargs="+", default=["private", "read-only"], choices=["private", "read-only"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.queries)
+        return
+
+    # Workers get the mode in their environment; this process only builds
+    env = {**os.environ, "INDEX_FLUSH_INTERVAL_SECONDS": "3600", "QUERY_BATCH_ENABLED": "false"}
+    os.environ["INDEX_READ_ONLY"] = "false"
+    from app.core.config import settings
+    from app.core.index_collection import shard_paths
+
+    if args.build and not os.path.exists(os.path.join(settings.TXTAI_INDEX_PATH, "index")):
+        build(args.build, args.seed)
+    if settings.INDEX_SHARD_PATHS:
+        sys.exit("Shards outside TXTAI_INDEX_PATH can't be copied for private workers; unset INDEX_SHARD_PATHS")
+
+    scratch = tempfile.mkdtemp(prefix="index-loading-")
+    print(f"Index: {settings.TXTAI_INDEX_PATH} ({len(shard_paths())} shards), {args.workers} workers")
+    print(f"{'mode':<20} {'workers':>7} {'start s':>8} {'load s':>7} {'RSS MB':>7} {'PSS MB':>7} {'anon MB':>8} "
+          f"{'total PSS':>10}")
+    try:
+        if "private" in args.modes:
+            paths = []
+            for i in range(args.workers):
+                path = os.path.join(scratch, f"worker-{i}")
+                shutil.copytree(settings.TXTAI_INDEX_PATH, path, symlinks=True)
+                paths.append(path)
+            report("private", run(args.workers, {**env, "INDEX_READ_ONLY": "false"}, args.queries, paths))
+
+        if "read-only" in args.modes:
+            env = {**env, "INDEX_READ_ONLY": "true", "INDEX_LOCAL_CACHE_PATH": os.path.join(scratch, "cache")}
+            report("read-only (cold)", run(1, env, args.queries))
+            report("read-only", run(args.workers, env, args.queries))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Run one writer and several read-only replicas on a shared index directory.
+
+Starts --readers processes with INDEX_READ_ONLY=true on an empty index
+directory, and a writer process. A second writer started on the same
+directory must fail. Then the readers search continuously on --threads
+threads each, while the writer indexes --rounds rounds of --documents
+synthetic documents and publishes a snapshot after every round. The readers
+pick up every snapshot within INDEX_REFRESH_INTERVAL_SECONDS and swap it in
+while they keep searching.
+
+Reports per snapshot how long each reader took to serve it after it was
+published, and per reader the searches run, failed searches, and search
+latency over the whole run, swaps included. After the last round, every
+reader must find the last round's documents.
+
+Usage (from backend/):
+    python scripts/demo_read_replicas.py
+    python scripts/demo_read_replicas.py --readers 3 --rounds 5 --documents 200 --refresh 0.5
+
+The index goes into a temporary directory, or --index-path if given.
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = (
+    "index shard snapshot vector query latency throughput replica cache memory disk network "
+    "error timeout retry bucket region policy tenant invoice contract clause payment schedule"
+).split()
+
+
+def marker(round_number: int) -> str:
+    """A word only the documents of one round contain."""
+    return f"marker{round_number:03d}"
+
+
+def writer(rounds: int, documents: int, pause: float, seed: int):
+    """Index rounds of documents, publishing a snapshot after each."""
+    from app.core.txtai_client import txtai_client
+
+    rng = random.Random(seed)
+    txtai_client.get()
+    print(json.dumps({"event": "ready"}), flush=True)
+    sys.stdin.readline()
+
+    for number in range(1, rounds + 1):
+        txtai_client.index_documents(
+            {
+                "id": f"round{number}-doc{i}_chunk_0",
+                "text": f"{marker(number)} " + " ".join(rng.choice(WORDS) for _ in range(30)),
+                "metadata": {"document_id": f"round{number}-doc{i}"}
+            }
+            for i in range(documents)
+        )
+        txtai_client.flush()
+        print(json.dumps({
+            "event": "published",
+            "round": number,
+            "version": txtai_client.get_stats()["collections"][0]["shards"][0]["persistence"]["snapshot"],
+            "at": time.time()
+        }), flush=True)
+        time.sleep(pause)
+
+    txtai_client.close()
+
+
+def reader(threads: int):
+    """Search continuously and report every snapshot swap until told to stop."""
+    from app.core.txtai_client import txtai_client
+
+    # Loads the model, which would otherwise count against the first search
+    txtai_client.embed(["warm-up"])
+    versions = lambda: [  # noqa: E731
+        shard["version"] for shard in txtai_client.get_stats()["collections"][0]["shards"]
+    ]
+    # Called after every swap, from the refresh thread
+    txtai_client.add_listener(lambda ids: print(
+        json.dumps({"event": "swapped", "versions": versions(), "at": time.time()}), flush=True
+    ))
+    print(json.dumps({"event": "ready", "versions": versions()}), flush=True)
+
+    sys.stdin.readline()
+    stopped = threading.Event()
+    latencies, errors = [], []
+
+    def search(seed: int):
+        rng = random.Random(seed)
+        while not stopped.is_set():
+            query = " ".join(rng.choice(WORDS) for _ in range(3))
+            start = time.perf_counter()
+            try:
+                txtai_client.search(query, 5, mode=rng.choice(["dense", "hybrid"]))
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(str(e))
+
+    workers = [threading.Thread(target=search, args=(seed,), daemon=True) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    # The driver sends the last round number once every reader has served it
+    last = int(sys.stdin.readline() or 0)
+    stopped.set()
+    for worker in workers:
+        worker.join()
+
+    found = txtai_client.search(marker(last), 5, mode="keyword") if last else []
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000  # noqa: E731
+    print(json.dumps({
+        "event": "done",
+        "searches": len(latencies),
+        "errors": len(errors),
+        "error": errors[0] if errors else None,
+        "p50": percentile(0.5) if latencies else None,
+        "p99": percentile(0.99) if latencies else None,
+        "max": latencies[-1] * 1000 if latencies else None,
+        "found_last_round": all(result["id"].startswith(f"round{last}-") for result in found) and bool(found),
+        "versions": versions()
+    }), flush=True)
+
+
+def start(role: str, env: dict, *args: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--role", role, *args],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, text=True
+    )
+
+
+def events(process: subprocess.Popen, name: str, output: queue.Queue):
+    """Forward a process's JSON lines to the driver."""
+    for line in process.stdout:
+        if line.startswith("{"):
+            output.put((name, json.loads(line)))
+    output.put((name, {"event": "exit", "code": process.wait()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=2, help="Search threads per reader")
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--documents", type=int, default=100, help="Documents per round")
+    parser.add_argument("--pause", type=float, default=3.0, help="Seconds between rounds")
+    parser.add_argument("--refresh", type=float, default=1.0, help="INDEX_REFRESH_INTERVAL_SECONDS of the readers")
+    parser.add_argument("--index-path", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--role", choices=["writer", "reader"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "writer":
+        writer(args.rounds, args.documents, args.pause, args.seed)
+        return
+    if args.role == "reader":
+        reader(args.threads)
+        return
+
+    scratch = tempfile.mkdtemp(prefix="read-replicas-")
+    index_path = args.index_path or os.path.join(scratch, "index")
+    env = {
+        **os.environ,
+        "TXTAI_INDEX_PATH": index_path,
+        "METADATA_BACKEND": "sqlite",
+        "INDEX_LOCAL_CACHE_PATH": os.path.join(scratch, "cache"),
+        "INDEX_REFRESH_INTERVAL_SECONDS": str(args.refresh),
+        # Snapshots are published by the explicit flush after every round
+        "INDEX_FLUSH_INTERVAL_SECONDS": "3600",
+        "INDEX_FLUSH_MAX_PENDING": "100000000",
+        "SEARCH_CACHE_ENABLED": "false",
+        "QUERY_BATCH_ENABLED": "false"
+    }
+    output: queue.Queue = queue.Queue()
+    processes = {}
+
+    def launch(name: str, role: str, read_only: bool, *extra: str):
+        process = start(role, {**env, "INDEX_READ_ONLY": str(read_only).lower()}, *extra)
+        processes[name] = process
+        threading.Thread(target=events, args=(process, name, output), daemon=True).start()
+
+    def wait_for(names, event: str, timeout: float = 300) -> dict:
+        pending, seen = set(names), {}
+        deadline = time.monotonic() + timeout
+        while pending:
+            name, message = output.get(timeout=max(deadline - time.monotonic(), 0.1))
+            if message["event"] == event and name in pending:
+                pending.discard(name)
+                seen[name] = message
+            elif message["event"] == "exit" and name in pending:
+                sys.exit(f"{name} exited with code {message['code']}")
+            else:
+                unhandled.append((name, message))
+        return seen
+
+    unhandled = []
+    try:
+        # The writer creates the directory layout the readers wait on
+        os.makedirs(index_path, exist_ok=True)
+        readers = [f"reader-{i}" for i in range(args.readers)]
+        for name in readers:
+            launch(name, "reader", True, "--threads", str(args.threads))
+        wait_for(readers, "ready")
+        launch("writer", "writer", False, "--rounds", str(args.rounds), "--documents", str(args.documents),
+               "--pause", str(args.pause), "--seed", str(args.seed))
+        wait_for(["writer"], "ready")
+
+        second = start("writer", {**env, "INDEX_READ_ONLY": "false"}, "--rounds", "0")
+        second.stdin.close()
+        print(f"Second writer on the same directory: {'refused' if second.wait() else 'NOT refused'}")
+
+        for name in ["writer"] + readers:
+            processes[name].stdin.write("go\n")
+            processes[name].stdin.flush()
+        print(f"{args.readers} readers searching on {args.threads} threads each, writer indexing")
+
+        published, swaps = {}, {name: {} for name in readers}
+        writer_done = False
+        deadline = None
+        while True:
+            done = writer_done and published and all(
+                max(published, key=lambda version: published[version]["round"]) in swaps[name] for name in readers
+            )
+            if done or (deadline is not None and time.monotonic() > deadline):
+                break
+            try:
+                name, message = unhandled.pop(0) if unhandled else output.get(timeout=1)
+            except queue.Empty:
+                continue
+            if message["event"] == "published":
+                published[message["version"]] = message
+            elif message["event"] == "swapped":
+                for version in set(message["versions"]):
+                    swaps[name].setdefault(version, message["at"])
+            elif message["event"] == "exit" and name == "writer":
+                if message["code"]:
+                    sys.exit(f"Writer exited with code {message['code']}")
+                writer_done = True
+                deadline = time.monotonic() + 10 * args.refresh + 60
+            elif message["event"] == "exit":
+                sys.exit(f"{name} exited with code {message['code']}")
+
+        print()
+        print(f"{'round':>5}  {'snapshot':<32} " + " ".join(f"{name:>10}" for name in readers))
+        for version, message in sorted(published.items(), key=lambda item: item[1]["round"]):
+            delays = [
+                f"{swaps[name][version] - message['at']:>9.2f}s" if version in swaps[name] else f"{'skipped':>10}"
+                for name in readers
+            ]
+            print(f"{message['round']:>5}  {version:<32} " + " ".join(delays))
+
+        last = max(message["round"] for message in published.values())
+        for name in readers:
+            processes[name].stdin.write(f"{last}\n")
+            processes[name].stdin.flush()
+        results = wait_for(readers, "done")
+
+        print()
+        print(f"{'reader':<10} {'searches':>8} {'errors':>6} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}  last round found")
+        for name in readers:
+            result = results[name]
+            print(
+                f"{name:<10} {result['searches']:>8} {result['errors']:>6} {result['p50']:>7.1f} "
+                f"{result['p99']:>7.1f} {result['max']:>7.1f}  {result['found_last_round']}"
+            )
+            if result["error"]:
+                print(f"  first error: {result['error']}")
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.kill()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
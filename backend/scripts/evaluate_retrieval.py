@@ -0,0 +1,161 @@
+"""
+Measure retrieval quality and latency of the dense, keyword and hybrid modes.
+
+Indexes the bundled evaluation set (eval/corpus.jsonl: a small operations
+knowledge base with error codes, part numbers and config keys) into a
+temporary index, runs every query of eval/queries.jsonl in each mode and
+reports, per mode and query kind:
+
+    recall@k  share of a query's relevant documents found in the top k chunks
+    hit@k     share of queries with at least one relevant document in the top k
+    mrr       mean reciprocal rank of the first relevant chunk
+    p50/p95   search latency per query in milliseconds, without caching
+    raw/ctx   mean estimated prompt tokens of the chunks joined as they are,
+              and of the context assembled from them by the context builder
+
+Queries are "identifier" (exact codes and keys) or "natural" (paraphrased
+questions). Relevance is judged per document, so results don't depend on
+chunk boundaries.
+
+With --rerank, each mode is also run as "<mode>+rr": RERANK_CANDIDATES
+results rescored by the cross-encoder (RERANK_MODEL) under the latency
+budget, with latency covering both stages. Searches that fell back to
+first-stage order are counted.
+
+Usage (from backend/):
+    python scripts/evaluate_retrieval.py
+    python scripts/evaluate_retrieval.py --top-k 3 --fusion weighted
+    python scripts/evaluate_retrieval.py --rerank --rerank-budget-ms 0
+
+The embedding model is taken from TXTAI_MODEL as usual.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+EVAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eval")
+
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(EVAL_DIR, "corpus.jsonl"))
+    parser.add_argument("--queries", default=os.path.join(EVAL_DIR, "queries.jsonl"))
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["dense", "keyword", "hybrid"])
+    parser.add_argument("--fusion", choices=["rrf", "weighted"], help="Override HYBRID_FUSION")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query; the median is kept")
+    parser.add_argument("--rerank", action="store_true", help="Also evaluate each mode with reranking")
+    parser.add_argument("--rerank-budget-ms", type=float, help="Override RERANK_BUDGET_MS; 0 for no deadline")
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    workdir = tempfile.mkdtemp(prefix="retrieval-eval-")
+    os.environ["TXTAI_INDEX_PATH"] = os.path.join(workdir, "index")
+    os.environ["SEARCH_CACHE_ENABLED"] = "false"
+    os.environ["INDEX_FLUSH_INTERVAL_SECONDS"] = "3600"
+    os.environ["KEYWORD_INDEX_ENABLED"] = "true"
+    if args.fusion:
+        os.environ["HYBRID_FUSION"] = args.fusion
+
+    from app.core.config import settings
+    from app.core.context_builder import context_builder
+    from app.core.document_processor import document_processor
+    from app.core.reranker import reranker
+    from app.core.txtai_client import chunk_document_id, txtai_client
+
+    corpus = read_jsonl(args.corpus)
+    queries = read_jsonl(args.queries)
+
+    chunks = []
+    for document in corpus:
+        for chunk in document_processor.iter_chunks(document["text"]):
+            chunk["id"] = f"{document['id']}_{chunk['id']}"
+            chunk["metadata"].update({"document_id": document["id"], "filename": document["filename"]})
+            chunks.append(chunk)
+    txtai_client.index_documents(chunks)
+    print(f"Model: {settings.TXTAI_MODEL}, fusion: {settings.HYBRID_FUSION}")
+    print(f"Indexed {len(corpus)} documents as {len(chunks)} chunks, {len(queries)} queries, k={args.top_k}\n")
+
+    budget = settings.RERANK_BUDGET_MS if args.rerank_budget_ms is None else args.rerank_budget_ms
+    candidates = max(args.top_k, settings.RERANK_CANDIDATES)
+
+    def search(query: str, mode: str, rerank: bool):
+        if not rerank:
+            return txtai_client.search(query, limit=args.top_k, mode=mode), True
+        results = txtai_client.search(query, limit=candidates, mode=mode)
+        deadline = time.monotonic() + budget / 1000 if budget > 0 else None
+        results, reranked, _ = reranker.rerank(query, results, args.top_k, deadline)
+        return results, reranked
+
+    # Warm up the models and the keyword index outside the measurements
+    for mode in args.modes:
+        search(queries[0]["query"], mode, args.rerank)
+    if args.rerank:
+        print(f"Reranker: {settings.RERANK_MODEL}, {candidates} candidates, budget: {budget or 'none'} ms\n")
+
+    runs = [(mode, False) for mode in args.modes] + [(mode, True) for mode in args.modes if args.rerank]
+    kinds = sorted({query["kind"] for query in queries})
+    print(
+        f"{'mode':<11} {'queries':<11} {'recall@k':>8} {'hit@k':>6} {'mrr':>6} {'p50 ms':>7} {'p95 ms':>7} "
+        f"{'fallback':>8} {'raw tok':>7} {'ctx tok':>7}"
+    )
+    for mode, rerank in runs:
+        rows = []
+        for query in queries:
+            timings, fallbacks = [], 0
+            for _ in range(max(args.repeat, 1)):
+                start = time.perf_counter()
+                results, reranked = search(query["query"], mode, rerank)
+                timings.append((time.perf_counter() - start) * 1000)
+                fallbacks += not reranked
+
+            documents = [chunk_document_id(result["id"]) for result in results]
+            relevant = set(query["relevant"])
+            first = next((rank for rank, uid in enumerate(documents, start=1) if uid in relevant), None)
+            rows.append({
+                "kind": query["kind"],
+                "recall": len(relevant & set(documents)) / len(relevant),
+                "hit": 1.0 if first else 0.0,
+                "rr": 1.0 / first if first else 0.0,
+                "ms": sorted(timings)[len(timings) // 2],
+                "fallbacks": fallbacks,
+                "raw": sum(context_builder.estimate_tokens(result["text"]) + 1 for result in results),
+                "ctx": context_builder.build(results, context_builder.budget(question=query["query"])).tokens
+            })
+
+        for kind in kinds + ["all"]:
+            selected = [row for row in rows if kind == "all" or row["kind"] == kind]
+            count = len(selected)
+            print(
+                f"{mode + ('+rr' if rerank else ''):<11} {kind:<11} "
+                f"{sum(row['recall'] for row in selected) / count:>8.3f} "
+                f"{sum(row['hit'] for row in selected) / count:>6.3f} "
+                f"{sum(row['rr'] for row in selected) / count:>6.3f} "
+                f"{percentile([row['ms'] for row in selected], 0.5):>7.1f} "
+                f"{percentile([row['ms'] for row in selected], 0.95):>7.1f} "
+                f"{sum(row['fallbacks'] for row in selected):>8} "
+                f"{sum(row['raw'] for row in selected) / count:>7.0f} "
+                f"{sum(row['ctx'] for row in selected) / count:>7.0f}"
+            )
+
+    txtai_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Profile API startup: importing app.main, then the background warm-up.
+
+Imports app.main in a fresh interpreter under `python -X importtime` and
+prints the modules with the largest cumulative import time. It then imports
+it again in another fresh interpreter and reports:
+
+    import s      seconds to import app.main, i.e. before the server can bind
+    import MB     peak RSS after the import
+    heavy         which of torch, transformers and txtai were imported
+    warm-up s     seconds until /ready would answer 200, per step (--warmup)
+    ready MB      peak RSS once warm-up has finished
+
+Usage (from backend/):
+    python scripts/profile_startup.py
+    python scripts/profile_startup.py --warmup --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+HEAVY = ("torch", "transformers", "txtai", "faiss")
+
+MEASURE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app.main
+result = {
+    "import": time.perf_counter() - start,
+    "import_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": [name for name in %r if name in sys.modules]
+}
+if %r:
+    from app.core.warmup import warmup
+    start = time.perf_counter()
+    warmup.start()
+    warmup.wait()
+    result["warmup"] = time.perf_counter() - start
+    result["warmup_stats"] = warmup.get_stats()
+    result["ready_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+
+def importtime(top: int):
+    """Print the slowest imports of app.main, by cumulative time."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND, capture_output=True, text=True, check=True
+    ).stderr
+
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative), name.rstrip()))
+
+    print(f"{'cumulative ms':>13}  module")
+    for cumulative, name in sorted(modules, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>13.1f}  {name}")
+
+
+def measure(warm: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE % (HEAVY, warm)],
+        cwd=BACKEND, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--warmup", action="store_true", help="Also run and time the warm-up")
+    args = parser.parse_args()
+
+    importtime(args.top)
+
+    result = measure(args.warmup)
+    print()
+    print(f"import s   {result['import']:.2f}")
+    print(f"import MB  {result['import_mb']:.0f}")
+    print(f"heavy      {', '.join(result['heavy']) or 'none'}")
+    if args.warmup:
+        stats = result["warmup_stats"]
+        print(f"warm-up s  {result['warmup']:.2f} ({stats['state']}) {stats['steps']}")
+        if stats["error"]:
+            print(f"error      {stats['error']}")
+        print(f"ready MB   {result['ready_mb']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Rebuild the vector index from the content store.
+
+Run after changing index parameters, or after restoring the content database
+from a backup. Chunk vectors come from the persistent embedding store where
+possible; the report shows how many chunks had to be encoded again.
+
+Usage (from backend/, with the API stopped):
+    python scripts/rebuild_index.py
+    python scripts/rebuild_index.py --config '{"faiss": {"components": "IVF256,Flat"}}'
+    python scripts/rebuild_index.py --collection team-a
+
+The index location and model are taken from TXTAI_INDEX_PATH and TXTAI_MODEL
+as usual.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core.txtai_client import txtai_client  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="{}", help="JSON txtai settings overriding the defaults")
+    parser.add_argument("--collection", default=None, help="Collection to rebuild (default: the default collection)")
+    args = parser.parse_args()
+
+    before = txtai_client.get_stats()["embedding_cache"]
+    start = time.perf_counter()
+    count = txtai_client.rebuild(json.loads(args.config), collection=args.collection)
+    seconds = time.perf_counter() - start
+    after = txtai_client.get_stats()["embedding_cache"]
+
+    # Write the rebuilt index before exiting
+    txtai_client.flush()
+    txtai_client.close()
+
+    print(
+        f"Rebuilt {count} chunks in {seconds:.1f}s: "
+        f"{after['encoded'] - before['encoded']} encoded, {after['reused'] - before['reused']} reused"
+    )
+    store = after["store"]
+    if store:
+        print(f"Vector store: {store['vectors']} vectors, {store['bytes'] / 1024 ** 2:.1f} MB at {store['path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Shared fixtures.
+
+Indexes are built with txtai's external vectors and a hashed bag-of-words
+vectorizer, so tests need no model download and run in milliseconds. The
+client singletons are swapped for instances on a temporary directory.
+"""
+import re
+import zlib
+
+import numpy as np
+import pytest
+
+from app.core import index_shard, txtai_client as txtai_module
+from app.core.config import settings
+from app.core.metadata_store import SQLiteMetadataStore, metadata_store
+from app.core.txtai_client import TxtaiClient, txtai_client
+
+DIMENSIONS = 64
+
+
+def vectorize(texts):
+    """Hashed bag-of-words vectors: texts sharing words are similar."""
+    vectors = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", str(text).lower()):
+            vectors[row, zlib.crc32(word.encode("utf-8")) % DIMENSIONS] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+def external_index_config():
+    return {**ORIGINAL_INDEX_CONFIG(), "path": None, "method": "external", "transform": vectorize}
+
+
+ORIGINAL_INDEX_CONFIG = index_shard.index_config
+
+
+@pytest.fixture
+def index_settings(tmp_path, monkeypatch):
+    """Settings for an index in a temporary directory, with background saves held back."""
+    values = {
+        "TXTAI_INDEX_PATH": str(tmp_path / "index"),
+        "METADATA_SQLITE_PATH": str(tmp_path / "metadata.sqlite"),
+        "INDEX_LOCAL_CACHE_PATH": str(tmp_path / "cache"),
+        "INDEX_FLUSH_INTERVAL_SECONDS": 3600.0,
+        "INDEX_FLUSH_MAX_PENDING": 1_000_000,
+        "INDEX_REFRESH_INTERVAL_SECONDS": 0.0,
+        "INDEX_READ_ONLY": False,
+        "SEARCH_CACHE_ENABLED": False
+    }
+    for name, value in values.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(index_shard, "index_config", external_index_config)
+    monkeypatch.setattr(txtai_module, "index_config", external_index_config)
+    return settings
+
+
+@pytest.fixture
+def metadata(index_settings, monkeypatch):
+    """The metadata_store singleton, on a fresh SQLite file."""
+    store = SQLiteMetadataStore(index_settings.METADATA_SQLITE_PATH)
+    monkeypatch.setattr(metadata_store, "_instance", store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def client(index_settings, metadata, monkeypatch):
+    """The txtai_client singleton, on an empty index."""
+    for name, value in {"_instance": None, "_collections": None, "_listeners": []}.items():
+        monkeypatch.setattr(TxtaiClient, name, value)
+    instance = TxtaiClient()
+    monkeypatch.setattr(txtai_client, "_instance", instance)
+    yield instance
+    instance.close()
+
+
+def chunks(document_id: str, texts, **metadata):
+    """Index-ready chunks of one document."""
+    return [
+        {"id": f"{document_id}_chunk_{i}", "text": text, "metadata": {"document_id": document_id, **metadata}}
+        for i, text in enumerate(texts)
+    ]
@@ -0,0 +1,51 @@
+"""Streamed generation decoding, against the local Bedrock stub."""
+import pytest
+
+from app.core.bedrock_client import BedrockClient
+from app.core.bedrock_stub import StubBedrockRuntime
+
+REPLY = "Paris is the capital of France and its largest city"
+
+
+@pytest.mark.parametrize("model_id", [
+    "anthropic.claude-v2",
+    "amazon.titan-text-lite-v1",
+    "meta.llama2-13b-chat-v1"
+])
+def test_stream_decodes_every_model_family(model_id):
+    client = BedrockClient(StubBedrockRuntime(reply=REPLY, chunk_words=2))
+
+    events = list(client.generate_stream("Question?", model_id=model_id))
+    tokens = [event["text"] for event in events if event["type"] == "token"]
+
+    assert len(tokens) > 1
+    assert "".join(tokens).strip() == REPLY
+    assert events[-1]["type"] == "done"
+    assert events[-1]["model"] == model_id
+    assert events[-1]["stop_reason"].lower() == "stop"
+
+
+def test_stream_matches_full_generation():
+    client = BedrockClient(StubBedrockRuntime(reply=REPLY))
+
+    streamed = "".join(
+        event["text"] for event in client.generate_stream("Question?") if event["type"] == "token"
+    )
+
+    assert streamed.strip() == client.generate("Question?")["text"].strip()
+
+
+def test_stream_raises_on_in_band_error():
+    client = BedrockClient(StubBedrockRuntime(reply=REPLY, chunk_words=2, error_after=1))
+
+    events = client.generate_stream("Question?")
+    assert next(events)["type"] == "token"
+    with pytest.raises(RuntimeError, match="modelStreamErrorException"):
+        next(events)
+
+
+def test_unsupported_model_is_rejected():
+    client = BedrockClient(StubBedrockRuntime())
+
+    with pytest.raises(ValueError):
+        list(client.generate_stream("Question?", model_id="unknown.model"))
@@ -0,0 +1,90 @@
+"""Token-aware chunking: offsets, token bounds, headings and paged input."""
+import pytest
+
+from app.core.chunker import PAGE_SEPARATOR, Chunker
+
+TEXT = """# Walruses
+
+Walruses live in the Arctic. They haul out on sea ice to rest! Their tusks can grow to a metre long.
+Calves stay with their mothers for two years.
+
+## Diet
+
+Walruses feed on clams and other molluscs on the sea floor. They find food with their whiskers. \
+A walrus can eat thousands of clams in a single feeding session, sucking each one out of its shell.
+"""
+
+
+@pytest.fixture
+def chunker():
+    """A chunker that counts words and punctuation, without loading a tokenizer."""
+    instance = Chunker(model="unused", chunk_tokens=24, overlap_tokens=8)
+    instance._tokenizer_loaded = True
+    return instance
+
+
+def test_offsets_round_trip(chunker):
+    chunks = list(chunker.iter_chunks(TEXT))
+
+    assert len(chunks) > 2
+    for index, chunk in enumerate(chunks):
+        metadata = chunk["metadata"]
+        assert chunk["text"] == TEXT[metadata["start"]:metadata["end"]]
+        assert metadata["chunk_index"] == index
+        assert chunk["id"] == f"chunk_{index}"
+
+
+def test_chunks_stay_within_the_token_bound(chunker):
+    chunks = list(chunker.iter_chunks(TEXT))
+
+    for chunk in chunks:
+        assert chunk["metadata"]["tokens"] == chunker.count_tokens(chunk["text"])
+        assert chunk["metadata"]["tokens"] <= chunker.chunk_tokens
+
+
+def test_chunks_cover_every_sentence(chunker):
+    covered = set()
+    for chunk in chunker.iter_chunks(TEXT):
+        covered.update(range(chunk["metadata"]["start"], chunk["metadata"]["end"]))
+
+    assert all(position in covered for position, char in enumerate(TEXT) if not char.isspace())
+
+
+def test_headings_start_a_chunk(chunker):
+    chunks = list(chunker.iter_chunks(TEXT))
+
+    assert chunks[0]["text"].startswith("# Walruses")
+    assert any(chunk["text"].startswith("## Diet") for chunk in chunks)
+    assert not any("## Diet" in chunk["text"][1:] for chunk in chunks)
+
+
+def test_long_sentences_split_at_word_boundaries(chunker):
+    text = " ".join(f"word{i}" for i in range(100)) + "."
+    chunks = list(chunker.iter_chunks(text))
+
+    assert len(chunks) > 4
+    for chunk in chunks:
+        start, end = chunk["metadata"]["start"], chunk["metadata"]["end"]
+        assert chunk["metadata"]["tokens"] <= chunker.chunk_tokens
+        assert start == 0 or text[start - 1] == " "
+        assert end == len(text) or text[end] in " ."
+
+
+def test_pages_are_streamed_with_document_offsets(chunker):
+    pages = [(1, "First page talks about seals. Seals are fast swimmers."),
+             (2, "Second page talks about otters. Otters hold hands while sleeping.")]
+    text = PAGE_SEPARATOR.join(page for _, page in pages)
+
+    chunks = list(chunker.iter_pages(iter(pages)))
+
+    assert chunks == list(chunker.iter_pages(pages))
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        assert chunk["text"] == text[metadata["start"]:metadata["end"]]
+        assert metadata["page"] <= metadata["page_end"]
+    assert chunks[0]["metadata"]["page"] == 1
+    assert chunks[-1]["metadata"]["page_end"] == 2
+
+
+def test_empty_text_has_no_chunks(chunker):
+    assert list(chunker.iter_chunks("  \n\n  ")) == []
@@ -0,0 +1,87 @@
+"""Named collections: isolation, lazy loading and LRU eviction under the memory budget."""
+import pytest
+
+from app.core.index_collection import CollectionError, CollectionNotFoundError, IndexCollection, collection_names
+
+from tests.conftest import chunks
+
+# Reported size of every loaded collection; three fit in the budget
+COLLECTION_BYTES = 300 * 1024
+BUDGET_MB = 1
+
+
+@pytest.fixture
+def budgeted(index_settings, monkeypatch, request):
+    """The test client with a memory budget that fits three loaded collections."""
+    monkeypatch.setattr(index_settings, "COLLECTION_MEMORY_BUDGET_MB", BUDGET_MB)
+    monkeypatch.setattr(IndexCollection, "memory_bytes", lambda self: COLLECTION_BYTES if self.loaded else 0)
+    return request.getfixturevalue("client")
+
+
+def loaded(client):
+    return sorted(name for name, collection in client._collections.items() if collection.loaded)
+
+
+def index(client, name: str):
+    client.index_documents(chunks(f"{name}doc", [f"Notes of team {name} about walrus tusks"]), collection=name)
+
+
+def test_collections_are_searched_separately(client):
+    index(client, "alpha")
+    index(client, "beta")
+
+    assert [result["id"] for result in client.search("walrus", 5, mode="keyword", collection="alpha")] == ["alphadoc_chunk_0"]
+    assert client.search("walrus", 5, mode="keyword") == []
+    assert collection_names() == ["default", "alpha", "beta"]
+
+
+def test_unknown_and_invalid_collections_are_rejected(client):
+    with pytest.raises(CollectionNotFoundError):
+        client.search("walrus", 5, collection="missing")
+    with pytest.raises(CollectionError):
+        index(client, "../escape")
+
+
+def test_loaded_collections_stay_under_the_memory_budget(budgeted):
+    for name in "abcde":
+        index(budgeted, name)
+        assert len(loaded(budgeted)) * COLLECTION_BYTES <= BUDGET_MB * 1024 * 1024
+
+    assert loaded(budgeted) == ["c", "d", "e"]
+    assert budgeted._evictions == 3
+
+
+def test_least_recently_used_collection_is_evicted_first(budgeted):
+    for name in "abc":
+        index(budgeted, name)
+    budgeted.search("walrus", 5, mode="keyword", collection="b")
+
+    index(budgeted, "d")
+
+    assert loaded(budgeted) == ["b", "c", "d"]
+
+
+def test_evicted_collection_loads_again_with_its_chunks(budgeted):
+    for name in "abcde":
+        index(budgeted, name)
+    assert "a" not in loaded(budgeted)
+
+    results = budgeted.search("walrus", 5, mode="keyword", collection="a")
+
+    assert [result["id"] for result in results] == ["adoc_chunk_0"]
+    assert "a" in loaded(budgeted)
+    assert budgeted._collections["a"].loads == 2
+
+
+def test_collection_in_use_is_not_evicted(budgeted):
+    index(budgeted, "a")
+    with budgeted._use("a"):
+        for name in "bcd":
+            index(budgeted, name)
+        assert "a" in loaded(budgeted)
+
+
+def test_loaded_collection_reports_its_index_size(client):
+    index(client, "alpha")
+
+    assert client._collections["alpha"].memory_bytes() > 0
@@ -0,0 +1,103 @@
+"""Context assembly: chunk merging, near-duplicate removal and the token budget."""
+import pytest
+
+from app.core.context_builder import ContextBuilder, context_window
+
+DOCUMENT = (
+    "Walruses live in the Arctic and haul out on sea ice to rest between dives. "
+    "Their tusks can grow to a metre long and help them climb onto the ice. "
+    "They feed on clams, finding them on the sea floor with their whiskers."
+)
+
+
+@pytest.fixture
+def builder():
+    return ContextBuilder(chars_per_token=4.0, max_tokens=0, duplicate_threshold=0.8)
+
+
+def result(document_id: str, index: int, start: int, end: int, text: str = DOCUMENT):
+    return {
+        "id": f"{document_id}_chunk_{index}",
+        "text": text[start:end],
+        "metadata": {"document_id": document_id, "start": start, "end": end}
+    }
+
+
+def test_overlapping_chunks_merge_into_the_document_text(builder):
+    # Ranked out of document order, overlapping by 20 characters
+    results = [result("walrus", 1, 60, 140), result("walrus", 0, 0, 80), result("walrus", 2, 120, len(DOCUMENT))]
+
+    context = builder.build(results, 1000)
+
+    assert [passage.text for passage in context.passages] == [DOCUMENT]
+    assert context.passages[0].chunk_ids == ["walrus_chunk_0", "walrus_chunk_1", "walrus_chunk_2"]
+    assert context.merged == 2
+    assert context.tokens == builder.estimate_tokens(DOCUMENT)
+
+
+def test_separate_spans_stay_separate_passages_in_rank_order(builder):
+    results = [result("walrus", 2, 146, len(DOCUMENT)), result("walrus", 0, 0, 74)]
+
+    context = builder.build(results, 1000)
+
+    assert [passage.text for passage in context.passages] == [DOCUMENT[146:], DOCUMENT[:74]]
+    assert context.merged == 0
+
+
+def test_touching_chunks_merge_across_whitespace(builder):
+    results = [result("walrus", 0, 0, 74), result("walrus", 1, 75, 145)]
+
+    context = builder.build(results, 1000)
+
+    assert context.passages[0].text == DOCUMENT[:145]
+
+
+def test_chunks_of_different_documents_never_merge(builder):
+    other = result("narwhal", 0, 0, 80)
+    other["text"] = "Narwhals have a single long tusk and live in Arctic waters all year round."
+
+    context = builder.build([result("walrus", 0, 0, 80), other], 1000)
+
+    assert len(context.passages) == 2
+
+
+def test_near_duplicates_are_dropped(builder):
+    copy = result("mirror", 0, 0, 140)
+    copy["text"] = DOCUMENT[:140] + " Extra."
+
+    context = builder.build([result("walrus", 0, 0, 140), copy], 1000)
+
+    assert [passage.chunk_ids for passage in context.passages] == [["walrus_chunk_0"]]
+    assert context.duplicates == 1
+
+
+def test_passages_are_packed_into_the_budget(builder):
+    results = [
+        {"id": f"doc{i}_chunk_0", "text": f"Passage {i} " + "word " * (40 if i == 1 else 5), "metadata": {}}
+        for i in range(4)
+    ]
+
+    context = builder.build(results, 40)
+
+    assert context.tokens <= 40
+    assert [passage.chunk_ids[0] for passage in context.passages] == ["doc0_chunk_0", "doc2_chunk_0", "doc3_chunk_0"]
+    assert context.dropped == 1
+    assert not context.truncated
+
+
+def test_an_oversized_best_passage_is_truncated(builder):
+    context = builder.build([result("walrus", 0, 0, len(DOCUMENT))], 10)
+
+    assert context.truncated
+    assert context.tokens <= 10
+    assert DOCUMENT.startswith(context.passages[0].text)
+    assert not context.passages[0].text.endswith(" ")
+
+
+def test_budget_leaves_room_for_the_answer_and_question():
+    builder = ContextBuilder(chars_per_token=4.0, max_tokens=0, duplicate_threshold=0.8)
+    capped = ContextBuilder(chars_per_token=4.0, max_tokens=3000, duplicate_threshold=0.8)
+
+    assert context_window("amazon.titan-text-express-v1") == 8192
+    assert builder.budget("amazon.titan-text-express-v1", 1000, "x" * 40) == 8192 - 1000 - 10 - 32
+    assert capped.budget("anthropic.claude-3-sonnet", 1000) == 3000
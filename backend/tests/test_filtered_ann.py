@@ -0,0 +1,41 @@
+"""Filtered nearest-neighbour search on Faiss indexes."""
+import faiss
+import numpy as np
+import pytest
+
+from app.core import filtered_ann
+
+DIMENSIONS = 16
+
+
+def build(kind: str, vectors: np.ndarray) -> faiss.Index:
+    """An IDMap-wrapped index like txtai's, with ids offset from positions."""
+    index = faiss.index_factory(DIMENSIONS, "IDMap,HNSW16" if kind == "hnsw" else "IDMap,Flat", faiss.METRIC_INNER_PRODUCT)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64) + 1000)
+    return index
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+@pytest.mark.parametrize("selected", [500, 20, 3])
+def test_filtered_search_is_exact_within_the_selection(kind, selected):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((1000, DIMENSIONS)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    queries = vectors[:5] + 0.01
+    ids = sorted(rng.choice(1000, selected, replace=False) + 1000)
+
+    # The selection refers into the index, which must stay alive while it is searched
+    index = build(kind, vectors)
+    results = filtered_ann.search(filtered_ann.select(index, ids), queries, 5, nprobe=1)
+
+    for query, found in zip(queries, results):
+        scores = vectors[np.asarray(ids) - 1000] @ query
+        expected = [ids[i] for i in np.argsort(-scores)[:5] if scores[i] > 0]
+        assert [uid for uid, _ in found] == expected
+
+
+def test_empty_selection_returns_nothing():
+    vectors = np.eye(DIMENSIONS, dtype=np.float32)
+    index = build("flat", vectors)
+
+    assert filtered_ann.search(filtered_ann.select(index, []), vectors[:2], 5, nprobe=1) == [[], []]
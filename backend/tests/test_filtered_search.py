@@ -0,0 +1,72 @@
+"""Metadata filters pushed into the vector and keyword searches."""
+import pytest
+
+from app.core.metadata_store import DOCUMENT_INDEXED, DocumentFilter, document_record
+
+from tests.conftest import chunks
+
+# Every document shares these words, so unfiltered searches return all of them
+TOPIC = "harbour seals rest on rocks at low tide"
+
+DOCUMENTS = {
+    "guide": ("pdf", "2024-01-10T00:00:00"),
+    "notes": ("md", "2024-02-10T00:00:00"),
+    "report": ("pdf", "2024-03-10T00:00:00")
+}
+
+
+def index(client, metadata, document_id: str, file_type: str, uploaded_at: str, collection=None):
+    texts = [f"{TOPIC} {document_id} part {i}" for i in range(4)]
+    metadata.put_documents([document_record(
+        document_id=document_id, filename=f"{document_id}.{file_type}", file_type=file_type,
+        s3_key=None, content_hash=None, version=1, status=DOCUMENT_INDEXED, chunks=len(texts),
+        uploaded_at=uploaded_at, collection=collection or "default"
+    )])
+    client.index_documents(chunks(document_id, texts), collection=collection)
+
+
+@pytest.fixture
+def indexed(client, metadata):
+    for document_id, (file_type, uploaded_at) in DOCUMENTS.items():
+        index(client, metadata, document_id, file_type, uploaded_at)
+    return client
+
+
+def documents(results):
+    return {result["id"].split("_chunk_")[0] for result in results}
+
+
+@pytest.mark.parametrize("mode", ["dense", "keyword", "hybrid"])
+@pytest.mark.parametrize("filters, expected", [
+    (DocumentFilter(document_id="notes"), {"notes"}),
+    (DocumentFilter(file_type="pdf"), {"guide", "report"}),
+    (DocumentFilter(uploaded_after="2024-02-01T00:00:00"), {"notes", "report"}),
+    (DocumentFilter(file_type="pdf", uploaded_before="2024-02-01T00:00:00"), {"guide"}),
+    (DocumentFilter(document_id="missing"), set())
+])
+def test_filtered_results_stay_inside_the_selection(indexed, mode, filters, expected):
+    results = indexed.search(TOPIC, 12, mode=mode, filters=filters)
+
+    assert documents(results) == expected
+    assert len(results) == 4 * len(expected)
+
+
+def test_unfiltered_search_returns_every_document(indexed):
+    assert documents(indexed.search(TOPIC, 12, mode="dense")) == set(DOCUMENTS)
+
+
+def test_filters_see_documents_indexed_after_they_were_resolved(indexed, metadata):
+    filters = DocumentFilter(file_type="md")
+    assert documents(indexed.search(TOPIC, 12, mode="dense", filters=filters)) == {"notes"}
+
+    index(indexed, metadata, "diary", "md", "2024-04-10T00:00:00")
+
+    assert documents(indexed.search(TOPIC, 12, mode="dense", filters=filters)) == {"notes", "diary"}
+
+
+def test_filters_are_scoped_to_the_searched_collection(indexed, metadata):
+    index(indexed, metadata, "memo", "pdf", "2024-01-20T00:00:00", collection="team")
+
+    results = indexed.search(TOPIC, 12, mode="hybrid", filters=DocumentFilter(file_type="pdf"), collection="team")
+
+    assert documents(results) == {"memo"}
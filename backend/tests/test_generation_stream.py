@@ -0,0 +1,97 @@
+"""Server-Sent Events from the generation router, against the local Bedrock stub."""
+import asyncio
+import json
+from typing import List
+
+import pytest
+
+from app.core.bedrock_client import BedrockClient
+from app.core.bedrock_stub import StubBedrockRuntime
+from app.core.config import settings
+from app.core.response_cache import response_cache
+from app.routers import generation
+
+REPLY = "Paris is the capital of France"
+
+
+@pytest.fixture
+def stub(monkeypatch) -> StubBedrockRuntime:
+    """Serve the router's generations from a stub, with a fresh response cache."""
+    runtime = StubBedrockRuntime(reply=REPLY, chunk_words=2)
+    monkeypatch.setattr(generation, "bedrock_client", BedrockClient(runtime))
+    monkeypatch.setattr(settings, "GENERATION_CACHE_ENABLED", True)
+    response_cache.clear()
+    yield runtime
+    response_cache.clear()
+
+
+def stream(request: generation.GenerationRequest) -> List[dict]:
+    """Run a streamed generation and decode its SSE body into events."""
+    async def collect():
+        response = await generation._stream_response(request)
+        return [part async for part in response.body_iterator]
+
+    body = "".join(asyncio.run(collect()))
+    frames = [frame for frame in body.split("\n\n") if frame]
+    assert all(frame.startswith("data: ") for frame in frames)
+    return [json.loads(frame[len("data: "):]) for frame in frames]
+
+
+def request(question: str = "What is the capital of France?") -> generation.GenerationRequest:
+    return generation.GenerationRequest(context="France is a country in Europe.", question=question)
+
+
+def text(events: List[dict]) -> str:
+    return "".join(event["text"] for event in events if event["type"] == "token").strip()
+
+
+def test_stream_emits_tokens_then_done(stub):
+    events = stream(request())
+
+    assert [event["type"] for event in events[:-1]] == ["token"] * (len(events) - 1)
+    assert text(events) == REPLY
+    assert events[-1]["type"] == "done"
+    assert events[-1]["stop_reason"] == "stop"
+    assert not events[-1].get("cached")
+
+
+def test_stream_reports_errors_in_band(stub):
+    stub.error_after = 1
+
+    events = stream(request())
+
+    assert events[0]["type"] == "token"
+    assert events[-1]["type"] == "error"
+    assert "Stub stream error" in events[-1]["detail"]
+    assert not any(event["type"] == "done" for event in events)
+
+
+def test_failed_stream_is_not_cached(stub):
+    stub.error_after = 1
+    stream(request())
+    stub.error_after = None
+
+    events = stream(request())
+
+    assert len(stub.requests) == 2
+    assert text(events) == REPLY
+    assert not events[-1].get("cached")
+
+
+def test_repeated_stream_replays_from_cache(stub):
+    first = stream(request())
+    second = stream(request())
+
+    assert len(stub.requests) == 1
+    assert [event["type"] for event in second] == ["token", "done"]
+    assert text(second) == text(first)
+    assert second[-1]["cached"] is True
+    assert second[-1]["stop_reason"] == first[-1]["stop_reason"]
+
+
+def test_different_question_is_not_replayed(stub):
+    stream(request())
+    events = stream(request("What is the capital of Spain?"))
+
+    assert len(stub.requests) == 2
+    assert not events[-1].get("cached")
@@ -0,0 +1,95 @@
+"""BM25 keyword index and hybrid fusion."""
+import pytest
+
+from app.core.config import settings
+from app.core.keyword_index import KeywordIndex, tokenize
+from app.core.txtai_client import SearchModeError, TxtaiClient
+
+from tests.conftest import chunks
+
+
+@pytest.fixture
+def keywords(tmp_path):
+    index = KeywordIndex(str(tmp_path / "keywords.sqlite"))
+    yield index
+    index.close()
+
+
+def test_identifiers_are_indexed_whole_and_in_parts():
+    assert tokenize("Replace part PN-77812-B on the pump") == [
+        "replace", "part", "pn-77812-b", "pn", "77812", "pump"
+    ]
+
+
+def test_keyword_search_ranks_exact_identifiers_first(keywords):
+    keywords.upsert([
+        ("a", "The pump reported error E-4012 after the restart."),
+        ("b", "The pump reported an error after the restart."),
+        ("c", "Error codes are listed in the appendix.")
+    ])
+
+    results = keywords.search(["error E-4012", "E-4012", "the"], 5)
+
+    assert results[0][0][0] == "a"
+    assert [uid for uid, _ in results[1]] == ["a"]
+    assert results[2] == []
+    assert all(score > 0 for _, score in results[0])
+
+
+def test_keyword_search_stays_inside_the_selection(keywords):
+    keywords.upsert([(str(i), f"valve {i} pressure") for i in range(10)])
+
+    results = keywords.search(["valve pressure"], 10, ids=["3", "7", "missing"])
+
+    assert sorted(uid for uid, _ in results[0]) == ["3", "7"]
+
+
+def test_upsert_replaces_and_delete_removes(keywords):
+    keywords.upsert([("a", "walrus tusks"), ("b", "walrus diet")])
+    keywords.upsert([("a", "narwhal tusks")])
+    keywords.delete(["b"])
+
+    assert keywords.count() == 1
+    assert keywords.search(["walrus"], 5) == [[]]
+    assert [uid for uid, _ in keywords.search(["narwhal"], 5)[0]] == ["a"]
+
+
+def test_rrf_ranks_chunks_found_by_both_retrievers_first(monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_FUSION", "rrf")
+    monkeypatch.setattr(settings, "HYBRID_RRF_K", 60)
+    dense = [("d1", 0.9), ("both", 0.8), ("d2", 0.7)]
+    sparse = [("s1", 12.0), ("both", 9.0)]
+
+    fused = TxtaiClient._fuse(dense, sparse, 3)
+
+    assert [uid for uid, _ in fused] == ["both", "d1", "s1"]
+    assert fused[0][1] == pytest.approx(2 / 62)
+    assert fused[1][1] == fused[2][1] == pytest.approx(1 / 61)
+
+
+def test_weighted_fusion_scales_bm25_to_the_best_match(monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_FUSION", "weighted")
+    monkeypatch.setattr(settings, "HYBRID_DENSE_WEIGHT", 0.5)
+
+    fused = dict(TxtaiClient._fuse([("a", 0.8), ("b", 0.6)], [("b", 10.0), ("c", 5.0)], 5))
+
+    assert fused == pytest.approx({"a": 0.4, "b": 0.8, "c": 0.25})
+
+
+def test_hybrid_search_finds_an_exact_identifier(client):
+    texts = [f"The pump reported error E-{4000 + i} after the restart." for i in range(20)]
+    client.index_documents(chunks("manual", texts))
+
+    dense = client.search("error E-4012", 5, mode="dense")
+    hybrid = client.search("error E-4012", 5, mode="hybrid")
+    keyword = client.search("E-4012", 5, mode="keyword")
+
+    assert len(dense) == len(hybrid) == 5
+    assert hybrid[0]["id"] == keyword[0]["id"] == "manual_chunk_12"
+    assert hybrid[0]["text"] == texts[12]
+    assert hybrid[0]["metadata"]["document_id"] == "manual"
+
+
+def test_unknown_search_mode_is_rejected(client):
+    with pytest.raises(SearchModeError):
+        client.search("pump", 5, mode="fuzzy")
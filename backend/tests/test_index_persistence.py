@@ -0,0 +1,161 @@
+"""Write-behind snapshots: link swaps, pruning and failed flushes."""
+import os
+import time
+
+import pytest
+
+from app.core.index_persistence import (
+    LINK_NAME,
+    SNAPSHOT_PREFIX,
+    IndexPersistenceManager,
+    WriterLockedError,
+    lock_writer
+)
+from app.core.txtai_client import TxtaiClient
+
+from tests.conftest import chunks
+
+
+class Saves:
+    """save callable writing a numbered marker file into each snapshot."""
+
+    def __init__(self):
+        self.count = 0
+        self.fail = False
+
+    def __call__(self, path: str):
+        if self.fail:
+            raise OSError("disk full")
+        self.count += 1
+        os.makedirs(path)
+        with open(os.path.join(path, "save"), "w") as f:
+            f.write(str(self.count))
+
+
+@pytest.fixture
+def saves():
+    return Saves()
+
+
+def manager(saves, path, **kwargs):
+    os.makedirs(path, exist_ok=True)
+    options = {"interval": 3600.0, "max_pending": 1000, "keep_snapshots": 2, **kwargs}
+    return IndexPersistenceManager(saves, str(path), **options)
+
+
+def marker(path) -> str:
+    with open(os.path.join(path, LINK_NAME, "save")) as f:
+        return f.read()
+
+
+def snapshots(path):
+    return sorted(name for name in os.listdir(path) if name.startswith(SNAPSHOT_PREFIX))
+
+
+def test_link_points_at_the_newest_snapshot_and_older_ones_are_pruned(saves, tmp_path):
+    persistence = manager(saves, tmp_path)
+
+    for _ in range(4):
+        persistence.mark_dirty()
+        assert persistence.flush()
+
+    assert marker(tmp_path) == "4"
+    assert os.path.islink(tmp_path / LINK_NAME)
+    assert persistence.current_snapshot() == snapshots(tmp_path)[-1]
+    assert len(snapshots(tmp_path)) == 2
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_flush_without_changes_writes_nothing(saves, tmp_path):
+    persistence = manager(saves, tmp_path)
+
+    assert not persistence.flush()
+    assert saves.count == 0
+    assert persistence.current_snapshot() is None
+
+
+def test_failed_flush_keeps_the_current_snapshot_and_the_changes(saves, tmp_path):
+    persistence = manager(saves, tmp_path)
+    persistence.mark_dirty()
+    persistence.flush()
+
+    saves.fail = True
+    persistence.mark_dirty(3)
+    assert not persistence.flush()
+
+    stats = persistence.get_stats()
+    assert marker(tmp_path) == "1"
+    assert stats["pending_changes"] == 3
+    assert stats["failed_flushes"] == 1
+    assert stats["last_error"] == "disk full"
+    assert len(snapshots(tmp_path)) == 1
+
+    saves.fail = False
+    assert persistence.flush()
+    assert marker(tmp_path) == "2"
+    assert persistence.get_stats()["pending_changes"] == 0
+
+
+def test_changes_are_flushed_in_the_background_once_enough_accumulate(saves, tmp_path):
+    persistence = manager(saves, tmp_path, max_pending=5)
+    persistence.start()
+    try:
+        persistence.mark_dirty(4)
+        time.sleep(0.1)
+        assert saves.count == 0
+
+        persistence.mark_dirty()
+        deadline = time.monotonic() + 5
+        while saves.count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert saves.count == 1
+    finally:
+        persistence.close()
+
+
+def test_close_flushes_pending_changes(saves, tmp_path):
+    persistence = manager(saves, tmp_path)
+    persistence.start()
+    persistence.mark_dirty()
+
+    persistence.close()
+
+    assert marker(tmp_path) == "1"
+
+
+def test_legacy_index_directory_is_kept_as_a_snapshot(saves, tmp_path):
+    os.makedirs(tmp_path / LINK_NAME)
+    persistence = manager(saves, tmp_path, keep_snapshots=3)
+    persistence.mark_dirty()
+
+    persistence.flush()
+
+    assert os.path.islink(tmp_path / LINK_NAME)
+    assert f"{SNAPSHOT_PREFIX}0-legacy" in snapshots(tmp_path)
+
+
+def test_writer_lock_is_exclusive(tmp_path):
+    lock = lock_writer(str(tmp_path))
+    try:
+        with pytest.raises(WriterLockedError):
+            lock_writer(str(tmp_path))
+    finally:
+        lock.close()
+
+    lock_writer(str(tmp_path)).close()
+
+
+def test_flushed_index_loads_in_a_new_client(client, index_settings, monkeypatch):
+    client.index_documents(chunks("walrus", ["Walrus herds haul out on sea ice.", "Walrus tusks grow long."]))
+    client.flush()
+    client.close()
+
+    for name, value in {"_instance": None, "_collections": None, "_listeners": []}.items():
+        monkeypatch.setattr(TxtaiClient, name, value)
+    reopened = TxtaiClient()
+    try:
+        results = reopened.search("walrus tusks", 2, mode="dense")
+    finally:
+        reopened.close()
+
+    assert {result["id"] for result in results} == {"walrus_chunk_0", "walrus_chunk_1"}
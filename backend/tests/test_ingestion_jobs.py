@@ -0,0 +1,222 @@
+"""Ingestion jobs: retries, failure cleanup, worker resilience and deduplication."""
+import io
+import time
+import zipfile
+
+import pytest
+
+from app.core import ingestion_jobs as jobs_module
+from app.core.ingestion_jobs import FAILED, PARTIAL, SUCCEEDED, IngestionJobManager
+from app.core.job_queue import LocalJobQueue
+from app.core.s3_client import s3_client
+
+
+class FakeS3:
+    """Keeps uploaded originals in memory."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_document(self, file_content: bytes, document_id: str, filename: str, content_type: str) -> str:
+        key = f"documents/{document_id}/{filename}"
+        self.objects[key] = file_content
+        return key
+
+
+@pytest.fixture
+def manager(client, tmp_path, monkeypatch):
+    """A one-worker job manager indexing with the test client, one chunk per batch."""
+    monkeypatch.setattr(s3_client, "_instance", FakeS3())
+    for name, value in {"CHUNKER": "character", "CHUNK_SIZE": 120, "CHUNK_OVERLAP": 0, "INDEX_BATCH_SIZE": 1}.items():
+        monkeypatch.setattr(jobs_module.settings, name, value)
+
+    instance = IngestionJobManager(
+        queue=LocalJobQueue(10),
+        workers=1,
+        max_attempts=1,
+        retry_backoff=0.0,
+        spool_dir=str(tmp_path / "spool"),
+        stage_limits={"store": 1, "parse": 1, "embed": 1},
+        history=100
+    )
+    yield instance
+    instance.shutdown()
+
+
+def markdown(topic: str, paragraphs: int = 3) -> bytes:
+    """A document of several chunks, all mentioning the topic."""
+    return "\n\n".join(
+        f"Paragraph {i} is about {topic}. It has enough words about {topic} to fill a chunk on its own."
+        for i in range(paragraphs)
+    ).encode("utf-8")
+
+
+def wait(job, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.02)
+    return job.to_dict(documents=True)
+
+
+def test_upload_is_indexed(manager, client, metadata):
+    state = wait(manager.submit(markdown("walrus"), "walrus.md", "md", "doc1"))
+
+    assert state["status"] == SUCCEEDED
+    assert state["progress"]["chunks_embedded"] == 3
+    assert {result["metadata"]["document_id"] for result in client.search("walrus", 5, mode="keyword")} == {"doc1"}
+    assert metadata.get_document("doc1").s3_key == "documents/doc1/walrus.md"
+
+
+def test_failing_cleanup_does_not_stop_the_worker(manager, client, metadata, monkeypatch):
+    calls = []
+
+    def index_once(documents, collection=None):
+        calls.append(documents)
+        if len(calls) == 2:
+            raise RuntimeError("index unavailable")
+        return original(documents, collection=collection)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("metadata store unavailable")
+
+    original = client.index_documents
+    monkeypatch.setattr(client, "index_documents", index_once)
+    monkeypatch.setattr(metadata, "delete_document", broken)
+
+    failed = wait(manager.submit(markdown("walrus"), "walrus.md", "md", "doc1"))
+    # The chunk index cleanup still ran after the record cleanup failed
+    assert failed["status"] == FAILED
+    assert client.search("walrus", 5, mode="keyword") == []
+
+    later = wait(manager.submit(markdown("narwhal"), "narwhal.md", "md", "doc2"))
+    assert later["status"] == SUCCEEDED
+
+
+def test_unexpected_error_fails_the_job_and_keeps_the_worker(manager, monkeypatch):
+    def attempt(job):
+        if job.documents[0].document_id == "doc1":
+            raise RuntimeError("queue unavailable")
+        return original(job)
+
+    original = manager._attempt
+    monkeypatch.setattr(manager, "_attempt", attempt)
+
+    failed = wait(manager.submit(markdown("walrus"), "walrus.md", "md", "doc1"))
+    later = wait(manager.submit(markdown("narwhal"), "narwhal.md", "md", "doc2"))
+
+    assert failed["status"] == FAILED
+    assert failed["error"] == "queue unavailable"
+    assert later["status"] == SUCCEEDED
+
+
+def test_retry_that_fails_before_embedding_still_removes_earlier_chunks(manager, client, metadata, monkeypatch):
+    manager.max_attempts = 2
+    calls = []
+
+    def index_once(documents, collection=None):
+        calls.append(documents)
+        if len(calls) == 2:
+            raise RuntimeError("index unavailable")
+        return original(documents, collection=collection)
+
+    def parse_once(content, filename):
+        if calls:
+            raise ValueError("unreadable on retry")
+        return original_parse(content, filename)
+
+    original, original_parse = client.index_documents, jobs_module.document_processor.process_markdown
+    monkeypatch.setattr(client, "index_documents", index_once)
+    monkeypatch.setattr(jobs_module.document_processor, "process_markdown", parse_once)
+
+    state = wait(manager.submit(markdown("walrus"), "walrus.md", "md", "doc3"))
+
+    assert state["status"] == FAILED
+    assert state["attempts"] == 2
+    assert client.search("walrus", 5, mode="keyword") == []
+    assert metadata.get_document("doc3") is None
+
+
+def test_bulk_retry_removes_only_the_failed_documents_chunks(manager, client, metadata, monkeypatch):
+    manager.max_attempts = 2
+    calls = []
+
+    def index_once(documents, collection=None):
+        calls.append(documents)
+        if len(calls) == 3:
+            raise RuntimeError("index unavailable")
+        return original(documents, collection=collection)
+
+    def parse(content, filename):
+        if calls and filename == "walrus.md":
+            raise ValueError("unreadable on retry")
+        return original_parse(content, filename)
+
+    original, original_parse = client.index_documents, jobs_module.document_processor.process_markdown
+    monkeypatch.setattr(client, "index_documents", index_once)
+    monkeypatch.setattr(jobs_module.document_processor, "process_markdown", parse)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for topic in ("walrus", "narwhal", "penguin"):
+            zf.writestr(f"{topic}.md", markdown(topic))
+    archive.seek(0)
+
+    state = wait(manager.submit_bulk([("animals.zip", archive)]))
+    documents = {doc["filename"]: doc for doc in state["documents"]}
+
+    # The first attempt embedded chunks of the walrus document before failing
+    assert [doc["metadata"]["document_id"] for doc in calls[0]] == [documents["walrus.md"]["document_id"]]
+    assert state["status"] == PARTIAL
+    assert state["attempts"] == 2
+    assert documents["walrus.md"]["status"] == FAILED
+    assert client.search("walrus", 5, mode="keyword") == []
+    assert metadata.get_document(documents["walrus.md"]["document_id"]) is None
+    for topic in ("narwhal", "penguin"):
+        document_id = documents[f"{topic}.md"]["document_id"]
+        assert {result["metadata"]["document_id"] for result in client.search(topic, 5, mode="keyword")} == {document_id}
+        assert metadata.get_document(document_id).chunks == 3
+
+
+def test_upload_of_indexed_content_resolves_to_the_existing_document(manager, client, metadata):
+    wait(manager.submit(markdown("walrus"), "walrus.md", "md", "doc1"))
+    encoded = client._embedding_cache.get_stats()["encoded"]
+
+    state = wait(manager.submit(markdown("walrus"), "copy.md", "md", "doc2"))
+
+    assert state["status"] == SUCCEEDED
+    assert state["duplicate"] and state["document_id"] == "doc1"
+    assert state["progress"]["documents_deduplicated"] == 1
+    assert list(s3_client.objects) == ["documents/doc1/walrus.md"]
+    assert metadata.get_document("doc2") is None
+    assert client._embedding_cache.get_stats()["encoded"] == encoded
+
+
+def test_files_repeated_in_a_bulk_upload_are_indexed_once(manager, client, metadata):
+    files = [(name, io.BytesIO(markdown("walrus"))) for name in ("walrus.md", "again.md")]
+
+    state = wait(manager.submit_bulk(files))
+    documents = {doc["filename"]: doc for doc in state["documents"]}
+
+    assert state["status"] == SUCCEEDED
+    assert state["progress"]["documents_indexed"] == 1
+    assert state["progress"]["documents_deduplicated"] == 1
+    assert documents["again.md"]["document_id"] == documents["walrus.md"]["document_id"]
+    assert {result["metadata"]["document_id"] for result in client.search("walrus", 10, mode="keyword")} == {
+        documents["walrus.md"]["document_id"]
+    }
+    assert state["progress"]["chunks_embedded"] == 3
+
+
+def test_new_version_only_encodes_changed_chunks(manager, client, metadata):
+    wait(manager.submit(markdown("walrus"), "walrus.md", "md", "doc1"))
+    encoded = client._embedding_cache.get_stats()["encoded"]
+
+    # Extends the last of the three chunks; the first two are unchanged
+    changed = markdown("walrus") + b"\n\nA new closing paragraph about walrus calves and their mothers in spring."
+    state = wait(manager.submit(changed, "walrus.md", "md", "doc1", replace=True))
+
+    assert state["status"] == SUCCEEDED
+    assert state["version"] == 2
+    assert metadata.get_document("doc1").chunks == 3
+    assert client._embedding_cache.get_stats()["encoded"] == encoded + 1
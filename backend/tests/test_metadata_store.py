@@ -0,0 +1,146 @@
+"""Metadata store lookups."""
+import sqlite3
+
+import pytest
+from botocore.stub import ANY, Stubber
+
+from app.core import metadata_store as store
+from app.core.metadata_store import (
+    DOCUMENT_INDEXED,
+    ChunkRecord,
+    DocumentFilter,
+    DynamoDBMetadataStore,
+    MetadataStore,
+    SQLiteMetadataStore,
+    document_record
+)
+
+# SQLite's default variable limit before 3.32; builds differ, so the tests set it
+MAX_VARIABLES = 999
+KEYS = 2_000
+
+
+@pytest.fixture
+def metadata(tmp_path):
+    instance = SQLiteMetadataStore(str(tmp_path / "metadata.sqlite"))
+    instance._connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, MAX_VARIABLES)
+    yield instance
+    instance.close()
+
+
+def record(document_id: str, content_hash: str, collection: str = "default"):
+    return document_record(
+        document_id=document_id, filename=f"{document_id}.md", file_type="md", s3_key=f"documents/{document_id}",
+        content_hash=content_hash, version=1, status=DOCUMENT_INDEXED, chunks=1,
+        uploaded_at="2024-01-01T00:00:00", collection=collection
+    )
+
+
+def test_backends_must_implement_the_whole_interface():
+    class Partial(MetadataStore):
+        def get_document(self, document_id):
+            return None
+
+    with pytest.raises(TypeError, match="put_documents"):
+        Partial()
+    with pytest.raises(TypeError):
+        MetadataStore()
+
+
+def test_find_by_content_hash_batches_large_lookups(metadata):
+    metadata.put_documents([record(f"doc{i}", f"hash{i}") for i in range(0, KEYS, 7)])
+
+    found = metadata.find_by_content_hash([f"hash{i}" for i in range(KEYS)])
+
+    assert found == {f"hash{i}": [f"doc{i}"] for i in range(0, KEYS, 7)}
+
+
+def test_find_by_content_hash_is_scoped_to_collection(metadata, monkeypatch):
+    monkeypatch.setattr(store, "LOOKUP_BATCH", 2)
+    metadata.put_documents([record("a", "hash0"), record("b", "hash1", "team"), record("c", "hash2", "team")])
+
+    found = metadata.find_by_content_hash(["hash0", "hash1", "hash2"], collection="team")
+
+    assert found == {"hash1": ["b"], "hash2": ["c"]}
+
+
+def test_hydrate_batches_large_lookups(metadata):
+    metadata.put_documents([record("doc", "hash")])
+    metadata.put_chunks([ChunkRecord(f"doc_chunk_{i}", "doc", {"start": i}) for i in range(KEYS)])
+
+    hydrated = metadata.hydrate({f"doc_chunk_{i}": "doc" for i in range(KEYS + 10)})
+
+    assert len(hydrated) == KEYS
+    assert hydrated["doc_chunk_123"]["start"] == 123
+    assert hydrated["doc_chunk_123"]["filename"] == "doc.md"
+
+
+@pytest.fixture
+def dynamodb():
+    """A DynamoDB store whose requests are checked against expected calls instead of sent."""
+    instance = DynamoDBMetadataStore("rag-metadata", "us-east-1")
+    with Stubber(instance._dynamodb.meta.client) as stubber:
+        yield instance, stubber
+        stubber.assert_no_pending_responses()
+
+
+def document_item(document_id: str, file_type: str, uploaded_at: str, collection: str = "team") -> dict:
+    return {
+        "document_id": {"S": document_id}, "collection": {"S": collection},
+        "file_type": {"S": file_type}, "uploaded_at": {"S": uploaded_at}
+    }
+
+
+def test_dynamodb_filter_queries_the_document_index(dynamodb):
+    instance, stubber = dynamodb
+    stubber.add_response("query", {"Items": [
+        document_item("a", "pdf", "2024-02-01T00:00:00"),
+        document_item("b", "md", "2024-03-01T00:00:00"),
+        document_item("c", "pdf", "2024-04-01T00:00:00")
+    ]}, {
+        "TableName": "rag-metadata",
+        "IndexName": DynamoDBMetadataStore.DOCUMENTS_INDEX,
+        "KeyConditionExpression": "#collection = :collection and uploaded_at between :after and :before",
+        "ExpressionAttributeNames": {"#collection": "collection"},
+        "ExpressionAttributeValues": {
+            ":collection": "team",
+            ":after": "2024-01-01T00:00:00",
+            ":before": "2024-04-01T00:00:00"
+        },
+        "ProjectionExpression": ANY
+    })
+    # Only the matching document's chunk keys are read, by partition
+    stubber.add_response("query", {"Items": [
+        {"sk": {"S": "CHUNK#a_chunk_0"}}, {"sk": {"S": "CHUNK#a_chunk_1"}}
+    ]}, {
+        "TableName": "rag-metadata",
+        "KeyConditionExpression": "pk = :pk and begins_with(sk, :chunk)",
+        "ExpressionAttributeValues": {":pk": "DOC#a", ":chunk": "CHUNK#"},
+        "ProjectionExpression": "sk"
+    })
+
+    chunk_ids = instance.find_chunks(DocumentFilter(
+        file_type="pdf", uploaded_after="2024-01-01T00:00:00", uploaded_before="2024-04-01T00:00:00",
+        collection="team"
+    ))
+
+    assert chunk_ids == ["a_chunk_0", "a_chunk_1"]
+
+
+def test_dynamodb_filter_without_collection_scans_only_the_document_index(dynamodb):
+    instance, stubber = dynamodb
+    stubber.add_response("scan", {
+        "Items": [document_item("a", "md", "2024-02-01T00:00:00")],
+        "LastEvaluatedKey": {"pk": {"S": "DOC#a"}, "sk": {"S": "DOC"}}
+    }, {"TableName": "rag-metadata", "IndexName": DynamoDBMetadataStore.DOCUMENTS_INDEX,
+        "ProjectionExpression": ANY, "ExpressionAttributeNames": ANY})
+    stubber.add_response("scan", {"Items": [document_item("b", "pdf", "2024-02-01T00:00:00", "other")]}, {
+        "TableName": "rag-metadata", "IndexName": DynamoDBMetadataStore.DOCUMENTS_INDEX,
+        "ProjectionExpression": ANY, "ExpressionAttributeNames": ANY, "ExclusiveStartKey": ANY
+    })
+    stubber.add_response("query", {"Items": [{"sk": {"S": "CHUNK#b_chunk_0"}}]}, {
+        "TableName": "rag-metadata", "KeyConditionExpression": ANY, "ExpressionAttributeValues": ANY,
+        "ProjectionExpression": "sk"
+    })
+
+    assert instance.find_chunks(DocumentFilter(file_type="pdf")) == ["b_chunk_0"]
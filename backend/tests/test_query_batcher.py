@@ -0,0 +1,105 @@
+"""Query micro-batching."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.executors import BoundedExecutor
+from app.core.query_batcher import QueryBatcher
+
+# Long enough that a test waiting for it would be obvious
+MAX_WAIT = 2.0
+
+
+class SlowSearch:
+    """search_batch stand-in that records its batches and holds them for a while."""
+
+    def __init__(self, seconds: float, only: str = None):
+        """Holds every batch, or only batches with the query `only`."""
+        self.seconds = seconds
+        self.only = only
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, queries, limit, mode, filters=None, collection=None):
+        with self._lock:
+            self.batches.append(list(queries))
+        if self.only is None or self.only in queries:
+            time.sleep(self.seconds)
+        return [[{"id": f"{query}_chunk_0", "score": 1.0}] for query in queries]
+
+
+@pytest.fixture
+def executor():
+    pool = BoundedExecutor("test", max_workers=4, max_queue=16)
+    yield pool
+    pool.shutdown()
+
+
+def test_idle_query_is_dispatched_without_waiting(executor):
+    search = SlowSearch(0.0)
+    batcher = QueryBatcher(search, executor, max_batch_size=32, max_wait=MAX_WAIT)
+
+    async def run():
+        start = time.monotonic()
+        results = await batcher.search("alpha", 5, "dense")
+        return results, time.monotonic() - start
+
+    results, seconds = asyncio.run(run())
+
+    assert results == [{"id": "alpha_chunk_0", "score": 1.0}]
+    assert seconds < MAX_WAIT / 4
+    assert search.batches == [["alpha"]]
+
+
+def test_queries_collect_behind_a_running_batch(executor):
+    search = SlowSearch(0.2)
+    batcher = QueryBatcher(search, executor, max_batch_size=32, max_wait=MAX_WAIT)
+
+    async def run():
+        start = time.monotonic()
+        first = asyncio.ensure_future(batcher.search("q0", 5, "dense"))
+        await asyncio.sleep(0.05)
+        rest = [batcher.search(f"q{i}", 5, "dense") for i in range(1, 6)]
+        results = await asyncio.gather(first, *rest)
+        return results, time.monotonic() - start
+
+    results, seconds = asyncio.run(run())
+
+    assert [result[0]["id"] for result in results] == [f"q{i}_chunk_0" for i in range(6)]
+    # The second batch goes out when the first finishes, not after max_wait
+    assert search.batches == [["q0"], [f"q{i}" for i in range(1, 6)]]
+    assert seconds < MAX_WAIT / 4
+
+
+def test_different_keys_do_not_wait_for_each_other(executor):
+    search = SlowSearch(0.5, only="dense query")
+    batcher = QueryBatcher(search, executor, max_batch_size=32, max_wait=MAX_WAIT)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.search("dense query", 5, "dense"))
+        await asyncio.sleep(0.05)
+        await batcher.search("keyword query", 5, "keyword")
+        return first.done()
+
+    first_done = asyncio.run(run())
+
+    assert not first_done
+    assert len(search.batches) == 2
+
+
+def test_full_batch_is_dispatched_before_the_running_one_finishes(executor):
+    search = SlowSearch(0.5, only="q0")
+    batcher = QueryBatcher(search, executor, max_batch_size=2, max_wait=MAX_WAIT)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.search("q0", 5, "dense"))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(*(batcher.search(f"q{i}", 5, "dense") for i in (1, 2)))
+        return first.done()
+
+    first_done = asyncio.run(run())
+
+    assert search.batches == [["q0"], ["q1", "q2"]]
+    assert not first_done
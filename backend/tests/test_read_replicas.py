@@ -0,0 +1,109 @@
+"""Single writer and hot-reloading read-only shards on one directory."""
+import os
+import threading
+
+import pytest
+
+from app.core.embedding_cache import EmbeddingCache
+from app.core.index_persistence import LINK_NAME, WriterLockedError
+from app.core.index_shard import IndexShard, ReadOnlyIndexError
+
+from tests.conftest import chunks, vectorize
+
+
+@pytest.fixture
+def writer(index_settings):
+    shard = IndexShard(index_settings.TXTAI_INDEX_PATH, {}, EmbeddingCache(100))
+    shard.upsert(chunks("walrus", ["Walrus tusks grow long", "Walrus calves stay with mothers"]))
+    shard.flush()
+    yield shard
+    shard.close()
+
+
+@pytest.fixture
+def reader(writer, index_settings, monkeypatch):
+    monkeypatch.setattr(index_settings, "INDEX_READ_ONLY", True)
+    shard = IndexShard(index_settings.TXTAI_INDEX_PATH, {}, EmbeddingCache(100))
+    yield shard
+    shard.close()
+
+
+def found(shard, query: str = "walrus tusks"):
+    results = shard.search([query], vectorize([query]), 10, "hybrid")
+    return {uid for uid, _ in results.dense[0]} | {uid for uid, _ in results.sparse[0]}
+
+
+def test_reader_serves_the_published_snapshot(writer, reader):
+    assert found(reader) == {"walrus_chunk_0", "walrus_chunk_1"}
+    assert reader.version == os.path.basename(os.path.realpath(os.path.join(writer.path, LINK_NAME)))
+
+
+def test_reader_rejects_writes(reader):
+    with pytest.raises(ReadOnlyIndexError):
+        reader.upsert(chunks("narwhal", ["Narwhal tusks are teeth"]))
+
+
+def test_second_writer_fails_to_start(writer, index_settings):
+    with pytest.raises(WriterLockedError):
+        IndexShard(index_settings.TXTAI_INDEX_PATH, {}, EmbeddingCache(100))
+
+
+def test_reader_picks_up_newer_snapshots_only(writer, reader):
+    assert not reader.refresh()
+
+    writer.upsert(chunks("narwhal", ["Narwhal tusks are teeth"]))
+    # Unpublished changes are not visible
+    assert not reader.refresh()
+    writer.flush()
+
+    version = reader.version
+    assert reader.refresh()
+    assert reader.version != version
+    assert reader.refreshes == 1
+    assert "narwhal_chunk_0" in found(reader)
+
+
+def test_search_running_during_a_swap_finishes_on_the_old_snapshot(writer, reader):
+    writer.upsert(chunks("narwhal", ["Narwhal tusks are teeth"]))
+    writer.flush()
+
+    # Hold a search inside the old snapshot's ANN index
+    entered, resume = threading.Event(), threading.Event()
+    batchsearch = reader.embeddings.batchsearch
+
+    def held(*args, **kwargs):
+        entered.set()
+        resume.wait(10)
+        return batchsearch(*args, **kwargs)
+
+    reader.embeddings.batchsearch = held
+    during = {}
+    search = threading.Thread(target=lambda: during.update(ids=found(reader)))
+    search.start()
+    assert entered.wait(10)
+
+    refresh = threading.Thread(target=reader.refresh)
+    refresh.start()
+    # The new snapshot loads alongside, but isn't swapped in under a running search
+    refresh.join(0.5)
+    assert refresh.is_alive()
+    assert reader.refreshes == 0
+
+    resume.set()
+    search.join(10)
+    refresh.join(10)
+
+    assert during["ids"] == {"walrus_chunk_0", "walrus_chunk_1"}
+    assert reader.refreshes == 1
+    assert "narwhal_chunk_0" in found(reader)
+
+
+def test_copies_a_reader_moved_past_are_pruned(writer, reader):
+    first = reader.snapshot
+    for animal in ("narwhal", "beluga"):
+        writer.upsert(chunks(animal, [f"{animal} tusks"]))
+        writer.flush()
+        assert reader.refresh()
+
+    assert not os.path.exists(first)
+    assert os.path.isdir(reader.snapshot)
@@ -0,0 +1,103 @@
+"""Generation response cache: exact and semantic hits, eviction and invalidation."""
+import time
+
+import numpy as np
+import pytest
+
+from app.core.response_cache import ResponseCache
+
+from tests.conftest import chunks, vectorize
+
+MODEL = "anthropic.claude-v2"
+CHUNKS = ["walrus_chunk_0", "walrus_chunk_1"]
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(max_entries=10, max_bytes=100_000, ttl=3600.0, semantic=True, threshold=0.9)
+
+
+def key(prompt: str, max_tokens: int = 256):
+    return ResponseCache.key(MODEL, prompt, max_tokens, 0.0)
+
+
+def answer(text: str):
+    return {"text": text, "model_id": MODEL}
+
+
+def vector(text: str) -> np.ndarray:
+    return vectorize([text])[0]
+
+
+def test_exact_hits_ignore_case_and_whitespace(cache):
+    cache.put(key("How long are walrus tusks?"), answer("About a metre."))
+
+    assert cache.get(key("  how long are WALRUS   tusks? ")) == answer("About a metre.")
+    assert cache.get(key("How long are walrus tusks?", max_tokens=512)) is None
+
+
+def test_near_duplicate_question_over_the_same_chunks_is_a_semantic_hit(cache):
+    question = "how long do walrus tusks grow"
+    cache.put(key(question), answer("About a metre."), CHUNKS, vector(question))
+
+    similar = "how long do walrus tusks grow?"
+    assert cache.get(key(similar)) is None
+    assert cache.get_similar(key(similar), vector(similar), reversed(CHUNKS)) == answer("About a metre.")
+    assert cache.get_stats()["semantic_hits"] == 1
+
+
+def test_semantic_hits_need_the_same_chunks_and_a_similar_question(cache):
+    question = "how long do walrus tusks grow"
+    cache.put(key(question), answer("About a metre."), CHUNKS, vector(question))
+
+    assert cache.get_similar(key(question), vector(question), CHUNKS[:1]) is None
+    assert cache.get_similar(key(question, max_tokens=64), vector(question), CHUNKS) is None
+    assert cache.get_similar(key("what do walruses eat"), vector("what do walruses eat"), CHUNKS) is None
+
+
+def test_least_recently_used_entries_are_evicted_with_their_semantic_scope():
+    cache = ResponseCache(max_entries=2, max_bytes=100_000, ttl=3600.0, semantic=True, threshold=0.9)
+    for i in range(3):
+        question = f"question {i}"
+        cache.put(key(question), answer(str(i)), [f"doc{i}_chunk_0"], vector(question))
+
+    assert cache.get(key("question 0")) is None
+    assert cache.get_similar(key("question 0"), vector("question 0"), ["doc0_chunk_0"]) is None
+    assert cache.get(key("question 2")) == answer("2")
+    assert len(cache._scopes) == 2
+
+
+def test_entries_expire_after_the_ttl():
+    cache = ResponseCache(max_entries=10, max_bytes=100_000, ttl=0.05)
+    cache.put(key("question"), answer("yes"))
+
+    time.sleep(0.1)
+
+    assert cache.get(key("question")) is None
+
+
+def test_changed_documents_invalidate_the_answers_built_from_them(cache):
+    cache.put(key("walrus question"), answer("walrus"), CHUNKS, vector("walrus question"))
+    cache.put(key("narwhal question"), answer("narwhal"), ["narwhal_chunk_0"], vector("narwhal question"))
+    cache.put(key("no context"), answer("plain"))
+
+    assert cache.invalidate_documents(["walrus"]) == 1
+    assert cache.get(key("walrus question")) is None
+    assert cache.get(key("narwhal question")) == answer("narwhal")
+
+    assert cache.invalidate_documents(None) == 2
+    assert cache.get(key("no context")) is None
+    assert cache.get_stats()["invalidations"] == 3
+
+
+def test_reindexing_a_document_invalidates_cached_answers(cache, client):
+    client.add_listener(cache.invalidate_documents)
+    client.index_documents(chunks("walrus", ["Walrus tusks grow long.", "Walruses eat clams."]))
+    client.index_documents(chunks("narwhal", ["Narwhals have one tusk."]))
+    cache.put(key("walrus question"), answer("walrus"), CHUNKS)
+    cache.put(key("narwhal question"), answer("narwhal"), ["narwhal_chunk_0"])
+
+    client.delete_document("walrus")
+
+    assert cache.get(key("walrus question")) is None
+    assert cache.get(key("narwhal question")) == answer("narwhal")
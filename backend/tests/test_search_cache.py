@@ -0,0 +1,74 @@
+"""Query-vector and search-result caches in front of TxtaiClient.search."""
+import pytest
+
+from app.core.metadata_store import DocumentFilter
+from app.core.search_cache import SearchCache
+
+from tests.conftest import chunks
+
+
+@pytest.fixture
+def cached(index_settings, monkeypatch, request):
+    """The test client with both search caches enabled, counting queries encoded."""
+    monkeypatch.setattr(index_settings, "SEARCH_CACHE_ENABLED", True)
+    client = request.getfixturevalue("client")
+    client.index_documents(chunks("walrus", ["Walrus tusks grow long.", "Walruses eat clams on the sea floor."]))
+
+    encoded = []
+    batchtransform = client._encoder.batchtransform
+
+    def counting(texts):
+        encoded.extend(texts)
+        return batchtransform(texts)
+
+    monkeypatch.setattr(client._encoder, "batchtransform", counting)
+    client.encoded = encoded
+    return client
+
+
+def test_repeated_queries_are_served_from_the_cache(cached):
+    assert cached.cached_search("walrus tusks", 2, "dense") is None
+
+    results = cached.search("walrus tusks", 2, mode="dense")
+
+    assert cached.cached_search("  walrus   tusks ", 2, "dense") == results
+    assert cached.encoded == ["walrus tusks"]
+
+
+def test_cached_results_are_keyed_by_limit_mode_filter_and_collection(cached):
+    cached.search("walrus tusks", 2, mode="dense")
+
+    assert cached.cached_search("walrus tusks", 1, "dense") is None
+    assert cached.cached_search("walrus tusks", 2, "hybrid") is None
+    assert cached.cached_search("walrus tusks", 2, "dense", DocumentFilter(file_type="pdf")) is None
+    assert cached.cached_search("walrus tusks", 2, "dense", collection="team") is None
+
+
+def test_index_changes_drop_results_but_keep_query_vectors(cached):
+    cached.search("walrus tusks", 2, mode="dense")
+
+    cached.index_documents(chunks("narwhal", ["Narwhal tusks are long teeth."]))
+
+    assert cached.cached_search("walrus tusks", 2, "dense") is None
+    results = cached.search("walrus tusks", 2, mode="dense")
+    assert "narwhal_chunk_0" in {result["id"] for result in results}
+    assert cached.encoded == ["walrus tusks"]
+
+
+def test_batch_search_reuses_cached_results_and_vectors(cached):
+    first = cached.search("walrus tusks", 2, mode="dense")
+
+    results = cached.batch_search(["walrus tusks", "sea floor clams"], 2, mode="dense")
+
+    assert results[0] == first
+    assert cached.encoded == ["walrus tusks", "sea floor clams"]
+
+
+def test_cached_results_are_copies():
+    cache = SearchCache(max_results=4, max_vectors=4)
+    cache.put_results("query", 5, "dense", 1, [{"id": "a", "score": 1.0}])
+
+    cache.get_results("query", 5, "dense", 1)[0]["score"] = 0.0
+
+    assert cache.get_results("query", 5, "dense", 1) == [{"id": "a", "score": 1.0}]
+    assert cache.get_results("query", 5, "dense", 2) is None
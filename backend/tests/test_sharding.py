@@ -0,0 +1,85 @@
+"""Shard routing and scatter-gather search."""
+import pytest
+
+from app.core.index_collection import IndexCollection
+
+from tests.conftest import chunks, vectorize
+
+SHARDS = 3
+ANIMALS = ["walrus", "narwhal", "penguin", "seal", "otter", "puffin", "orca", "beluga", "manatee", "dugong", "krill", "tern"]
+
+
+def texts(animal: str):
+    return [f"The {animal} lives in cold water", f"The {animal} eats fish and krill", f"Young {animal} calves grow fast"]
+
+
+@pytest.fixture
+def sharded(index_settings, monkeypatch, request):
+    """The test client on a three-shard index of twelve documents."""
+    monkeypatch.setattr(index_settings, "INDEX_SHARDS", SHARDS)
+    client = request.getfixturevalue("client")
+    for animal in ANIMALS:
+        client.index_documents(chunks(animal, texts(animal), tenant=f"tenant{len(animal) % 2}"))
+    return client
+
+
+def shards(client):
+    return client._collections["default"].shards
+
+
+def test_chunks_of_a_document_share_a_shard_and_documents_spread(sharded):
+    homes = {}
+    for animal in ANIMALS:
+        holding = [index for index, shard in enumerate(shards(sharded)) if shard.chunk_ids(animal)]
+        assert len(holding) == 1
+        assert len(shards(sharded)[holding[0]].chunk_ids(animal)) == 3
+        homes[animal] = holding[0]
+
+    assert len(set(homes.values())) > 1
+    assert sum(shard.count() for shard in shards(sharded)) == 3 * len(ANIMALS)
+
+
+def test_gathered_results_match_an_exact_search_of_all_chunks(sharded):
+    documents = [(f"{animal}_chunk_{i}", text) for animal in ANIMALS for i, text in enumerate(texts(animal))]
+    query = "young penguin calves eat krill"
+
+    scores = dict(zip([uid for uid, _ in documents], vectorize([text for _, text in documents]) @ vectorize([query])[0]))
+
+    results = sharded.search(query, 5, mode="dense")
+
+    # Hashed words collide, so compare scores rather than the order of ties
+    assert [result["score"] for result in results] == pytest.approx(sorted(scores.values(), reverse=True)[:5], abs=1e-5)
+    assert [result["score"] for result in results] == pytest.approx([scores[result["id"]] for result in results], abs=1e-5)
+
+
+def test_keyword_search_gathers_every_shard(sharded):
+    results = sharded.search("krill", 20, mode="keyword")
+
+    # Every document mentions krill, and the krill document twice
+    assert {result["metadata"]["document_id"] for result in results} == set(ANIMALS)
+
+
+def test_delete_removes_a_document_from_its_shard(sharded):
+    assert sharded.delete_document("orca") == 3
+
+    assert not any(shard.chunk_ids("orca") for shard in shards(sharded))
+    assert "orca" not in {result["metadata"]["document_id"] for result in sharded.search("orca", 10, mode="keyword")}
+
+
+def test_shard_key_routes_documents_of_a_tenant_together(index_settings, monkeypatch, request):
+    monkeypatch.setattr(index_settings, "INDEX_SHARD_KEY", "tenant")
+    client = request.getfixturevalue("sharded")
+
+    for tenant in ("tenant0", "tenant1"):
+        members = [animal for animal in ANIMALS if f"tenant{len(animal) % 2}" == tenant]
+        holding = {index for index, shard in enumerate(shards(client)) for animal in members if shard.chunk_ids(animal)}
+        assert len(holding) == 1
+
+
+def test_gather_keeps_the_best_candidates_per_query():
+    parts = [
+        [[("a", 0.9), ("b", 0.3)], [("x", 0.2)]],
+        [[("c", 0.5)], [("y", 0.8), ("z", 0.1)]]
+    ]
+
+    assert IndexCollection._gather(parts, 2) == [[("a", 0.9), ("c", 0.5)], [("y", 0.8), ("x", 0.2)]]
@@ -0,0 +1,114 @@
+"""Local snapshot copies: reuse, pruning and copies held by workers."""
+import os
+import shutil
+
+import pytest
+
+from app.core import snapshot_cache
+from app.core.config import settings
+from app.core.index_persistence import LINK_NAME, SNAPSHOT_PREFIX
+
+OLD, CURRENT, NEW = (f"{SNAPSHOT_PREFIX}2024010{day}000000000000" for day in (1, 2, 3))
+
+
+@pytest.fixture
+def shard(tmp_path, monkeypatch):
+    """A shard directory whose link points at the snapshot published last."""
+    monkeypatch.setattr(settings, "INDEX_LOCAL_CACHE_PATH", str(tmp_path / "cache"))
+    path = tmp_path / "shard"
+    path.mkdir()
+    return path
+
+
+def publish(shard, name: str):
+    os.makedirs(shard / name)
+    (shard / name / "documents").write_text(name)
+    link = shard / f".{LINK_NAME}.tmp"
+    os.symlink(name, link)
+    os.replace(link, shard / LINK_NAME)
+
+
+def copy(shard) -> snapshot_cache.LocalSnapshot:
+    return snapshot_cache.local_snapshot(str(shard), str(shard / LINK_NAME))
+
+
+def copies(held: snapshot_cache.LocalSnapshot):
+    directory = os.path.dirname(held.path)
+    return sorted(name for name in os.listdir(directory) if name.startswith(SNAPSHOT_PREFIX))
+
+
+def test_copy_is_made_once_and_reused(shard):
+    publish(shard, CURRENT)
+
+    first, second = copy(shard), copy(shard)
+
+    assert first.path == second.path
+    assert os.path.basename(first.path) == CURRENT
+    assert open(os.path.join(first.path, "documents")).read() == CURRENT
+    first.release()
+    second.release()
+
+
+def test_released_older_copies_are_pruned(shard):
+    publish(shard, OLD)
+    copy(shard).release()
+    publish(shard, CURRENT)
+
+    held = copy(shard)
+
+    assert copies(held) == [CURRENT]
+    assert not os.path.exists(os.path.join(os.path.dirname(held.path), f".{OLD}.lock"))
+    held.release()
+
+
+def test_copies_held_by_another_worker_are_kept(shard):
+    publish(shard, OLD)
+    serving = copy(shard)
+    publish(shard, CURRENT)
+
+    held = copy(shard)
+    assert copies(held) == [OLD, CURRENT]
+
+    # Pruned by the next copy once the other worker moved on
+    serving.release()
+    publish(shard, NEW)
+    newest = copy(shard)
+    assert copies(newest) == [CURRENT, NEW]
+    held.release()
+    newest.release()
+
+
+def test_copies_of_newer_snapshots_are_kept(shard):
+    publish(shard, CURRENT)
+    copy(shard).release()
+    publish(shard, NEW)
+    copy(shard).release()
+
+    # A worker that read the link before the last publish copies an older snapshot
+    stale = snapshot_cache.local_snapshot(str(shard), str(shard / CURRENT))
+
+    assert copies(stale) == [CURRENT, NEW]
+    stale.release()
+
+
+def test_copy_pruned_before_it_is_held_is_replaced_by_the_current_one(shard, monkeypatch):
+    publish(shard, CURRENT)
+    flock = snapshot_cache.fcntl.flock
+    raced = []
+
+    def pruned_first(lock, operation):
+        # Another worker publishes and copies a newer snapshot, pruning this copy
+        if not raced:
+            raced.append(lock.name)
+            publish(shard, NEW)
+            shutil.rmtree(os.path.join(os.path.dirname(lock.name), CURRENT))
+        return flock(lock, operation)
+
+    monkeypatch.setattr(snapshot_cache.fcntl, "flock", pruned_first)
+
+    held = copy(shard)
+
+    assert raced
+    assert os.path.basename(held.path) == NEW
+    assert os.path.isdir(held.path)
+    held.release()
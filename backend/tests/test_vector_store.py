@@ -0,0 +1,129 @@
+"""Persistent chunk vector store and the embedding cache in front of it."""
+import numpy as np
+import pytest
+
+from app.core import vector_store as store_module
+from app.core.embedding_cache import EmbeddingCache
+from app.core.vector_store import VectorStore
+
+from tests.conftest import DIMENSIONS, vectorize
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class CountingModel:
+    """Vector model stand-in that records the texts it encodes."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return vectorize(texts)
+
+
+def keys(count: int, prefix: str = "hash"):
+    return [f"{prefix}{i}" for i in range(count)]
+
+
+def test_vectors_survive_reopening(tmp_path):
+    vectors = vectorize([f"text {i}" for i in range(10)])
+    store = VectorStore(str(tmp_path), MODEL)
+    store.put_many(keys(10), vectors)
+    store.close()
+
+    reopened = VectorStore(str(tmp_path), MODEL)
+    found = reopened.get_many(["hash3", "missing", "hash7"])
+    reopened.close()
+
+    assert sorted(found) == ["hash3", "hash7"]
+    np.testing.assert_array_equal(found["hash3"], vectors[3])
+    np.testing.assert_array_equal(found["hash7"], vectors[7])
+
+
+def test_models_never_share_vectors(tmp_path):
+    store = VectorStore(str(tmp_path), MODEL)
+    other = VectorStore(str(tmp_path), "intfloat/e5-small")
+    store.put_many(["hash0"], vectorize(["walrus"]))
+
+    assert other.get_many(["hash0"]) == {}
+    assert store.path != other.path
+    store.close()
+    other.close()
+
+
+def test_the_file_grows_as_vectors_are_added(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "MIN_GROWTH", 8)
+    vectors = vectorize([f"text {i}" for i in range(50)])
+    store = VectorStore(str(tmp_path), MODEL)
+
+    for start in range(0, 50, 5):
+        store.put_many(keys(50)[start:start + 5], vectors[start:start + 5])
+
+    np.testing.assert_array_equal(store.read(), vectors)
+    assert store.get_stats()["vectors"] == 50
+    store.close()
+
+
+def test_known_hashes_and_vectors_over_the_limit_are_not_stored(tmp_path):
+    store = VectorStore(str(tmp_path), MODEL, max_vectors=3)
+    store.put_many(keys(2), vectorize(["a", "b"]))
+    store.put_many(keys(5), vectorize(["x", "y", "c", "d", "e"]))
+
+    assert store.get_stats()["vectors"] == 3
+    np.testing.assert_array_equal(store.get_many(["hash0"])["hash0"], vectorize(["a"])[0])
+    assert sorted(store.get_many(keys(5))) == ["hash0", "hash1", "hash2"]
+    store.close()
+
+
+def test_vectors_of_another_size_are_ignored(tmp_path):
+    store = VectorStore(str(tmp_path), MODEL)
+    store.put_many(["hash0"], vectorize(["walrus"]))
+
+    store.put_many(["hash1"], np.ones((1, DIMENSIONS * 2), dtype=np.float32))
+
+    assert store.get_many(["hash1"]) == {}
+    store.close()
+
+
+def test_half_precision_store_keeps_its_dtype_when_reopened(tmp_path):
+    vectors = vectorize(["walrus tusks", "narwhal tusks"])
+    store = VectorStore(str(tmp_path), MODEL, dtype="float16")
+    store.put_many(keys(2), vectors)
+    store.close()
+
+    reopened = VectorStore(str(tmp_path), MODEL, dtype="float32")
+    found = reopened.get_many(keys(2))
+
+    assert reopened.dtype == np.float16
+    assert found["hash0"].dtype == np.float32
+    np.testing.assert_allclose(found["hash0"], vectors[0], atol=1e-3)
+    reopened.close()
+
+
+def test_cache_encodes_each_text_once_across_restarts(tmp_path):
+    model = CountingModel()
+    texts = ["walrus tusks", "narwhal tusks", "walrus tusks"]
+
+    cache = EmbeddingCache(100, store=VectorStore(str(tmp_path), MODEL))
+    first = cache.encode(model, texts)
+    cache.close()
+
+    restarted = EmbeddingCache(100, store=VectorStore(str(tmp_path), MODEL))
+    second = restarted.encode(model, texts + ["penguin"])
+
+    assert model.encoded == ["walrus tusks", "narwhal tusks", "penguin"]
+    np.testing.assert_array_equal(second[:3], first)
+    assert restarted.get_stats()["store"]["hits"] == 2
+    restarted.close()
+
+
+@pytest.mark.parametrize("max_vectors", [1, 100])
+def test_memory_cache_without_a_store_reencodes_evicted_texts(max_vectors):
+    model = CountingModel()
+    cache = EmbeddingCache(max_vectors)
+
+    cache.encode(model, ["walrus", "narwhal"])
+    cache.encode(model, ["walrus"])
+
+    assert model.encoded == (["walrus", "narwhal"] if max_vectors > 1 else ["walrus", "narwhal", "walrus"])
@@ -48,23 +48,65 @@ function App() {
     }
   })
 
-  // Generate answer
+  // Generate answer, rendering tokens as they stream in
   const generateMutation = useMutation({
-    mutationFn: async ({ context, question }) => {
-      const response = await axiosInstance.post('/api/v1/generation/generate', {
-        context,
-        question,
-        max_tokens: 2048,
-        temperature: 0.7
+    mutationFn: async ({ context, question, chunkIds }) => {
+      const response = await fetch(`${apiUrl}/api/v1/generation/generate/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          context,
+          question,
+          chunk_ids: chunkIds,
+          max_tokens: 2048,
+          temperature: 0.7
+        })
       })
-      return response.data
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}))
+        throw new Error(body.detail || `Request failed with status ${response.status}`)
+      }
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let text = ''
+      let model = null
+
+      setAnswer({ answer: '', model: null, streaming: true })
+
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+
+        // Server-Sent Events are separated by a blank line
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split('\n\n')
+        buffer = events.pop()
+
+        for (const raw of events) {
+          if (!raw.startsWith('data: ')) continue
+          const event = JSON.parse(raw.slice(6))
+
+          if (event.type === 'token') {
+            text += event.text
+            setAnswer({ answer: text, model: null, streaming: true })
+          } else if (event.type === 'done') {
+            model = event.model
+          } else if (event.type === 'error') {
+            throw new Error(event.detail)
+          }
+        }
+      }
+
+      return { answer: text, model, streaming: false }
     },
     onSuccess: (data) => {
       setAnswer(data)
       setErrorMessage(null)
     },
     onError: (error) => {
-      setErrorMessage(error.response?.data?.detail || 'Failed to generate an answer.')
+      setErrorMessage(error.message || 'Failed to generate an answer.')
     }
   })
 
@@ -81,7 +123,8 @@ function App() {
     // Step 2: Generate answer with retrieved context
     await generateMutation.mutateAsync({
       context: retrievalResult.context,
-      question: query
+      question: query,
+      chunkIds: retrievalResult.context_chunk_ids || (retrievalResult.chunks || []).map((chunk) => chunk.id)
     })
   }
 
@@ -62,7 +62,7 @@ function ResultsSection({ retrievedContext, answer, query }) {
           </div>
           
           <div className="text-xs text-gray-500">
-            Model: {answer.model}
+            {answer.streaming ? 'Generating...' : `Model: ${answer.model}`}
           </div>
         </div>
       )}
@@ -3,18 +3,28 @@ import { useMutation } from '@tanstack/react-query'
 import axios from 'axios'
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
+const JOB_POLL_INTERVAL_MS = 1000
+const DOCUMENT_EXTENSIONS = ['.pdf', '.md', '.markdown']
+const ARCHIVE_EXTENSIONS = ['.zip', '.tar', '.tar.gz', '.tgz']
+const FINISHED_STATUSES = ['succeeded', 'partial', 'failed']
+
+const isArchive = (file) => ARCHIVE_EXTENSIONS.some((ext) => file.name.toLowerCase().endsWith(ext))
+const isSupported = (file) =>
+  isArchive(file) || DOCUMENT_EXTENSIONS.some((ext) => file.name.toLowerCase().endsWith(ext))
 
 function UploadSection() {
-  const [file, setFile] = useState(null)
+  const [files, setFiles] = useState([])
   const [uploadStatus, setUploadStatus] = useState(null)
 
   const uploadMutation = useMutation({
-    mutationFn: async (file) => {
+    mutationFn: async (files) => {
+      // Several files or an archive go to the bulk endpoint as one job
+      const bulk = files.length > 1 || isArchive(files[0])
       const formData = new FormData()
-      formData.append('file', file)
+      files.forEach((file) => formData.append(bulk ? 'files' : 'file', file))
       
       const response = await axios.post(
-        `${API_URL}/api/v1/ingestion/upload`,
+        `${API_URL}/api/v1/ingestion/${bulk ? 'bulk' : 'upload'}`,
         formData,
         {
           headers: {
@@ -22,42 +32,66 @@ function UploadSection() {
           },
         }
       )
-      return response.data
+
+      // Indexing runs as a background job; poll it until it finishes
+      let job = response.data
+      while (!FINISHED_STATUSES.includes(job.status)) {
+        const done = job.progress.documents_indexed + job.progress.documents_deduplicated
+        const name = job.filename || `${done}/${job.progress.documents} documents`
+        setUploadStatus({
+          type: 'progress',
+          message: `Indexing ${name}: ${job.stage || job.status}, ` +
+            `${job.progress.pages_parsed} pages parsed, ${job.progress.chunks_embedded} chunks embedded`
+        })
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+        const poll = await axios.get(`${API_URL}/api/v1/ingestion/jobs/${job.job_id}`)
+        job = poll.data
+      }
+
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Indexing failed')
+      }
+      return job
     },
-    onSuccess: (data) => {
+    onSuccess: (job) => {
+      const deduplicated = job.progress.documents_deduplicated
+      const name = job.filename || `${job.progress.documents_indexed} documents` +
+        (deduplicated ? ` (${deduplicated} already indexed)` : '')
       setUploadStatus({
-        type: 'success',
-        message: `Successfully indexed ${data.chunks} chunks from ${data.filename}`
+        type: job.status === 'partial' ? 'error' : 'success',
+        message: job.duplicate
+          ? `${name} is already indexed`
+          : `Indexed ${job.progress.chunks_embedded} chunks from ${name}` +
+            (job.status === 'partial' ? `; ${job.error}` : '')
       })
-      setFile(null)
+      setFiles([])
     },
     onError: (error) => {
       setUploadStatus({
         type: 'error',
-        message: error.response?.data?.detail || 'Upload failed'
+        message: error.response?.data?.detail || error.message || 'Upload failed'
       })
     }
   })
 
   const handleFileChange = (e) => {
-    const selectedFile = e.target.files[0]
-    if (selectedFile) {
-      const ext = selectedFile.name.split('.').pop().toLowerCase()
-      if (!['pdf', 'md', 'markdown'].includes(ext)) {
+    const selectedFiles = Array.from(e.target.files)
+    if (selectedFiles.length) {
+      if (!selectedFiles.every(isSupported)) {
         setUploadStatus({
           type: 'error',
-          message: 'Only PDF and Markdown files are supported'
+          message: 'Only PDF and Markdown files, or zip/tar archives of them, are supported'
         })
         return
       }
-      setFile(selectedFile)
+      setFiles(selectedFiles)
       setUploadStatus(null)
     }
   }
 
   const handleUpload = () => {
-    if (!file) return
-    uploadMutation.mutate(file)
+    if (!files.length) return
+    uploadMutation.mutate(files)
   }
 
   return (
@@ -67,11 +101,12 @@ function UploadSection() {
       <div className="flex gap-4 items-end">
         <div className="flex-1">
           <label className="block text-sm text-gray-400 mb-2">
-            PDF or Markdown file
+            PDF or Markdown files, or a zip/tar archive
           </label>
           <input
             type="file"
-            accept=".pdf,.md,.markdown"
+            multiple
+            accept={[...DOCUMENT_EXTENSIONS, ...ARCHIVE_EXTENSIONS].join(',')}
             onChange={handleFileChange}
             className="w-full px-4 py-2 rounded"
           />
@@ -79,7 +114,7 @@ function UploadSection() {
         
         <button
           onClick={handleUpload}
-          disabled={!file || uploadMutation.isPending}
+          disabled={!files.length || uploadMutation.isPending}
           className="px-6 py-2 font-semibold disabled:opacity-50"
         >
           {uploadMutation.isPending ? 'Uploading...' : 'Upload'}
@@ -90,7 +125,9 @@ function UploadSection() {
         <div className={`mt-4 p-3 rounded ${
           uploadStatus.type === 'success' 
             ? 'bg-green-900 text-green-200' 
-            : 'bg-red-900 text-red-200'
+            : uploadStatus.type === 'progress'
+              ? 'bg-gray-800 text-gray-200'
+              : 'bg-red-900 text-red-200'
         }`}>
           {uploadStatus.message}
         </div>